@@ -0,0 +1,75 @@
+# Confetti particle benchmark.
+#
+# Measures update() + draw() time per frame for increasing particle counts on
+# an off-screen surface and reports the largest count that still fits in a
+# 60 fps frame budget.
+#
+#   python bench_confetti.py
+#   python bench_confetti.py --counts 1000 5000 20000 --frames 300
+
+import argparse
+import json
+import os
+import random
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+import pygame
+from card_game import Confetti, WINDOW_WIDTH, WINDOW_HEIGHT
+
+FRAME_BUDGET_MS = 1000 / 60
+
+
+def measure(count, frames):
+    surface = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+    confetti = Confetti(count)
+    confetti.create_particles()
+
+    # Let particles spread over the screen before timing
+    for _ in range(WINDOW_HEIGHT // 2):
+        confetti.update()
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        surface.fill((0, 0, 0))
+        confetti.update()
+        confetti.draw(surface)
+    return (time.perf_counter() - start) * 1000 / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Confetti particle benchmark")
+    parser.add_argument(
+        "--counts",
+        type=int,
+        nargs="+",
+        default=[100, 1000, 2000, 5000, 10000, 20000, 50000],
+    )
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    results = []
+    for count in args.counts:
+        frame_ms = measure(count, args.frames)
+        results.append({"particles": count, "frame_ms": frame_ms})
+        status = "ok" if frame_ms <= FRAME_BUDGET_MS else "over budget"
+        print(f"{count:>7} particles: {frame_ms:7.3f} ms/frame ({status})")
+
+    within = [r["particles"] for r in results if r["frame_ms"] <= FRAME_BUDGET_MS]
+    print(f"max particles per frame at 60 fps: {max(within) if within else 0}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
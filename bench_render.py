@@ -0,0 +1,200 @@
+# Headless render benchmark for the single player game.
+#
+# Runs the game under SDL's dummy video driver with a fixed RNG seed and a
+# scripted player (pick VS COMPUTER, drag a card to the play area, press GO,
+# let the computer play, repeat until someone wins, then sit on the end screen
+# with confetti) and reports frames per second and per-frame timings.
+# With --games N the player presses Play Again and goes round the
+# title -> game -> end screen loop N times, reporting process memory after
+# each game.
+#
+#   python bench_render.py                  # human readable report
+#   python bench_render.py --json out.json  # also write results as JSON
+#   python bench_render.py --min-fps 200    # exit 1 if slower (for CI)
+#   python bench_render.py --games 20       # check memory stays flat
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import resource
+import sys
+import time
+
+# Must be set before pygame is imported by card_game
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+# Assets are loaded relative to the working directory
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+import pygame
+import card_game
+from card_game import (
+    WINDOW_WIDTH,
+    WINDOW_HEIGHT,
+    CARD_WIDTH,
+    CARD_HEIGHT,
+    CARD_SPACING,
+    DOCK_HEIGHT,
+    BUTTON_WIDTH,
+    BUTTON_HEIGHT,
+)
+
+DRAG_FRAMES = 20  # frames spent moving a card from the dock to the play area
+END_SCREEN_TIME = 3.0  # seconds to keep rendering the end screen
+
+
+def rss_kb():
+    # Current resident set size; falls back to the peak where /proc is missing
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class ScriptedPlayer:
+    def __init__(self, games=1):
+        self.games = games
+        self.games_played = 0
+        self.rss_kb = []  # memory after each finished game
+        # Same layout SinglePlayerGame uses for a full hand
+        dock_start_x = (WINDOW_WIDTH - (CARD_WIDTH * 5 + CARD_SPACING * 4)) // 2
+        dock_y = WINDOW_HEIGHT - DOCK_HEIGHT + 25
+        self.card_pos = (dock_start_x + CARD_WIDTH // 2, dock_y + CARD_HEIGHT // 2)
+        self.play_area_pos = (50 + (CARD_WIDTH + 20) // 2, WINDOW_HEIGHT // 2 + 10)
+        self.go_pos = (
+            WINDOW_WIDTH - 120 + BUTTON_WIDTH // 2,
+            WINDOW_HEIGHT - 70 + BUTTON_HEIGHT // 2,
+        )
+        self.replay_pos = (WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 75)
+        self.single_player_pos = (WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 80)
+        self.pending = []  # events to post, one list per upcoming frame
+        self.end_screen_start = None
+        self.frame_times = []
+        self.last_frame = None
+
+    def queue_turn(self):
+        # Press on the first card, drag it across, drop it and press GO
+        self.pending.append([self.mouse(pygame.MOUSEBUTTONDOWN, self.card_pos)])
+        (x0, y0), (x1, y1) = self.card_pos, self.play_area_pos
+        for i in range(1, DRAG_FRAMES + 1):
+            t = i / DRAG_FRAMES
+            pos = (int(x0 + (x1 - x0) * t), int(y0 + (y1 - y0) * t))
+            self.pending.append([self.mouse(pygame.MOUSEMOTION, pos)])
+        self.pending.append([self.mouse(pygame.MOUSEBUTTONUP, self.play_area_pos)])
+        self.pending.append([self.mouse(pygame.MOUSEBUTTONDOWN, self.go_pos)])
+
+    def mouse(self, event_type, pos):
+        if event_type == pygame.MOUSEMOTION:
+            return pygame.event.Event(event_type, pos=pos, rel=(0, 0), buttons=(1, 0, 0))
+        return pygame.event.Event(event_type, pos=pos, button=1)
+
+    def __call__(self, scene):
+        now = time.perf_counter()
+        if self.last_frame is not None:
+            self.frame_times.append(now - self.last_frame)
+        self.last_frame = now
+
+        if isinstance(scene, card_game.TitleScreen):
+            if not self.pending:
+                self.pending = [
+                    [self.mouse(pygame.MOUSEBUTTONDOWN, self.single_player_pos)]
+                ]
+        elif scene.header.game_over:
+            if self.end_screen_start is None:
+                self.end_screen_start = now
+                # Hover the replay button so its highlight gets drawn too
+                self.pending = [[self.mouse(pygame.MOUSEMOTION, self.replay_pos)]]
+            elif now - self.end_screen_start >= END_SCREEN_TIME and not self.pending:
+                self.games_played += 1
+                self.rss_kb.append(rss_kb())
+                if self.games_played >= self.games:
+                    return True
+                self.end_screen_start = None
+                self.pending = [[self.mouse(pygame.MOUSEBUTTONDOWN, self.replay_pos)]]
+        elif scene.header.is_player_turn and not self.pending:
+            self.queue_turn()
+
+        if self.pending:
+            for event in self.pending.pop(0):
+                pygame.event.post(event)
+        return False
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run(seed, fps, games):
+    random.seed(seed)  # the confetti still draws from the random module
+    player = ScriptedPlayer(games)
+    start = time.perf_counter()
+    # The game prints debug output every frame; keep the report readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        card_game.main(frame_callback=player, fps=fps, seed=seed)
+    elapsed = time.perf_counter() - start
+
+    frame_ms = sorted(t * 1000 for t in player.frame_times)
+    return {
+        "seed": seed,
+        "games": player.games_played,
+        "rss_kb": player.rss_kb,
+        "frames": len(frame_ms) + 1,
+        "elapsed_s": elapsed,
+        "fps": (len(frame_ms) + 1) / elapsed,
+        "frame_ms": {
+            "mean": sum(frame_ms) / len(frame_ms),
+            "p50": percentile(frame_ms, 50),
+            "p95": percentile(frame_ms, 95),
+            "p99": percentile(frame_ms, 99),
+            "max": frame_ms[-1],
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless render benchmark")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument(
+        "--fps", type=int, default=0, help="frame cap (0 = uncapped, the default)"
+    )
+    parser.add_argument("--games", type=int, default=1, help="games to play in a row")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument(
+        "--min-fps", type=float, help="exit with status 1 if average fps is lower"
+    )
+    args = parser.parse_args()
+
+    results = run(args.seed, args.fps, args.games)
+
+    print(
+        f"seed {results['seed']}: {results['games']} game(s), "
+        f"{results['frames']} frames in {results['elapsed_s']:.2f}s"
+    )
+    print(f"average fps: {results['fps']:.1f}")
+    print(
+        "frame time ms: "
+        + ", ".join(f"{k} {v:.3f}" for k, v in results["frame_ms"].items())
+    )
+
+    if results["games"] > 1:
+        rss = results["rss_kb"]
+        print(f"rss after first game {rss[0]} KB, after last game {rss[-1]} KB")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    pygame.quit()
+
+    if args.min_fps is not None and results["fps"] < args.min_fps:
+        print(f"FAIL: average fps {results['fps']:.1f} below {args.min_fps}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
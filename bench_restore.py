@@ -0,0 +1,186 @@
+# Restart recovery benchmark for server.py.
+#
+# Builds a server's worth of live matches on a durable match log, snapshots
+# them the way GameServer.take_snapshot does, plays on (more cards, some
+# matches ending, new ones starting) so the log has a tail past the
+# snapshot, then times a fresh SessionRegistry rebuilding every match from
+# the state directory. Every restored session is checked against the one it
+# stands in for.
+#
+#   python bench_restore.py                      # 10k live matches
+#   python bench_restore.py --sessions 50000 --tail-steps 5
+#   python bench_restore.py --max-seconds 2      # exit 1 if restoring is slower
+
+import argparse
+import contextlib
+import json
+import random
+import secrets
+import shutil
+import sys
+import tempfile
+import time
+
+import matchlog
+from server import SessionRegistry, VacantSeat, read_snapshot
+
+
+class NullWriter:
+    # Swallows the sessions' debug prints, which would otherwise dominate
+    # the timings
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def step(registry, session, rng):
+    # One thing the server would do next in this match: score revealed
+    # cards, reveal played ones or have the player whose turn it is play
+    if session.revealed:
+        session.compare_cards()
+        if session.is_finished():
+            registry.end(session.game_id, "finished")
+    elif session.both_played():
+        session.reveal()
+    else:
+        player_num = session.current_player()
+        hand = session.game_state[f"player{player_num}"]["hand"]
+        session.play_card(player_num, rng.choice(list(hand)))
+
+
+def advance(registry, sessions, steps, rng):
+    for session in sessions:
+        for _ in range(rng.randint(0, steps)):
+            if session.ended:
+                break
+            step(registry, session, rng)
+
+
+def describe(session):
+    # What a restored session has to agree on with the original
+    return (
+        session.player_view(),
+        session.deck.cards,
+        session.timeouts,
+        session.revealed,
+        session.resume_tokens,
+    )
+
+
+def run(directory, sessions, steps, tail_steps, tail_share, seed):
+    rng = random.Random(seed)
+    resume_key = secrets.token_bytes(32)
+    log = matchlog.MatchLog(directory, durable=True)
+    registry = SessionRegistry(log, seed, resume_key=resume_key)
+
+    with contextlib.redirect_stdout(NullWriter()):
+        created = [
+            registry.create(VacantSeat(), f"player{i}a", VacantSeat(), f"player{i}b")
+            for i in range(sessions)
+        ]
+        advance(registry, created, steps, rng)
+
+        # Snapshot: every live session checkpointed, as take_snapshot would
+        start = time.perf_counter()
+        live, position = registry.live()
+        checkpoints = [session.checkpoint(log.position()) for session in live]
+        snapshot_bytes = registry.write_snapshot(directory, position, checkpoints)
+        snapshot_s = time.perf_counter() - start
+        logged_at_snapshot = log.written
+
+        # The tail: play on in some matches, give up on a few, start more
+        tail = rng.sample(live, int(len(live) * tail_share))
+        advance(registry, tail, tail_steps, rng)
+        for session in tail[: len(tail) // 10]:
+            if not session.ended:
+                registry.end(session.game_id, "abandoned")
+        started = [
+            registry.create(VacantSeat(), f"late{i}a", VacantSeat(), f"late{i}b")
+            for i in range(int(sessions * tail_share / 10))
+        ]
+        advance(registry, started, steps, rng)
+        tail_records = log.written - logged_at_snapshot
+        log.close()
+
+        expected = {session.game_id: describe(session) for session in registry.sessions.values()}
+
+        start = time.perf_counter()
+        restored = SessionRegistry(resume_key=resume_key).restore(directory)
+        restore_s = time.perf_counter() - start
+
+    mismatched = sum(
+        1 for session in restored if expected.get(session.game_id) != describe(session)
+    )
+    missing = len(set(expected) - {session.game_id for session in restored})
+    return {
+        "live_sessions": len(expected),
+        "snapshot_sessions": len(read_snapshot(directory)["sessions"]),
+        "snapshot_bytes": snapshot_bytes,
+        "snapshot_s": snapshot_s,
+        "tail_records": tail_records,
+        "restored": len(restored),
+        "restore_s": restore_s,
+        "sessions_per_s": len(restored) / restore_s if restore_s else 0,
+        "mismatched": mismatched,
+        "missing": missing,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server restart recovery benchmark")
+    parser.add_argument("--sessions", type=int, default=10000, help="live matches to restore")
+    parser.add_argument(
+        "--steps", type=int, default=12, help="most actions per match before the snapshot"
+    )
+    parser.add_argument(
+        "--tail-steps", type=int, default=4, help="most actions per match after the snapshot"
+    )
+    parser.add_argument(
+        "--tail-share",
+        type=float,
+        default=0.5,
+        help="share of matches that move on after the snapshot",
+    )
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--dir", help="state directory to use (default: a temporary one)")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument(
+        "--max-seconds", type=float, help="exit with status 1 if restoring takes longer"
+    )
+    args = parser.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp(prefix="card-jitsu-state-")
+    try:
+        results = run(
+            directory, args.sessions, args.steps, args.tail_steps, args.tail_share, args.seed
+        )
+    finally:
+        if not args.dir:
+            shutil.rmtree(directory)
+
+    print(
+        f"snapshot of {results['snapshot_sessions']} matches: "
+        f"{results['snapshot_bytes'] / 1024:.0f} KB in {results['snapshot_s']:.2f}s"
+    )
+    print(
+        f"restored {results['restored']} of {results['live_sessions']} live matches "
+        f"in {results['restore_s']:.2f}s ({results['sessions_per_s']:.0f}/s), "
+        f"redoing {results['tail_records']} log records past the snapshot"
+    )
+    print(f"mismatched: {results['mismatched']}, missing: {results['missing']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if results["mismatched"] or results["missing"]:
+        sys.exit(1)
+    if args.max_seconds is not None and results["restore_s"] > args.max_seconds:
+        print(f"FAIL: restoring took {results['restore_s']:.2f}s, limit {args.max_seconds}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,499 @@
+# Throughput and latency benchmarks for server.py.
+#
+# Each scenario boots a fresh server on a free localhost port, drives it with
+# scripted socket clients and records:
+#   burst_join     connections accepted per second when many join at once
+#   join_to_start  time from the second player's name to both "starting"s
+#   steady_play    per-action latency of play_card during concurrent matches
+#   slow_clients   join_to_start while some clients never send their name
+#   idle_memory    server RSS per idle match
+#   spectators     play_card latency with many spectators per match, one of
+#                  them never reading, and what the spectators received
+# Results are written as JSON so runs can be compared between releases.
+#
+#   python bench_server.py --out results.json
+#   python bench_server.py --scenarios join_to_start steady_play --baseline old.json
+
+import argparse
+import collections
+import io
+import json
+import os
+import pickle
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+TIMEOUT = 5.0  # seconds a scripted client waits for any single message
+QUIET_PERIOD = 0.02  # seconds without data that ends a drain()
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_kb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def percentiles(values):
+    values = sorted(v * 1000 for v in values)
+    if not values:
+        return {"count": 0}
+
+    def pick(pct):
+        return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+    return {
+        "count": len(values),
+        "mean_ms": sum(values) / len(values),
+        "p50_ms": pick(50),
+        "p90_ms": pick(90),
+        "p99_ms": pick(99),
+        "max_ms": values[-1],
+    }
+
+
+class ServerProcess:
+    def __init__(self):
+        self.port = free_port()
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, SERVER_SCRIPT, "--host", "127.0.0.1", "--port", str(self.port)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        # Wait until it listens; an empty connection is dropped by the server
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=1).close()
+                return self
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError("server did not start")
+
+    def __exit__(self, *exc):
+        self.process.kill()
+        self.process.wait()
+
+    def rss_kb(self):
+        return rss_kb(self.process.pid)
+
+
+class Client:
+    # Raw socket client speaking the same pickled messages as NetworkGame, but
+    # keeping every message the server sends (several can arrive in one recv)
+    def __init__(self, port, name):
+        self.name = name
+        self.sock = socket.create_connection(("127.0.0.1", port), timeout=TIMEOUT)
+        self.buffer = b""
+        self.messages = collections.deque()
+        self.state = None
+        self.game_id = None
+        self.received = 0
+
+    def send(self, data):
+        self.sock.sendall(pickle.dumps(data))
+
+    def _read(self, timeout):
+        self.sock.settimeout(timeout)
+        chunk = self.sock.recv(65536)
+        if not chunk:
+            raise ConnectionError("server closed the connection")
+        self.buffer += chunk
+
+        stream = io.BytesIO(self.buffer)
+        consumed = 0
+        while consumed < len(self.buffer):
+            try:
+                message = pickle.load(stream)
+            except Exception:
+                break  # partial message, wait for more bytes
+            consumed = stream.tell()
+            self.messages.append(message)
+            self.received += 1
+            if isinstance(message, dict) and message.get("game_state"):
+                self.state = message["game_state"]
+            if isinstance(message, dict) and "game_id" in message:
+                self.game_id = message["game_id"]
+        self.buffer = self.buffer[consumed:]
+
+    def recv(self, timeout=TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while not self.messages:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise socket.timeout("no message")
+            self._read(remaining)
+        return self.messages.popleft()
+
+    def recv_until(self, predicate, timeout=TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while True:
+            message = self.recv(max(0.001, deadline - time.monotonic()))
+            if predicate(message):
+                return message
+
+    def drain(self):
+        # Read whatever arrives until the connection goes quiet
+        try:
+            while True:
+                self._read(QUIET_PERIOD)
+        except socket.timeout:
+            pass
+        self.messages.clear()
+        return self.state
+
+    def close(self):
+        self.sock.close()
+
+
+def is_starting(message):
+    return isinstance(message, dict) and message.get("status") == "starting"
+
+
+def start_match(port, index, timeout=TIMEOUT):
+    # First player joins and waits, second joins; returns both clients and
+    # the time from the second name being sent to both seeing "starting"
+    first = Client(port, f"p{index}a")
+    first.send(first.name)
+    first.recv(timeout)  # "waiting"
+
+    second = Client(port, f"p{index}b")
+    start = time.perf_counter()
+    second.send(second.name)
+    second.recv_until(is_starting, timeout)
+    first.recv_until(is_starting, timeout)
+    return first, second, time.perf_counter() - start
+
+
+def scenario_burst_join(clients=200):
+    with ServerProcess() as server:
+        latencies = []
+        failures = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(clients)
+        connections = []
+
+        def join(i):
+            barrier.wait()
+            start = time.perf_counter()
+            try:
+                client = Client(server.port, f"burst{i}")
+                client.send(client.name)
+                client.recv()
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+                    connections.append(client)
+            except Exception as e:
+                with lock:
+                    failures.append(str(e))
+
+        threads = [threading.Thread(target=join, args=(i,)) for i in range(clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        for client in connections:
+            client.close()
+
+    return {
+        "clients": clients,
+        "accepted": len(latencies),
+        "failures": len(failures),
+        "elapsed_s": elapsed,
+        "accepted_per_s": len(latencies) / elapsed,
+        "join_latency": percentiles(latencies),
+    }
+
+
+def scenario_join_to_start(pairs=50):
+    with ServerProcess() as server:
+        latencies = []
+        failures = 0
+        for i in range(pairs):
+            try:
+                first, second, elapsed = start_match(server.port, i)
+                latencies.append(elapsed)
+                first.close()
+                second.close()
+            except Exception:
+                failures += 1
+    return {"pairs": pairs, "failures": failures, "join_to_start": percentiles(latencies)}
+
+
+def play_match(first, second, rounds, latencies, lock):
+    # Plays until each player has played `rounds` cards, timing play_card from
+    # sending it to seeing the card in the state the server pushes back. Only
+    # the player whose turn it is sends anything.
+    players = {first.name: first, second.name: second}
+    played = 0
+    while played < rounds * 2:
+        state = first.state
+        mover = players[state["current_turn"]]
+        key = "player1" if state["player1"]["name"] == mover.name else "player2"
+
+        if state[key]["played_card"] is not None:
+            # Round is being resolved; wait for the result push. A drawn
+            # round comes back the same way, with "drawn" set and both
+            # cards back in the hands, and is played again from here
+            first.recv_until(
+                lambda m: isinstance(m, dict)
+                and m.get("game_state")
+                and m["game_state"]["player1"]["played_card"] is None
+                and m["game_state"]["player2"]["played_card"] is None
+            )
+            continue
+
+        # Discard stale states so an old push can't match the new play
+        mover.drain()
+        card = state[key]["hand"][0]
+        start = time.perf_counter()
+        mover.send({"action": "play_card", "card": card})
+        mover.recv_until(
+            lambda m: isinstance(m, dict)
+            and m.get("game_state")
+            and m["game_state"][key]["played_card"] == card
+        )
+        with lock:
+            latencies.append(time.perf_counter() - start)
+        played += 1
+
+        # Keep the first player's view current; it gets the same pushes
+        if mover is not first:
+            first.recv_until(
+                lambda m: isinstance(m, dict)
+                and m.get("game_state")
+                and m["game_state"][key]["played_card"] == card
+            )
+
+
+def start_matches(port, pairs, failures):
+    # Join one pair at a time so the server pairs them as intended
+    matches = []
+    for i in range(pairs):
+        try:
+            first, second, _ = start_match(port, i)
+            matches.append((first, second))
+        except Exception:
+            failures.append(i)
+    return matches
+
+
+def play_matches(matches, rounds, latencies, failures):
+    # Plays all matches concurrently; returns the elapsed time
+    lock = threading.Lock()
+
+    def run(first, second):
+        try:
+            play_match(first, second, rounds, latencies, lock)
+        except Exception:
+            with lock:
+                failures.append(first.name)
+        finally:
+            first.close()
+            second.close()
+
+    threads = [threading.Thread(target=run, args=match) for match in matches]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def scenario_steady_play(pairs=20, rounds=3):
+    with ServerProcess() as server:
+        latencies = []
+        failures = []
+        matches = start_matches(server.port, pairs, failures)
+        elapsed = play_matches(matches, rounds, latencies, failures)
+    return {
+        "pairs": pairs,
+        "rounds": rounds,
+        "failures": len(failures),
+        "elapsed_s": elapsed,
+        "actions_per_s": len(latencies) / elapsed,
+        "play_card": percentiles(latencies),
+    }
+
+
+def scenario_slow_clients(silent=5, pairs=5, timeout=2.0):
+    with ServerProcess() as server:
+        # Connections that never send their player name
+        slow = []
+        for _ in range(silent):
+            try:
+                slow.append(socket.create_connection(("127.0.0.1", server.port), timeout))
+            except OSError:
+                pass  # backlog already full
+        latencies = []
+        failures = 0
+        for i in range(pairs):
+            try:
+                first, second, elapsed = start_match(server.port, i, timeout)
+                latencies.append(elapsed)
+                first.close()
+                second.close()
+            except Exception:
+                failures += 1
+        for sock in slow:
+            sock.close()
+    return {
+        "silent_clients": len(slow),
+        "pairs": pairs,
+        "failures": failures,
+        "join_to_start": percentiles(latencies),
+    }
+
+
+def scenario_idle_memory(matches=100):
+    with ServerProcess() as server:
+        time.sleep(0.5)
+        before = server.rss_kb()
+        clients = []
+        failures = 0
+        for i in range(matches):
+            try:
+                first, second, _ = start_match(server.port, i)
+                clients.extend([first, second])
+            except Exception:
+                failures += 1
+        time.sleep(1.0)
+        after = server.rss_kb()
+        started = matches - failures
+        for client in clients:
+            client.close()
+    return {
+        "matches": matches,
+        "failures": failures,
+        "rss_before_kb": before,
+        "rss_after_kb": after,
+        "kb_per_match": (after - before) / started if started else None,
+    }
+
+
+def scenario_spectators(pairs=5, per_match=100, rounds=3):
+    with ServerProcess() as server:
+        latencies = []
+        failures = []
+        matches = start_matches(server.port, pairs, failures)
+
+        spectators = []
+        stalled = []
+        for first, _ in matches:
+            for j in range(per_match):
+                spectator = Client(server.port, f"{first.name}-s{j}")
+                spectator.send({"action": "spectate", "game_id": first.game_id})
+                spectators.append(spectator)
+            # A viewer with a tiny receive window that never reads
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024)
+            sock.connect(("127.0.0.1", server.port))
+            sock.sendall(pickle.dumps({"action": "spectate", "game_id": first.game_id}))
+            stalled.append(sock)
+
+        elapsed = play_matches(matches, rounds, latencies, failures)
+
+        updates = []
+        leaked_hands = 0
+        for spectator in spectators:
+            try:
+                spectator._read(TIMEOUT)
+                spectator.drain()
+            except Exception:
+                pass
+            updates.append(spectator.received)
+            state = spectator.state or {}
+            if any("hand" in state.get(key, {}) for key in ("player1", "player2")):
+                leaked_hands += 1
+            spectator.close()
+        for sock in stalled:
+            sock.close()
+    return {
+        "pairs": pairs,
+        "spectators_per_match": per_match,
+        "rounds": rounds,
+        "failures": len(failures),
+        "elapsed_s": elapsed,
+        "play_card": percentiles(latencies),
+        "updates_per_spectator_min": min(updates) if updates else 0,
+        "updates_per_spectator_max": max(updates) if updates else 0,
+        "spectators_seeing_hands": leaked_hands,
+    }
+
+
+SCENARIOS = {
+    "burst_join": scenario_burst_join,
+    "join_to_start": scenario_join_to_start,
+    "steady_play": scenario_steady_play,
+    "slow_clients": scenario_slow_clients,
+    "idle_memory": scenario_idle_memory,
+    "spectators": scenario_spectators,
+}
+
+
+def compare(results, baseline):
+    # Print numeric differences against an earlier results file
+    def walk(new, old, path):
+        for key, value in new.items():
+            if key not in old:
+                continue
+            if isinstance(value, dict) and isinstance(old[key], dict):
+                walk(value, old[key], path + [key])
+            elif isinstance(value, (int, float)) and isinstance(old[key], (int, float)):
+                change = (value - old[key]) / old[key] * 100 if old[key] else 0.0
+                print(f"  {'.'.join(path + [key])}: {old[key]:.3f} -> {value:.3f} ({change:+.1f}%)")
+
+    walk(results["scenarios"], baseline.get("scenarios", {}), [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="server.py benchmark suite")
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS)
+    )
+    parser.add_argument("--out", default="bench_server.json", help="results file")
+    parser.add_argument("--baseline", help="earlier results file to compare with")
+    args = parser.parse_args()
+
+    results = {
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scenarios": {},
+    }
+    for name in args.scenarios:
+        print(f"running {name}...")
+        results["scenarios"][name] = SCENARIOS[name]()
+        print(json.dumps(results["scenarios"][name], indent=2))
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"wrote {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"compared with {args.baseline}:")
+        compare(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# Session lifecycle memory benchmark for server.py.
+#
+# Plays matches to the end through the server's own SessionRegistry, Outbox
+# and GameSession code (over socketpairs, so no TCP handshake or network in
+# the loop), ends them the way the server does and samples the process'
+# RSS, open file descriptors and thread count as it goes. With sessions
+# being dropped and their sockets closed, all three should stay flat no
+# matter how many matches have been played. Ended matches leave their final
+# state behind for late resumes, as on the server, but never more than
+# SessionRegistry's ended_kept of them; those fill up before the first
+# sample unless --sample is below that.
+#
+#   python bench_sessions.py                        # a million matches
+#   python bench_sessions.py --matches 50000 --sample 5000
+#   python bench_sessions.py --max-growth-kb 2048   # exit 1 if RSS grows more
+#   python bench_sessions.py --resume-window 0      # keep no final states
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import socket
+import sys
+import time
+
+from server import ENDED_KEPT, RECONNECT_GRACE, SessionRegistry, Outbox
+
+MAX_ROUNDS = 200  # safety net; a match normally ends within a dozen rounds
+
+
+class NullWriter:
+    # Swallows the server's debug prints. A file opened on os.devnull won't
+    # do: writer threads printing into one shared TextIOWrapper at once make
+    # it hold on to text, which shows up here as a slow RSS climb.
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def process_stats():
+    stats = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                stats["rss_kb"] = int(line.split()[1])
+            elif line.startswith("Threads:"):
+                stats["threads"] = int(line.split()[1])
+    stats["fds"] = len(os.listdir("/proc/self/fd"))
+    return stats
+
+
+def play_match(registry, index, rng):
+    server1, client1 = socket.socketpair()
+    server2, client2 = socket.socketpair()
+    session = registry.create(
+        Outbox(server1), f"p{index}a", Outbox(server2), f"p{index}b"
+    )
+
+    rounds = 0
+    while not session.is_finished() and rounds < MAX_ROUNDS:
+        # Both players play, in turn order, as handle_game_client would
+        while not session.both_played():
+            player_num = 1 if session.game_state["current_turn"] == f"p{index}a" else 2
+            hand = session.game_state[f"player{player_num}"]["hand"]
+            session.play_card(player_num, rng.choice(list(hand)))
+            session.broadcast()
+        session.broadcast(reveal_cards=True)
+        if session.compare_cards() is None:
+            # A draw leaves the played cards down; pick them up and replay
+            for key in ("player1", "player2"):
+                player = session.game_state[key]
+                player["hand"].add(player["played_card"])
+                player["played_card"] = None
+        session.broadcast()
+        rounds += 1
+
+    registry.end(session.game_id, "finished")
+    client1.close()
+    client2.close()
+
+
+def run(matches, sample, seed, resume_window=RECONNECT_GRACE, ended_kept=ENDED_KEPT):
+    rng = random.Random(seed)
+    registry = SessionRegistry(seed=seed, resume_window=resume_window, ended_kept=ended_kept)
+    samples = []
+    start = time.perf_counter()
+    # The server logs every play; keep the report readable
+    with contextlib.redirect_stdout(NullWriter()):
+        for i in range(1, matches + 1):
+            play_match(registry, i, rng)
+            if i % sample == 0:
+                stats = process_stats()
+                stats["matches"] = i
+                stats["active_sessions"] = len(registry)
+                stats["final_states"] = len(registry.final_states)
+                stats["elapsed_s"] = time.perf_counter() - start
+                samples.append(stats)
+                print(json.dumps(stats), file=sys.stderr)
+    elapsed = time.perf_counter() - start
+
+    # The first sample includes one-off warm-up allocations
+    baseline = samples[0] if samples else process_stats()
+    last = samples[-1] if samples else baseline
+    return {
+        "matches": matches,
+        "elapsed_s": elapsed,
+        "matches_per_s": matches / elapsed,
+        "ended": dict(registry.ended),
+        "active_sessions": len(registry),
+        "final_states": len(registry.final_states),
+        "rss_first_kb": baseline["rss_kb"],
+        "rss_last_kb": last["rss_kb"],
+        "rss_max_kb": max(s["rss_kb"] for s in samples) if samples else baseline["rss_kb"],
+        "rss_growth_kb": last["rss_kb"] - baseline["rss_kb"],
+        "fds_first": baseline["fds"],
+        "fds_last": last["fds"],
+        "threads_first": baseline["threads"],
+        "threads_last": last["threads"],
+        "samples": samples,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session lifecycle memory benchmark")
+    parser.add_argument("--matches", type=int, default=1000000)
+    parser.add_argument(
+        "--sample", type=int, default=50000, help="matches between measurements"
+    )
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument(
+        "--resume-window",
+        type=float,
+        default=RECONNECT_GRACE,
+        help="seconds ended matches' final states are kept for (0 = none)",
+    )
+    parser.add_argument(
+        "--ended-kept",
+        type=int,
+        default=ENDED_KEPT,
+        help="most ended matches' final states kept at once",
+    )
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument(
+        "--max-growth-kb",
+        type=int,
+        help="exit with status 1 if RSS grows more than this after the first sample",
+    )
+    args = parser.parse_args()
+
+    results = run(args.matches, args.sample, args.seed, args.resume_window, args.ended_kept)
+
+    print(
+        f"{results['matches']} matches in {results['elapsed_s']:.1f}s "
+        f"({results['matches_per_s']:.0f}/s), ended: {results['ended']}, "
+        f"still active: {results['active_sessions']}, "
+        f"final states kept: {results['final_states']}"
+    )
+    print(
+        f"rss {results['rss_first_kb']} KB -> {results['rss_last_kb']} KB "
+        f"(max {results['rss_max_kb']} KB, growth {results['rss_growth_kb']} KB)"
+    )
+    print(
+        f"open fds {results['fds_first']} -> {results['fds_last']}, "
+        f"threads {results['threads_first']} -> {results['threads_last']}"
+    )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.max_growth_kb is not None and results["rss_growth_kb"] > args.max_growth_kb:
+        print(f"FAIL: RSS grew {results['rss_growth_kb']} KB, limit {args.max_growth_kb} KB")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
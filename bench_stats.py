@@ -0,0 +1,139 @@
+# Player stats benchmark for stats.py.
+#
+# Records matches between random players through a StatsStore the way the
+# server does at match end, timing record() itself (what a Scheduler worker
+# pays) and how fast the writer thread gets them into SQLite. Then times
+# leaderboard queries against the result, and checks every rank() it asked
+# for against a plain count over the players table.
+#
+#   python bench_stats.py                             # a million matches
+#   python bench_stats.py --matches 200000 --players 50000
+#   python bench_stats.py --db stats.db --queries 10000
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import stats
+
+REASONS = ["finished"] * 8 + ["forfeit", "abandoned"]
+WINNING_SCORE = 4  # as in server.py
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def run(path, matches, players, queries, seed):
+    rng = random.Random(seed)
+    store = stats.StatsStore(path)
+
+    record_s = []
+    start = time.perf_counter()
+    for game_id in range(matches):
+        player1, player2 = rng.sample(range(players), 2)
+        reason = rng.choice(REASONS)
+        winner = rng.choice((1, 2)) if reason != "abandoned" else 0
+        score1 = WINNING_SCORE if winner == 1 else rng.randrange(WINNING_SCORE)
+        score2 = WINNING_SCORE if winner == 2 else rng.randrange(WINNING_SCORE)
+        began = time.perf_counter()
+        store.record(
+            game_id, f"player{player1}", f"player{player2}", score1, score2, winner, reason
+        )
+        record_s.append(time.perf_counter() - began)
+    queued_s = time.perf_counter() - start
+    store.close()
+    written_s = time.perf_counter() - start
+
+    db = stats.connect(path)
+    (rows,) = db.execute("SELECT COUNT(*) FROM players").fetchone()
+    top_s = []
+    rank_s = []
+    wrong = 0
+    for _ in range(queries):
+        began = time.perf_counter()
+        store.top(10)
+        top_s.append(time.perf_counter() - began)
+
+        name = f"player{rng.randrange(players)}"
+        began = time.perf_counter()
+        found = store.rank(name)
+        rank_s.append(time.perf_counter() - began)
+        if found is not None:
+            (above,) = db.execute(
+                "SELECT COUNT(*) FROM players WHERE wins > ?", (found[1],)
+            ).fetchone()
+            wrong += found[0] != above + 1
+    db.close()
+
+    return {
+        "matches": matches,
+        "players": rows,
+        "batches": store.batches,
+        "record_us_p50": percentile(record_s, 0.5) * 1e6,
+        "record_us_p99": percentile(record_s, 0.99) * 1e6,
+        "record_us_max": max(record_s) * 1e6,
+        "queued_s": queued_s,
+        "written_s": written_s,
+        "matches_per_s": matches / written_s,
+        "top_ms_p50": percentile(top_s, 0.5) * 1000,
+        "top_ms_p99": percentile(top_s, 0.99) * 1000,
+        "rank_ms_p50": percentile(rank_s, 0.5) * 1000,
+        "rank_ms_p99": percentile(rank_s, 0.99) * 1000,
+        "wrong_ranks": wrong,
+        "db_bytes": os.path.getsize(path),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Player stats benchmark")
+    parser.add_argument("--matches", type=int, default=1000000)
+    parser.add_argument("--players", type=int, default=1000000, help="distinct player names")
+    parser.add_argument("--queries", type=int, default=2000, help="top and rank queries each")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--db", help="database file to use (default: a temporary one)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    directory = None
+    path = args.db
+    if path is None:
+        directory = tempfile.mkdtemp(prefix="card-jitsu-stats-")
+        path = os.path.join(directory, "stats.db")
+    try:
+        results = run(path, args.matches, args.players, args.queries, args.seed)
+    finally:
+        if directory is not None:
+            shutil.rmtree(directory)
+
+    print(
+        f"{results['matches']} matches, {results['players']} players: queued in "
+        f"{results['queued_s']:.1f}s, written in {results['written_s']:.1f}s "
+        f"({results['matches_per_s']:.0f}/s, {results['batches']} transactions)"
+    )
+    print(
+        f"record() us: p50 {results['record_us_p50']:.1f}, "
+        f"p99 {results['record_us_p99']:.1f}, max {results['record_us_max']:.1f}"
+    )
+    print(
+        f"top 10 ms: p50 {results['top_ms_p50']:.3f}, p99 {results['top_ms_p99']:.3f}; "
+        f"rank ms: p50 {results['rank_ms_p50']:.3f}, p99 {results['rank_ms_p99']:.3f}"
+    )
+    print(f"database {results['db_bytes'] / 1e6:.0f} MB, wrong ranks: {results['wrong_ranks']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if results["wrong_ranks"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
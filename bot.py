@@ -0,0 +1,178 @@
+import random
+import time
+
+import cards
+from network import NetworkGame
+
+WINNING_SCORE = 4  # first to this many round wins takes the match
+LOBBY_STATUSES = ["starting", "game_started", "in_game"]
+GAME_OVER_STATUSES = ["finished", "forfeit"]
+POLL_INTERVAL = 1 / 60  # the pygame client polls about once per frame
+MATCH_TIMEOUT = 120  # seconds before a bot gives up on its match
+
+
+# Strategies pick a card to play from the bot's hand. They get the hand as a
+# list of card ids (see cards.py) and the full game state from the server.
+# None means don't play, and let the server's turn clock run out.
+def random_strategy(hand, game_state):
+    return random.choice(hand)
+
+
+def highest_card_strategy(hand, game_state):
+    return max(hand, key=cards.value)
+
+
+def lowest_card_strategy(hand, game_state):
+    return min(hand, key=cards.value)
+
+
+def idle_strategy(hand, game_state):
+    return None
+
+
+STRATEGIES = {
+    "random": random_strategy,
+    "highest": highest_card_strategy,
+    "lowest": lowest_card_strategy,
+    "idle": idle_strategy,
+}
+
+
+class Bot:
+    # Headless player that drives a NetworkGame the same way the pygame
+    # client does: log in, wait in the lobby, then poll the game state and
+    # play a card whenever it is this bot's turn.
+    def __init__(
+        self,
+        name,
+        host="localhost",
+        port=5555,
+        strategy=random_strategy,
+        poll_interval=POLL_INTERVAL,
+        timeout=MATCH_TIMEOUT,
+        mux=None,
+        transport=None,
+        drop_rate=0.0,
+    ):
+        self.name = name
+        # With a MuxConnection the bot plays on a channel of a shared socket
+        self.network = NetworkGame(host, port, mux, transport)
+        self.strategy = strategy
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        # Chance per poll of cutting the connection mid-match, as a flaky
+        # network would; the bot resumes like the pygame client does
+        self.drop_rate = drop_rate
+        self.drops = 0  # connections cut on purpose
+        self.deadline = None
+        self.latencies = []  # seconds per request/response round trip
+        self.errors = 0
+        self.cards_played = 0
+        self.game_state = None
+
+    def active(self):
+        return self.network.connected and time.monotonic() < self.deadline
+
+    def request(self, data):
+        start = time.perf_counter()
+        response = self.network.send(data)
+        if response is None:
+            # No reply because the server hung up after the final result
+            # isn't an error
+            game_state = self.network.game_state
+            if game_state is None or not self.is_game_over(game_state):
+                self.errors += 1
+        else:
+            self.latencies.append(time.perf_counter() - start)
+        return response
+
+    def my_key(self, game_state):
+        # Look the bot up by name; player_num is only set if the "starting"
+        # message was received on its own
+        if game_state["player1"]["name"] == self.name:
+            return "player1"
+        return "player2"
+
+    def is_game_over(self, game_state):
+        return (
+            game_state.get("status") in GAME_OVER_STATUSES
+            or game_state["player1"]["score"] >= WINNING_SCORE
+            or game_state["player2"]["score"] >= WINNING_SCORE
+        )
+
+    def login(self):
+        if not self.network.connect():
+            self.errors += 1
+            return False
+
+        response = self.request(self.name)
+        while self.active():
+            if response and response.get("status") in LOBBY_STATUSES:
+                return self.request("ready") is not None
+            time.sleep(self.poll_interval)
+            response = self.request("get_status")
+        return False
+
+    def play(self):
+        while self.active():
+            time.sleep(self.poll_interval)
+            if self.drop_rate and random.random() < self.drop_rate:
+                self.network.client.close()
+                self.drops += 1
+            # Keep a round trip time estimate like the pygame client does
+            self.network.ping_if_due()
+            response = self.request("get_state")
+            if not response or not response.get("game_state"):
+                continue
+
+            game_state = response["game_state"]
+            self.game_state = game_state
+            if self.is_game_over(game_state):
+                return True
+
+            me = game_state[self.my_key(game_state)]
+            # A drawn round comes back with both slots empty, so this also
+            # plays it again
+            if (
+                game_state["current_turn"] == self.name
+                and me["played_card"] is None
+                and me["hand"]
+            ):
+                card = self.strategy(me["hand"], game_state)
+                if card is None:
+                    continue
+                self.request({
+                    "action": "play_card",
+                    "card": card,
+                    "game_id": self.network.game_id,
+                    "player_num": self.network.player_num,
+                })
+                self.cards_played += 1
+
+        # The server hangs up right after the final result; it may have been
+        # the last message read, maybe as the reply to a ping
+        self.game_state = self.network.game_state or self.game_state
+        return self.game_state is not None and self.is_game_over(self.game_state)
+
+    def unexpected_resumes(self):
+        # Resumes the bot didn't cause by dropping its connection: the
+        # server hung up or stopped answering, which NetworkGame papers
+        # over by resuming
+        return max(self.network.resumes - self.drops, 0)
+
+    def run(self):
+        # Play one match; returns True if it finished with a winner in time
+        self.deadline = time.monotonic() + self.timeout
+        try:
+            return self.login() and self.play()
+        except Exception as e:
+            print(f"Bot {self.name} error: {e}")
+            self.errors += 1
+            return False
+        finally:
+            if self.network.connected and not self.active() and not (
+                self.game_state and self.is_game_over(self.game_state)
+            ):
+                print(f"Bot {self.name} timed out")
+                self.errors += 1
+            self.network.client.close()
@@ -1,8 +1,11 @@
+import argparse
 import pygame
 import sys
 import random
 import os
 import math
+import numpy as np
+from cards import WinHistory, compare, parse, to_tuple
 from network import NetworkGame
 
 # Initialize Pygame
@@ -27,8 +30,19 @@ SMALL_CARD_HEIGHT = 32
 END_SCREEN_ANIMATION_DURATION = 1000  # 1 second for fade in
 VICTORY_CARD_SPIN_SPEED = 2  # degrees per frame
 CONFETTI_COUNT = 100
+CONFETTI_MIN_SIZE = 5
+CONFETTI_MAX_SIZE = 10
 COMPARISON_PAUSE = 3000  # 3 seconds to show the winner
 WINNER_COLOR = (50, 205, 50)  # Green color for winner highlight
+FPS = 60
+IDLE_FPS = 10  # frame rate on static screens with nothing pending
+IDLE_DELAY = 250  # milliseconds without input or animation before idling
+DOT_INTERVAL = 500  # milliseconds between "..." animation steps
+SIM_HZ = 60  # fixed rate game logic runs at, independent of the frame rate
+SIM_STEP = 1000 / SIM_HZ  # milliseconds of game time per update
+MAX_FRAME_TIME = 250  # cap on real time simulated per frame after a stall
+SHOW_LATENCY_HUD = True  # round trip time readout in online matches; F3 toggles
+SLOW_RTT = 150  # milliseconds of round trip time shown in red
 
 # Colors
 BLACK = (0, 0, 0)
@@ -43,29 +57,91 @@ RED = (255, 0, 0)
 screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
 pygame.display.set_caption("Card Game")
 
+# Loaded images and fonts are cached for the lifetime of the process so that
+# replays and new screens reuse them instead of reading them from disk again
+_image_cache = {}
+_font_cache = {}
+
+
+def load_image(path, size):
+    key = (path, size)
+    if key not in _image_cache:
+        image = pygame.image.load(path)
+        _image_cache[key] = pygame.transform.scale(image, size)
+    return _image_cache[key]
+
+
+def get_font(size):
+    if size not in _font_cache:
+        _font_cache[size] = pygame.font.Font(None, size)
+    return _font_cache[size]
+
+
+class FrameScheduler:
+    # Runs a screen loop at full rate while something is happening and drops
+    # to IDLE_FPS otherwise, blocking on pygame.event.wait so input still
+    # wakes the loop immediately.
+    def __init__(self, fps=FPS, idle_fps=IDLE_FPS):
+        self.clock = pygame.time.Clock()
+        self.fps = fps
+        self.idle_fps = idle_fps
+        self.last_activity = pygame.time.get_ticks()
+        self.idle = False
+
+    def get_events(self, busy=False):
+        # busy: the screen has an animation, timer or network poll pending
+        now = pygame.time.get_ticks()
+        if busy:
+            self.last_activity = now
+
+        if now - self.last_activity >= IDLE_DELAY:
+            event = pygame.event.wait(1000 // self.idle_fps)
+            events = [] if event.type == pygame.NOEVENT else [event]
+            events.extend(pygame.event.get())
+            self.idle = not events
+        else:
+            events = pygame.event.get()
+            self.idle = False
+
+        if events:
+            self.last_activity = pygame.time.get_ticks()
+        return events
+
+    def tick(self):
+        # When idle the wait in get_events already paced the frame
+        self.clock.tick(0 if self.idle else self.fps)
+
+
 # Load and scale instructions image
-instructions_img = pygame.image.load("instructions.png")
-instructions_img = pygame.transform.scale(instructions_img, (100, 100))
+instructions_img = load_image("instructions.png", (100, 100))
 instructions_rect = instructions_img.get_rect()
 # Center the image
 instructions_rect.center = (WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2)
 
 
 class Card:
+    # What a card looks like and where it is on screen; the rules only need
+    # its id (see cards.py)
     def __init__(self, suit, value, image_path):
         self.suit = suit
         self.value = value
+        self.id = parse((suit, value))  # None for the face-down placeholder
         # Load and scale the card image
-        original_image = pygame.image.load(image_path)
-        self.image = pygame.transform.scale(original_image, (CARD_WIDTH, CARD_HEIGHT))
+        self.image = load_image(image_path, (CARD_WIDTH, CARD_HEIGHT))
         self.rect = self.image.get_rect()
+        self.animation_duration = 500  # milliseconds
+        self.reset()
+
+    def reset(self):
+        # Clear per-game state so the same Card can be dealt again on replay
         self.dragging = False
+        self.draggable = True
         self.original_pos = None
         self.animating = False
         self.animation_start = None
-        self.animation_duration = 500  # milliseconds
         self.animation_start_pos = None
         self.animation_end_pos = None
+        self.prev_topleft = None  # position at the previous simulation step
 
     def set_position(self, x, y):
         self.rect.x = x
@@ -73,8 +149,14 @@ class Card:
         if self.original_pos is None:
             self.original_pos = (x, y)
 
-    def draw(self, surface):
-        surface.blit(self.image, self.rect)
+    def draw(self, surface, interpolation=1.0):
+        # While animating, blend between the last two simulation steps
+        if self.animating and self.prev_topleft is not None:
+            x = self.prev_topleft[0] + (self.rect.x - self.prev_topleft[0]) * interpolation
+            y = self.prev_topleft[1] + (self.rect.y - self.prev_topleft[1]) * interpolation
+            surface.blit(self.image, (x, y))
+        else:
+            surface.blit(self.image, self.rect)
 
     def handle_event(self, event, play_area, go_button):
         if not hasattr(self, 'dragging'):
@@ -109,20 +191,21 @@ class Card:
                 self.rect.y = mouse_y + self.offset_y
         return False
 
-    def start_deal_animation(self, end_pos):
+    def start_deal_animation(self, end_pos, now):
         self.animating = True
-        self.animation_start = pygame.time.get_ticks()
+        self.animation_start = now
         # Start from below the screen
         self.animation_start_pos = (end_pos[0], WINDOW_HEIGHT + 50)
         self.animation_end_pos = end_pos
         self.rect.topleft = self.animation_start_pos
+        self.prev_topleft = self.animation_start_pos
 
-    def update_animation(self):
+    def update_animation(self, now):
         if not self.animating:
             return False
 
-        current_time = pygame.time.get_ticks()
-        elapsed = current_time - self.animation_start
+        self.prev_topleft = self.rect.topleft
+        elapsed = now - self.animation_start
 
         if elapsed >= self.animation_duration:
             self.animating = False
@@ -148,7 +231,7 @@ class Card:
         return True
 
 
-def create_deck():
+def create_cards():
     cards = []
     suits = ["hearts", "diamonds", "spades"]
     values = range(2, 11)
@@ -161,9 +244,22 @@ def create_deck():
                     "Cards (large)", f"card_{suit}_{str(value).zfill(2)}.png"
                 )
                 cards.append(Card(suit, value, image_path))
+    return cards
+
+
+def card_view(card):
+    # Card to draw for a card id from the server
+    suit, value = to_tuple(card)
+    image_path = os.path.join("Cards (large)", f"card_{suit}_{str(value).zfill(2)}.png")
+    return Card(suit, value, image_path)
+
+
+def create_deck(cards=None, rng=random):
+    # Reuse existing Card objects when given, otherwise build a fresh set
+    cards = list(cards) if cards is not None else create_cards()
 
     # Split the deck into player and computer portions
-    random.shuffle(cards)
+    rng.shuffle(cards)
     mid = len(cards) // 2
     return cards[:mid], cards[mid:]  # Return (player_deck, computer_deck)
 
@@ -187,15 +283,15 @@ def draw_game_board():
     pygame.draw.rect(screen, BLACK, dock_rect, 2)
 
 
-def deal_cards(deck, num_cards):
-    return random.sample(deck, num_cards)
+def deal_cards(deck, num_cards, rng=random):
+    return rng.sample(deck, num_cards)
 
 
 class Button:
     def __init__(self, x, y, width, height):
         self.rect = pygame.Rect(x, y, width, height)
         self.active = False
-        self.font = pygame.font.Font(None, 36)
+        self.font = get_font(36)
 
     def draw(self, surface):
         color = BUTTON_ACTIVE if self.active else BUTTON_INACTIVE
@@ -226,6 +322,10 @@ class PlayArea:
     def remove_card(self):
         self.card = None
 
+    def reset(self):
+        self.card = None
+        self.highlight = False
+
     def is_empty(self):
         return self.card is None
 
@@ -244,17 +344,18 @@ class PlayArea:
 class Timer:
     def __init__(self):
         self.reset()
-        self.font = pygame.font.Font(None, 36)
+        self.font = get_font(36)
 
-    def reset(self):
-        self.time_left = TIMER_DURATION
-        self.last_update = pygame.time.get_ticks()
+    def reset(self, now=0):
+        self.duration = TIMER_DURATION
+        self.time_left = self.duration
+        self.last_update = now
 
-    def update(self):
-        now = pygame.time.get_ticks()
-        if now - self.last_update >= 1000:  # 1000ms = 1s
+    def update(self, now):
+        # Step from the last tick rather than now so slow frames don't drift
+        while now - self.last_update >= 1000:  # 1000ms = 1s
             self.time_left -= 1
-            self.last_update = now
+            self.last_update += 1000
             if self.time_left < 0:
                 self.time_left = 0
 
@@ -265,7 +366,7 @@ class Timer:
 
         # Draw arc for remaining time
         if self.time_left > 0:
-            angle = (self.time_left / TIMER_DURATION) * 360
+            angle = (self.time_left / self.duration) * 360
             pygame.draw.arc(
                 surface,
                 RED,
@@ -288,8 +389,13 @@ class Timer:
 
 class Header:
     def __init__(self):
-        self.font = pygame.font.Font(None, 48)
+        self.font = get_font(48)
         self.timer = Timer()
+        self.reveal_message_duration = 2000  # 2 seconds
+        self.reset()
+
+    def reset(self, now=0):
+        self.timer.reset(now)
         self.current_turn = "YOUR TURN"
         self.round = 1
         self.is_player_turn = True
@@ -297,17 +403,33 @@ class Header:
         self.winner = None  # Will be either "PLAYER" or "COMPUTER"
         self.reveal_message = None
         self.reveal_message_start = None
-        self.reveal_message_duration = 2000  # 2 seconds
+        self.reveal_alpha = 255
 
-    def switch_turn(self):
+    def switch_turn(self, now):
         self.is_player_turn = not self.is_player_turn
         self.current_turn = "YOUR TURN" if self.is_player_turn else "COMPUTER'S TURN"
-        self.timer.reset()
+        self.timer.reset(now)
 
-    def update(self):
-        self.timer.update()
+    def update(self, now):
+        self.timer.update(now)
+        self.update_reveal_message(now)
         return self.timer.time_left <= 0  # Return True if timer has expired
 
+    def update_reveal_message(self, now):
+        if not (self.reveal_message and self.reveal_message_start is not None):
+            return
+
+        elapsed = now - self.reveal_message_start
+        if elapsed >= self.reveal_message_duration:
+            self.reveal_message = None
+            self.reveal_message_start = None
+        elif elapsed > self.reveal_message_duration - 500:
+            # Fade out in last 500ms
+            fade_start = self.reveal_message_duration - 500
+            self.reveal_alpha = int(255 * (1 - (elapsed - fade_start) / 500))
+        else:
+            self.reveal_alpha = 255
+
     def draw(self, surface):
         # Draw header background
         header_rect = pygame.Rect(0, 0, WINDOW_WIDTH, HEADER_HEIGHT)
@@ -331,81 +453,60 @@ class Header:
         )
         surface.blit(round_text, round_rect)
 
-        # Draw reveal message if active
-        if self.reveal_message and self.reveal_message_start:
-            current_time = pygame.time.get_ticks()
-            if current_time - self.reveal_message_start < self.reveal_message_duration:
-                alpha = 255
-                if (
-                    current_time - self.reveal_message_start
-                    > self.reveal_message_duration - 500
-                ):
-                    # Fade out in last 500ms
-                    alpha = int(
-                        255
-                        * (
-                            1
-                            - (
-                                current_time
-                                - (
-                                    self.reveal_message_start
-                                    + self.reveal_message_duration
-                                    - 500
-                                )
-                            )
-                            / 500
-                        )
-                    )
-
-                reveal_text = self.font.render(
-                    self.reveal_message, True, (255, 215, 0)
-                )  # Golden color
-                reveal_text.set_alpha(alpha)
-                reveal_rect = reveal_text.get_rect(
-                    center=(WINDOW_WIDTH // 2, HEADER_HEIGHT + 20)
-                )
-                surface.blit(reveal_text, reveal_rect)
-            else:
-                self.reveal_message = None
-                self.reveal_message_start = None
+        # Draw reveal message if active (faded by update_reveal_message)
+        if self.reveal_message:
+            reveal_text = self.font.render(
+                self.reveal_message, True, (255, 215, 0)
+            )  # Golden color
+            reveal_text.set_alpha(self.reveal_alpha)
+            reveal_rect = reveal_text.get_rect(
+                center=(WINDOW_WIDTH // 2, HEADER_HEIGHT + 20)
+            )
+            surface.blit(reveal_text, reveal_rect)
 
     def set_game_over(self, winner):
         self.game_over = True
         self.winner = winner
         self.current_turn = f"{winner} WINS!"
 
-    def show_reveal_message(self, is_player_revealed):
+    def show_reveal_message(self, is_player_revealed, now):
         self.reveal_message = (
             "Computer's Cards Revealed!"
             if not is_player_revealed
             else "Your Cards Revealed!"
         )
-        self.reveal_message_start = pygame.time.get_ticks()
+        self.reveal_message_start = now
+        self.reveal_alpha = 255
 
 
 class ComputerPlayer:
     def __init__(self, hand, play_area, scoreboard):
-        self.hand = hand
         self.play_area = play_area
         self.scoreboard = scoreboard
+        self.animation_duration = 500  # milliseconds
+        self.glow_speed = 0.1
+        self.reset(hand)
+
+    def reset(self, hand, rng=random):
+        self.hand = hand
+        self.rng = rng  # picks the computer's cards; the game's seeded RNG
         self.card_backs = []
         self.animating_new_card = False
         self.animation_start = None
-        self.animation_duration = 500  # milliseconds
         self.animation_start_pos = None
         self.animation_end_pos = None
+        self.animation_y = None  # new card back's y at the last two steps
+        self.prev_animation_y = None
         self.update_card_backs()
         self.glow_effect = 0
-        self.glow_speed = 0.1
 
     def update_card_backs(self):
         # Clear existing card backs
         self.card_backs = []
         # Load and create card back images for display
-        card_back_img = pygame.image.load(
-            os.path.join("Cards (large)", "card_back.png")
+        card_back_img = load_image(
+            os.path.join("Cards (large)", "card_back.png"), (CARD_WIDTH, CARD_HEIGHT)
         )
-        card_back_img = pygame.transform.scale(card_back_img, (CARD_WIDTH, CARD_HEIGHT))
 
         # Position the card backs in the top dock
         dock_start_x = (
@@ -426,7 +527,7 @@ class ComputerPlayer:
             }
             self.card_backs.append(card_back)
 
-    def add_card(self, card):
+    def add_card(self, card, now):
         self.hand.append(card)
         # Calculate the position for the new card back
         dock_start_x = (
@@ -441,9 +542,10 @@ class ComputerPlayer:
 
         # Start animation
         self.animating_new_card = True
-        self.animation_start = pygame.time.get_ticks()
+        self.animation_start = now
         self.animation_start_pos = (new_pos[0], -CARD_HEIGHT)  # Start above screen
         self.animation_end_pos = new_pos
+        self.animation_y = self.prev_animation_y = self.animation_start_pos[1]
 
         # Update all card backs
         self.update_card_backs()
@@ -454,7 +556,7 @@ class ComputerPlayer:
             return None
 
         # Choose a random card from hand
-        chosen_card = random.choice(self.hand)
+        chosen_card = self.rng.choice(self.hand)
 
         # Remove the card from hand
         self.hand.remove(chosen_card)
@@ -468,12 +570,15 @@ class ComputerPlayer:
 
         return chosen_card
 
-    def update_animation(self):
+    def update_animation(self, now):
+        # Pulse the glow around revealed cards
+        if self.scoreboard.reveal_computer_cards:
+            self.glow_effect = (self.glow_effect + self.glow_speed) % (2 * math.pi)
+
         if not self.animating_new_card:
             return
 
-        current_time = pygame.time.get_ticks()
-        elapsed = current_time - self.animation_start
+        elapsed = now - self.animation_start
 
         if elapsed >= self.animation_duration:
             self.animating_new_card = False
@@ -493,13 +598,14 @@ class ComputerPlayer:
                 + (self.animation_end_pos[1] - self.animation_start_pos[1]) * progress
             )
             last_card["rect"].topleft = (x, y)
+            self.prev_animation_y = self.animation_y
+            self.animation_y = y
 
-    def draw(self, surface):
+    def draw(self, surface, interpolation=1.0):
         print(f"Reveal status: {self.scoreboard.reveal_computer_cards}")  # Debug print
         if self.scoreboard.reveal_computer_cards:
             print(f"Drawing revealed cards. Hand size: {len(self.hand)}")  # Debug print
             # Draw actual cards with glow effect
-            self.glow_effect = (self.glow_effect + self.glow_speed) % (2 * math.pi)
             glow_intensity = (math.sin(self.glow_effect) + 1) / 2  # 0 to 1
 
             for i, card in enumerate(self.hand):
@@ -530,67 +636,51 @@ class ComputerPlayer:
                     surface.blit(card_back["image"], card_back["rect"])
 
             if self.animating_new_card and self.card_backs:
-                surface.blit(self.card_backs[-1]["image"], self.card_backs[-1]["rect"])
+                # Blend the falling card between the last two simulation steps
+                last_card = self.card_backs[-1]
+                y = self.prev_animation_y + (
+                    self.animation_y - self.prev_animation_y
+                ) * interpolation
+                surface.blit(last_card["image"], (last_card["rect"].x, y))
 
 
 class ScoreBoard:
     def __init__(self):
+        self.reveal_effect_duration = 2000  # 2 seconds for flash effect
+        self.load_small_cards()
+        self.reset()
+
+    def reset(self):
         self.player_score = 0
         self.computer_score = 0
         self.player_wins = []  # List of winning cards (small versions)
         self.computer_wins = []
-        self.player_win_history = []  # List of (card, timestamp) tuples
-        self.computer_win_history = []
+        self.player_win_history = WinHistory()  # ids of the last winning cards
+        self.computer_win_history = WinHistory()
         self.reveal_player_cards = False
         self.reveal_computer_cards = False
         self.reveal_effect_start = None
-        self.reveal_effect_duration = 2000  # 2 seconds for flash effect
-        self.load_small_cards()
         self.current_round = 1  # Add this to track rounds
         self.reveal_started_round = None  # Add this to track when reveal started
 
     def check_matching_wins(self, win_history):
-        if len(win_history) < 2:
-            return False
-
-        last_two_wins = win_history[-2:]
-        card1, _ = last_two_wins[-1]
-        card2, _ = last_two_wins[-2]
-
-        # Print debug info
-        print(
-            f"Checking cards: {card1.suit}_{card1.value} vs {card2.suit}_{card2.value}"
-        )
-
         # Check for matching suit or value
-        matches = card1.suit == card2.suit or card1.value == card2.value
+        matches = win_history.last_two_match()
         if matches:
             print("Found a match!")
         return matches
 
     def compare_cards(self, player_card, computer_card):
-        # Check for exact same card (draw)
-        if (
-            player_card.suit == computer_card.suit
-            and player_card.value == computer_card.value
-        ):
-            return None  # Return None to indicate a draw
-
-        # Define the winning relationships
-        beats = {"diamonds": "spades", "spades": "hearts", "hearts": "diamonds"}
-
-        if player_card.suit == computer_card.suit:
-            # Same suit, compare values
-            return player_card.value > computer_card.value
-        else:
-            # Different suits, check if player's card beats computer's card
-            return beats[player_card.suit] == computer_card.suit
+        # True if the player's card wins, None for a draw (the same card)
+        result = compare(player_card.id, computer_card.id)
+        if result == 0:
+            return None
+        return result == 1
 
-    def update_reveal_effect(self):
+    def update_reveal_effect(self, now):
         if self.reveal_effect_start is not None:
-            current_time = pygame.time.get_ticks()
             # Only reset the reveal effect start time, but keep the reveal flags
-            if current_time - self.reveal_effect_start > self.reveal_effect_duration:
+            if now - self.reveal_effect_start > self.reveal_effect_duration:
                 print("Resetting reveal effect start time")  # Debug print
                 self.reveal_effect_start = None
 
@@ -614,14 +704,13 @@ class ScoreBoard:
 
         self.current_round += 1
 
-    def add_win(self, winning_card, is_player_win, header):
-        card_key = f"{winning_card.suit}_{winning_card.value}"
-        timestamp = pygame.time.get_ticks()
+    def add_win(self, winning_card, is_player_win, header, now):
+        timestamp = now
 
         if is_player_win:
             self.player_score += 1
-            self.player_wins.append(self.small_card_images[card_key])
-            self.player_win_history.append((winning_card, timestamp))
+            self.player_wins.append(self.small_card_images[winning_card.id])
+            self.player_win_history.append(winning_card.id)
             # Check if player's last two wins match
             if self.check_matching_wins(self.player_win_history):
                 print("Player matched! Revealing computer cards")  # Debug print
@@ -630,14 +719,14 @@ class ScoreBoard:
                 self.reveal_started_round = (
                     self.current_round
                 )  # Track when reveal started
-                header.show_reveal_message(False)
+                header.show_reveal_message(False, timestamp)
                 print(
                     f"Set reveal_computer_cards to {self.reveal_computer_cards}"
                 )  # Debug print
         else:
             self.computer_score += 1
-            self.computer_wins.append(self.small_card_images[card_key])
-            self.computer_win_history.append((winning_card, timestamp))
+            self.computer_wins.append(self.small_card_images[winning_card.id])
+            self.computer_win_history.append(winning_card.id)
             # Check if computer's last two wins match
             if self.check_matching_wins(self.computer_win_history):
                 print("Computer matched! Revealing player cards")  # Debug print
@@ -646,7 +735,7 @@ class ScoreBoard:
                 self.reveal_started_round = (
                     self.current_round
                 )  # Track when reveal started
-                header.show_reveal_message(True)
+                header.show_reveal_message(True, timestamp)
                 print(
                     f"Set reveal_player_cards to {self.reveal_player_cards}"
                 )  # Debug print
@@ -658,9 +747,8 @@ class ScoreBoard:
             for value in range(2, 11):
                 filename = f"card_{suit}_{str(value).zfill(2)}.png"
                 path = os.path.join(small_cards_path, filename)
-                img = pygame.image.load(path)
-                img = pygame.transform.scale(img, (SMALL_CARD_WIDTH, SMALL_CARD_HEIGHT))
-                self.small_card_images[f"{suit}_{value}"] = img
+                img = load_image(path, (SMALL_CARD_WIDTH, SMALL_CARD_HEIGHT))
+                self.small_card_images[parse((suit, value))] = img
 
     def draw(self, surface):
         # Draw player's winning cards on the left
@@ -676,9 +764,40 @@ class ScoreBoard:
             surface.blit(card_img, (x, y))
 
 
+class LatencyHud:
+    # Round trip time and jitter to the server, from NetworkGame's pings
+    def __init__(self, network, visible=SHOW_LATENCY_HUD):
+        self.network = network
+        self.visible = visible
+        self.font = get_font(24)
+        self.text = None
+        self.image = None
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            self.visible = not self.visible
+
+    def draw(self, surface):
+        if not self.visible:
+            return
+        summary = self.network.latency.summary()
+        if summary is None:
+            text = "RTT --"
+            color = BLACK
+        else:
+            text = f"RTT {summary['rtt_ms']:.0f} ms  jitter {summary['jitter_ms']:.0f} ms"
+            color = RED if summary["rtt_ms"] >= SLOW_RTT else BLACK
+        # Only re-render when the numbers change
+        if text != self.text:
+            self.text = text
+            self.image = self.font.render(text, True, color)
+        rect = self.image.get_rect(bottomleft=(10, WINDOW_HEIGHT - DOCK_HEIGHT - 10))
+        surface.blit(self.image, rect)
+
+
 class Confetti:
-    def __init__(self):
-        self.particles = []
+    def __init__(self, count=CONFETTI_COUNT):
+        self.count = count
         self.colors = [
             (255, 215, 0),
             (255, 0, 0),
@@ -686,61 +805,92 @@ class Confetti:
             (0, 0, 255),
             (255, 192, 203),
         ]
+        self.sizes = range(CONFETTI_MIN_SIZE, CONFETTI_MAX_SIZE + 1)
+
+        # Particle state lives in parallel arrays so update() is vectorized
+        self.rng = None
+        self.pos = np.zeros((0, 2))
+        self.prev_pos = self.pos  # positions at the previous simulation step
+        self.speed = np.zeros(0)
+        self.sprite_index = np.zeros(0, dtype=np.intp)
+
+        # Pre-render one square per (color, size) so draw() is a single blits()
+        sprites = []
+        for color in self.colors:
+            for size in self.sizes:
+                sprite = pygame.Surface((size, size))
+                sprite.fill(color)
+                sprites.append(sprite)
+        self.sprites = np.empty(len(sprites), dtype=object)
+        self.sprites[:] = sprites
+
+    def create_particles(self, seed=None):
+        # The game passes a seed from its own RNG, so a replayed game gets
+        # the same confetti
+        self.rng = np.random.default_rng(seed)
+        n = self.count
+        self.pos = np.empty((n, 2))
+        self.pos[:, 0] = self.rng.integers(0, WINDOW_WIDTH, n, endpoint=True)
+        self.pos[:, 1] = self.rng.integers(-WINDOW_HEIGHT, 0, n, endpoint=True)
+        self.prev_pos = self.pos.copy()
+        self.speed = self.rng.uniform(2, 5, n)
+        color = self.rng.integers(0, len(self.colors), n)
+        size = self.rng.integers(0, len(self.sizes), n)
+        self.sprite_index = color * len(self.sizes) + size
 
-    def create_particles(self):
-        self.particles = []
-        for _ in range(CONFETTI_COUNT):
-            x = random.randint(0, WINDOW_WIDTH)
-            y = random.randint(-WINDOW_HEIGHT, 0)
-            color = random.choice(self.colors)
-            speed = random.uniform(2, 5)
-            size = random.randint(5, 10)
-            self.particles.append(
-                {
-                    "pos": [x, y],
-                    "speed": speed,
-                    "size": size,
-                    "color": color,
-                    "angle": random.uniform(0, 360),
-                }
+    def update(self):
+        np.copyto(self.prev_pos, self.pos)
+        self.pos[:, 1] += self.speed
+
+        # Respawn everything that fell off the bottom at the top
+        fallen = self.pos[:, 1] > WINDOW_HEIGHT
+        respawned = np.count_nonzero(fallen)
+        if respawned:
+            self.pos[fallen, 1] = self.rng.integers(-50, 0, respawned, endpoint=True)
+            self.pos[fallen, 0] = self.rng.integers(
+                0, WINDOW_WIDTH, respawned, endpoint=True
             )
+            # Don't blend respawned particles across the whole screen
+            self.prev_pos[fallen] = self.pos[fallen]
 
-    def update(self):
-        for p in self.particles:
-            p["pos"][1] += p["speed"]
-            p["angle"] += VICTORY_CARD_SPIN_SPEED
-            if p["pos"][1] > WINDOW_HEIGHT:
-                p["pos"][1] = random.randint(-50, 0)
-                p["pos"][0] = random.randint(0, WINDOW_WIDTH)
+    def draw(self, surface, interpolation=1.0):
+        # Blend between the last two simulation steps
+        pos = self.prev_pos + (self.pos - self.prev_pos) * interpolation
 
-    def draw(self, surface):
-        for p in self.particles:
-            rect = pygame.Rect(p["pos"][0], p["pos"][1], p["size"], p["size"])
-            pygame.draw.rect(surface, p["color"], rect)
+        # Skip particles still waiting above the screen
+        visible = pos[:, 1] > -CONFETTI_MAX_SIZE
+        sprites = self.sprites[self.sprite_index[visible]]
+        positions = pos[visible].astype(int).tolist()
+        surface.blits(zip(sprites, positions), doreturn=False)
 
 
 class EndScreen:
     def __init__(self):
-        self.font_large = pygame.font.Font(None, 74)
-        self.font_medium = pygame.font.Font(None, 48)
-        self.alpha = 0
+        self.font_large = get_font(74)
+        self.font_medium = get_font(48)
+        self.font_small = get_font(24)
         self.surface = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
-        self.surface.set_alpha(self.alpha)
-        self.animation_start = None
         self.confetti = Confetti()
         self.replay_button = ReplayButton(
             WINDOW_WIDTH // 2 - 100, WINDOW_HEIGHT // 2 + 50, 200, 50
         )
+        self.reset()
 
-    def start_animation(self):
-        self.animation_start = pygame.time.get_ticks()
-        self.confetti.create_particles()
+    def reset(self):
+        self.alpha = 0
+        self.surface.set_alpha(self.alpha)
+        self.animation_start = None
+        self.replay_button.hover = False
 
-    def update(self):
+    def start_animation(self, now, seed=None):
+        self.animation_start = now
+        self.confetti.create_particles(seed)
+
+    def update(self, now):
         if self.animation_start is None:
             return
 
-        elapsed = pygame.time.get_ticks() - self.animation_start
+        elapsed = now - self.animation_start
         if elapsed < END_SCREEN_ANIMATION_DURATION:
             self.alpha = int((elapsed / END_SCREEN_ANIMATION_DURATION) * 255)
         else:
@@ -748,7 +898,7 @@ class EndScreen:
 
         self.confetti.update()
 
-    def draw(self, surface, winner, player_score, computer_score):
+    def draw(self, surface, winner, player_score, computer_score, interpolation=1.0, seed=None):
         # Draw semi-transparent background
         self.surface.fill((0, 0, 0))
         self.surface.set_alpha(min(160, self.alpha))
@@ -773,7 +923,7 @@ class EndScreen:
         score_text.set_alpha(self.alpha)
 
         # Draw confetti
-        self.confetti.draw(surface)
+        self.confetti.draw(surface, interpolation)
 
         # Draw text
         surface.blit(winner_text, winner_pos)
@@ -782,6 +932,15 @@ class EndScreen:
         # Draw replay button
         self.replay_button.draw(surface)
 
+        # The game's seed, to play it again with card_game.py --seed
+        if seed is not None:
+            seed_text = self.font_small.render(f"Seed: {seed}", True, WHITE)
+            seed_text.set_alpha(self.alpha)
+            surface.blit(
+                seed_text,
+                seed_text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 130)),
+            )
+
     def handle_event(self, event):
         return self.replay_button.handle_event(event)
 
@@ -789,7 +948,7 @@ class EndScreen:
 class ReplayButton:
     def __init__(self, x, y, width, height):
         self.rect = pygame.Rect(x, y, width, height)
-        self.font = pygame.font.Font(None, 36)
+        self.font = get_font(36)
         self.color = (50, 205, 50)
         self.hover = False
 
@@ -813,8 +972,8 @@ class ReplayButton:
 
 class TitleScreen:
     def __init__(self):
-        self.font_title = pygame.font.Font(None, 100)
-        self.font_info = pygame.font.Font(None, 36)
+        self.font_title = get_font(100)
+        self.font_info = get_font(36)
         self.background_color = (135, 206, 235)
         self.title_color = (255, 215, 0)
 
@@ -895,7 +1054,7 @@ class TitleScreen:
 class StartButton:
     def __init__(self, x, y, width, height, text="START"):
         self.rect = pygame.Rect(x, y, width, height)
-        self.font = pygame.font.Font(None, 48)
+        self.font = get_font(48)
         self.color = (50, 205, 50)  # Green
         self.hover = False
         self.text = text
@@ -921,7 +1080,7 @@ class StartButton:
 class InfoButton:
     def __init__(self, x, y, width, height):
         self.rect = pygame.Rect(x, y, width, height)
-        self.font = pygame.font.Font(None, 36)
+        self.font = get_font(36)
         self.color = (50, 205, 50)
         self.hover = False
 
@@ -955,8 +1114,8 @@ class InfoPopup:
             self.width,
             self.height,
         )
-        self.font_title = pygame.font.Font(None, 36)
-        self.font_text = pygame.font.Font(None, 24)
+        self.font_title = get_font(36)
+        self.font_text = get_font(24)
         self.close_button = pygame.Rect(
             self.rect.right - 40, self.rect.top + 10, 30, 30
         )
@@ -1026,8 +1185,8 @@ class InfoPopup:
 
 class PlayerLoginScreen:
     def __init__(self):
-        self.font_title = pygame.font.Font(None, 64)
-        self.font_text = pygame.font.Font(None, 36)
+        self.font_title = get_font(64)
+        self.font_text = get_font(36)
         self.background_color = (135, 206, 235)
         self.input_box = pygame.Rect(
             WINDOW_WIDTH // 2 - 100, WINDOW_HEIGHT // 2, 200, 32
@@ -1097,18 +1256,18 @@ class PlayerLoginScreen:
 
 class WaitingScreen:
     def __init__(self, player_name):
-        self.font_title = pygame.font.Font(None, 64)
-        self.font_text = pygame.font.Font(None, 36)
+        self.font_title = get_font(64)
+        self.font_text = get_font(36)
         self.background_color = (135, 206, 235)
         self.player_name = player_name
         self.dots = ""
-        self.dot_timer = 0
+        self.dot_timer = pygame.time.get_ticks()
 
     def update(self):
-        self.dot_timer += 1
-        if self.dot_timer > 30:  # Update dots every half second
+        now = pygame.time.get_ticks()
+        if now - self.dot_timer >= DOT_INTERVAL:  # Update dots every half second
             self.dots = "." * ((len(self.dots) + 1) % 4)
-            self.dot_timer = 0
+            self.dot_timer = now
 
     def draw(self, screen):
         screen.fill(self.background_color)
@@ -1134,21 +1293,21 @@ class WaitingScreen:
 
 class LobbyScreen:
     def __init__(self, player_name, network):
-        self.font_title = pygame.font.Font(None, 64)
-        self.font_text = pygame.font.Font(None, 36)
+        self.font_title = get_font(64)
+        self.font_text = get_font(36)
         self.background_color = (135, 206, 235)
         self.player_name = player_name
         self.network = network
         self.status_message = "Connecting to server..."
         self.dots = ""
-        self.dot_timer = 0
+        self.dot_timer = pygame.time.get_ticks()
         self.connection_status = "connecting"  # connecting, waiting, matched, error
 
     def update(self):
-        self.dot_timer += 1
-        if self.dot_timer > 30:
+        now = pygame.time.get_ticks()
+        if now - self.dot_timer >= DOT_INTERVAL:
             self.dots = "." * ((len(self.dots) + 1) % 4)
-            self.dot_timer = 0
+            self.dot_timer = now
 
         # Check server status
         try:
@@ -1218,89 +1377,174 @@ class LobbyScreen:
         screen.blit(status_text, status_rect)
 
 
-def start_game():
-    # Create and shuffle the decks
-    player_deck, computer_deck = create_deck()
+class SinglePlayerGame:
+    def __init__(self, seed=None):
+        # Everything here is built once and reset in place for every replay
+        self.cards = create_cards()
 
-    # Deal cards to both players from their respective decks
-    player_hand = deal_cards(player_deck, 5)
-    computer_hand = deal_cards(computer_deck, 5)
+        # The first game is played with the seed given, and each game after
+        # it gets its own seed drawn from this, so with a seed the whole run
+        # of games is reproducible. Without one the first seed is drawn too.
+        self.seeds = random.Random(seed)
 
-    # Remove dealt cards from decks
-    for card in player_hand:
-        player_deck.remove(card)
-    for card in computer_hand:
-        computer_deck.remove(card)
+        # Create the play areas
+        self.player_play_area = PlayArea(
+            50, WINDOW_HEIGHT // 2 - CARD_HEIGHT // 2, CARD_WIDTH + 20, CARD_HEIGHT + 20
+        )
+        self.computer_play_area = PlayArea(
+            WINDOW_WIDTH - CARD_WIDTH - 70,
+            WINDOW_HEIGHT // 2 - CARD_HEIGHT // 2,
+            CARD_WIDTH + 20,
+            CARD_HEIGHT + 20,
+        )
 
-    # Create the play areas
-    player_play_area = PlayArea(
-        50, WINDOW_HEIGHT // 2 - CARD_HEIGHT // 2, CARD_WIDTH + 20, CARD_HEIGHT + 20
-    )
-    computer_play_area = PlayArea(
-        WINDOW_WIDTH - CARD_WIDTH - 70,
-        WINDOW_HEIGHT // 2 - CARD_HEIGHT // 2,
-        CARD_WIDTH + 20,
-        CARD_HEIGHT + 20,
-    )
+        # Create the scoreboard first
+        self.scoreboard = ScoreBoard()
 
-    # Create the scoreboard first
-    scoreboard = ScoreBoard()
+        # Create the computer player with scoreboard
+        self.computer = ComputerPlayer([], self.computer_play_area, self.scoreboard)
 
-    # Create the computer player with scoreboard
-    computer = ComputerPlayer(computer_hand, computer_play_area, scoreboard)
+        # Create the GO button
+        self.go_button = Button(
+            WINDOW_WIDTH - 120, WINDOW_HEIGHT - 70, BUTTON_WIDTH, BUTTON_HEIGHT
+        )
 
-    # Create the GO button
-    go_button = Button(
-        WINDOW_WIDTH - 120, WINDOW_HEIGHT - 70, BUTTON_WIDTH, BUTTON_HEIGHT
-    )
+        # Create the header
+        self.header = Header()
+
+        # Create end screen
+        self.end_screen = EndScreen()
+
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        # Every shuffle, deal and computer choice comes from self.rng, so
+        # the same seed and the same plays give the same game
+        if seed is None:
+            seed = self.seeds.getrandbits(32)
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+        for card in self.cards:
+            card.reset()
+
+        # Shuffle the cards into the two decks
+        self.player_deck, self.computer_deck = create_deck(self.cards, self.rng)
+
+        # Deal cards to both players from their respective decks
+        self.player_hand = deal_cards(self.player_deck, 5, self.rng)
+        computer_hand = deal_cards(self.computer_deck, 5, self.rng)
+
+        # Remove dealt cards from decks
+        for card in self.player_hand:
+            self.player_deck.remove(card)
+        for card in computer_hand:
+            self.computer_deck.remove(card)
+
+        self.player_play_area.reset()
+        self.computer_play_area.reset()
+        self.scoreboard.reset()
+        self.computer.reset(computer_hand, self.rng)
+        self.go_button.active = False
+        self.header.reset()
+        self.end_screen.reset()
+        self.end_screen_started = False
+
+        # Position the player's cards in the dock
+        dock_start_x = (
+            WINDOW_WIDTH
+            - (CARD_WIDTH * len(self.player_hand) + CARD_SPACING * (len(self.player_hand) - 1))
+        ) // 2
+        dock_y = WINDOW_HEIGHT - DOCK_HEIGHT + 25
 
-    # Create the header
-    header = Header()
+        for i, card in enumerate(self.player_hand):
+            card.set_position(dock_start_x + i * (CARD_WIDTH + CARD_SPACING), dock_y)
 
-    # Create end screen
-    end_screen = EndScreen()
-    end_screen_started = False
+        self.computer_play_time = None
+        self.resolving_round = False
+        self.resolution_start_time = None
 
-    # Position the player's cards in the dock
-    dock_start_x = (
-        WINDOW_WIDTH
-        - (CARD_WIDTH * len(player_hand) + CARD_SPACING * (len(player_hand) - 1))
-    ) // 2
-    dock_y = WINDOW_HEIGHT - DOCK_HEIGHT + 25
+        # Game time in milliseconds, advanced only by update()
+        self.time = 0
 
-    for i, card in enumerate(player_hand):
-        card.set_position(dock_start_x + i * (CARD_WIDTH + CARD_SPACING), dock_y)
+    def run(self, frame_callback=None, fps=FPS):
+        # Returns the next scene: "title" after Play Again, or "quit"
+        scheduler = FrameScheduler(fps)
+        accumulator = 0
+        last_frame = pygame.time.get_ticks()
 
-    running = True
-    clock = pygame.time.Clock()
-    computer_play_time = None
-    resolving_round = False
-    resolution_start_time = None
+        while True:
+            for event in scheduler.get_events(self.is_busy()):
+                if event.type == pygame.QUIT:
+                    return "quit"
+                if self.handle_event(event):
+                    return "title"
+
+            # Run game logic in fixed SIM_STEP increments to cover the real
+            # time that passed, so behaviour doesn't depend on the frame rate;
+            # drawing then blends between the last two steps
+            now = pygame.time.get_ticks()
+            accumulator += min(now - last_frame, MAX_FRAME_TIME)
+            last_frame = now
+            while accumulator >= SIM_STEP:
+                self.update()
+                accumulator -= SIM_STEP
+
+            self.draw(screen, accumulator / SIM_STEP)
 
-    while running:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
+            pygame.display.flip()
+            scheduler.tick()
+
+            if frame_callback and frame_callback(self):
+                return "quit"
+
+    def is_busy(self):
+        # True while anything on screen moves or a game timer is about to fire;
+        # the player's turn countdown alone is fine at the idle rate
+        return (
+            self.resolving_round
+            or not self.header.is_player_turn
+            or self.header.game_over
+            or self.header.reveal_message is not None
+            or self.scoreboard.reveal_computer_cards
+            or self.computer.animating_new_card
+            or any(card.animating for card in self.player_hand)
+        )
 
-            if header.game_over:
-                if end_screen.handle_event(event):
-                    return main()  # Restart the game
-            elif header.is_player_turn and not resolving_round:
-                # Handle card dragging during player's turn
-                for card in player_hand:
-                    card.handle_event(event, player_play_area, go_button)
+    def handle_event(self, event):
+        # Returns True when Play Again is clicked on the end screen
+        header = self.header
+        go_button = self.go_button
 
-                # Handle GO button click
-                if event.type == pygame.MOUSEBUTTONDOWN and go_button.active:
-                    if go_button.rect.collidepoint(event.pos):
-                        header.switch_turn()
-                        go_button.active = False
+        if header.game_over:
+            return self.end_screen.handle_event(event)
+        elif header.is_player_turn and not self.resolving_round:
+            # Handle card dragging during player's turn
+            for card in self.player_hand:
+                card.handle_event(event, self.player_play_area, go_button)
+
+            # Handle GO button click
+            if event.type == pygame.MOUSEBUTTONDOWN and go_button.active:
+                if go_button.rect.collidepoint(event.pos):
+                    header.switch_turn(self.time)
+                    go_button.active = False
+        return False
+
+    def update(self):
+        # Advance the game by one fixed SIM_STEP
+        self.time += SIM_STEP
+        now = self.time
+        header = self.header
+        scoreboard = self.scoreboard
+        player_hand = self.player_hand
+        player_play_area = self.player_play_area
+        computer_play_area = self.computer_play_area
 
         # Check if timer expired
-        if header.update() and not resolving_round:
+        if header.update(now) and not self.resolving_round:
             if header.is_player_turn and player_play_area.card:
-                header.switch_turn()
-                go_button.active = False
+                header.switch_turn(now)
+                self.go_button.active = False
             elif header.is_player_turn:
                 if player_play_area.card:
                     player_play_area.card.rect.x, player_play_area.card.rect.y = (
@@ -1309,20 +1553,20 @@ def start_game():
                     player_play_area.remove_card()
 
         # Handle computer's turn
-        if not header.game_over and not header.is_player_turn and not resolving_round:
-            if computer_play_time is None:
-                computer_play_time = pygame.time.get_ticks() + COMPUTER_TURN_DELAY
-            elif pygame.time.get_ticks() >= computer_play_time:
-                computer.play_card()
-                resolving_round = True
-                resolution_start_time = pygame.time.get_ticks()
+        if not header.game_over and not header.is_player_turn and not self.resolving_round:
+            if self.computer_play_time is None:
+                self.computer_play_time = now + COMPUTER_TURN_DELAY
+            elif now >= self.computer_play_time:
+                self.computer.play_card()
+                self.resolving_round = True
+                self.resolution_start_time = now
 
         # Handle round resolution
-        if resolving_round:
-            current_time = pygame.time.get_ticks()
+        if self.resolving_round:
+            current_time = now
 
             # First phase: Show winner highlight
-            if current_time - resolution_start_time < COMPARISON_PAUSE:
+            if current_time - self.resolution_start_time < COMPARISON_PAUSE:
                 # Compare cards and highlight winner
                 player_card = player_play_area.card
                 computer_card = computer_play_area.card
@@ -1335,7 +1579,7 @@ def start_game():
                     computer_play_area.highlight = not player_wins
 
             # Second phase: Process round end and deal new cards
-            elif current_time - resolution_start_time >= COMPARISON_PAUSE:
+            elif current_time - self.resolution_start_time >= COMPARISON_PAUSE:
                 player_card = player_play_area.card
                 computer_card = computer_play_area.card
 
@@ -1344,9 +1588,9 @@ def start_game():
                 # Add winning card to score display (skip if draw)
                 if player_wins is not None:  # Only add win if not a draw
                     if player_wins:
-                        scoreboard.add_win(player_card, True, header)
+                        scoreboard.add_win(player_card, True, header, now)
                     else:
-                        scoreboard.add_win(computer_card, False, header)
+                        scoreboard.add_win(computer_card, False, header, now)
 
                 # Check if game is over
                 if scoreboard.player_score >= 4:
@@ -1368,17 +1612,20 @@ def start_game():
                     cards_needed = 5 - len(player_hand)
 
                     # Deal new cards if there are cards left in the deck
-                    if len(player_deck) > 0 and cards_needed > 0:
+                    new_player_cards = []
+                    if len(self.player_deck) > 0 and cards_needed > 0:
                         # Deal to player from player deck
                         new_player_cards = deal_cards(
-                            player_deck, min(cards_needed, len(player_deck))
+                            self.player_deck,
+                            min(cards_needed, len(self.player_deck)),
+                            self.rng,
                         )
                         player_hand.extend(new_player_cards)
 
                         # Deal to computer from computer deck
-                        if len(computer_deck) > 0:
-                            new_computer_card = deal_cards(computer_deck, 1)[0]
-                            computer.add_card(new_computer_card)
+                        if len(self.computer_deck) > 0:
+                            new_computer_card = deal_cards(self.computer_deck, 1, self.rng)[0]
+                            self.computer.add_card(new_computer_card, now)
                     # Reposition all player cards including the new ones
                     dock_start_x = (
                         WINDOW_WIDTH
@@ -1392,7 +1639,7 @@ def start_game():
                             dock_y,
                         )
                         if card in new_player_cards:  # If it's a new card, animate it
-                            card.start_deal_animation(target_pos)
+                            card.start_deal_animation(target_pos, now)
                         else:  # Otherwise just reposition it
                             card.set_position(*target_pos)
                             card.original_pos = target_pos
@@ -1404,31 +1651,36 @@ def start_game():
                     scoreboard.new_round()
 
                 # Reset for next round
-                resolving_round = False
-                computer_play_time = None
+                self.resolving_round = False
+                self.computer_play_time = None
                 player_play_area.highlight = False
                 computer_play_area.highlight = False
                 if not header.game_over:
-                    header.switch_turn()
+                    header.switch_turn(now)
 
         # Update animations
         for card in player_hand:
-            card.update_animation()
-        computer.update_animation()
+            card.update_animation(now)
+        self.computer.update_animation(now)
 
         # Handle end screen
-        if header.game_over and not end_screen_started:
-            end_screen_started = True
-            end_screen.start_animation()
+        if header.game_over and not self.end_screen_started:
+            self.end_screen_started = True
+            self.end_screen.start_animation(now, self.rng.getrandbits(32))
 
         if header.game_over:
-            end_screen.update()
+            self.end_screen.update(now)
+
+    def draw(self, surface, interpolation=1.0):
+        # interpolation is how far real time is between the last simulation
+        # step and the next one (0-1), used to smooth moving objects
+        player_hand = self.player_hand
 
         # Draw everything
         draw_game_board()
 
         # Draw instructions image in center
-        screen.blit(instructions_img, instructions_rect)
+        surface.blit(instructions_img, instructions_rect)
 
         # Find the currently dragged card (if any)
         dragged_card = None
@@ -1440,54 +1692,50 @@ def start_game():
         # Draw non-dragged player cards
         for card in player_hand:
             if not card.dragging:
-                card.draw(screen)
+                card.draw(surface, interpolation)
 
         # Draw computer's cards (backs)
-        computer.draw(screen)
+        self.computer.draw(surface, interpolation)
 
         # Draw play areas and their cards
-        player_play_area.draw(screen)
-        computer_play_area.draw(screen)
+        self.player_play_area.draw(surface)
+        self.computer_play_area.draw(surface)
 
         # Draw the dragged card last (on top)
         if dragged_card:
-            dragged_card.draw(screen)
+            dragged_card.draw(surface)
 
         # Draw the GO button
-        go_button.draw(screen)
+        self.go_button.draw(surface)
 
         # Draw the header
-        header.draw(screen)
+        self.header.draw(surface)
 
         # Draw the scoreboard
-        scoreboard.draw(screen)
+        self.scoreboard.draw(surface)
 
         # Draw end screen if game is over
-        if header.game_over:
-            end_screen.draw(
-                screen,
-                header.winner,
-                scoreboard.player_score,
-                scoreboard.computer_score,
+        if self.header.game_over:
+            self.end_screen.draw(
+                surface,
+                self.header.winner,
+                self.scoreboard.player_score,
+                self.scoreboard.computer_score,
+                interpolation,
+                self.seed,
             )
 
-        pygame.display.flip()
-        clock.tick(60)
-
-    pygame.quit()
-    sys.exit()
-
 
 def start_online_game():
     # Show login screen first
     login_screen = PlayerLoginScreen()
     player_name = None
     running = True
-    clock = pygame.time.Clock()
+    scheduler = FrameScheduler()
 
     # Get player name
     while running and player_name is None:
-        for event in pygame.event.get():
+        for event in scheduler.get_events():
             if event.type == pygame.QUIT:
                 running = False
 
@@ -1497,7 +1745,7 @@ def start_online_game():
 
         login_screen.draw(screen)
         pygame.display.flip()
-        clock.tick(60)
+        scheduler.tick()
 
     if player_name and running:
         network = NetworkGame()
@@ -1509,8 +1757,10 @@ def start_online_game():
             lobby = LobbyScreen(player_name, network)
             in_lobby = True
 
+            # The lobby polls the server every frame, which the idle rate
+            # keeps at IDLE_FPS while nothing else is happening
             while running and in_lobby:
-                for event in pygame.event.get():
+                for event in scheduler.get_events():
                     if event.type == pygame.QUIT:
                         running = False
 
@@ -1522,7 +1772,7 @@ def start_online_game():
 
                 lobby.draw(screen)
                 pygame.display.flip()
-                clock.tick(60)
+                scheduler.tick()
         else:
             print("Failed to connect to server")
 
@@ -1557,6 +1807,8 @@ def start_multiplayer_game(network, player_name):
             WINDOW_WIDTH - 120, WINDOW_HEIGHT - 70, BUTTON_WIDTH, BUTTON_HEIGHT
         )
 
+        latency_hud = LatencyHud(network)
+
         # Get initial game state
         game_state = network.game_state
         if not game_state:
@@ -1586,11 +1838,9 @@ def start_multiplayer_game(network, player_name):
         else:
             hand_data = game_state["player2"]["hand"]
 
-        # Convert server card data to Card objects
-        for suit, value in hand_data:
-            image_path = os.path.join("Cards (large)", f"card_{suit}_{str(value).zfill(2)}.png")
-            card = Card(suit, value, image_path)
-            player_hand.append(card)
+        # Card ids from the server become Card objects to draw
+        for card in hand_data:
+            player_hand.append(card_view(card))
 
         # Position cards
         dock_start_x = (
@@ -1602,24 +1852,51 @@ def start_multiplayer_game(network, player_name):
         for i, card in enumerate(player_hand):
             card.set_position(dock_start_x + i * (CARD_WIDTH + CARD_SPACING), dock_y)
 
-        # Initialize timer
-        turn_timer = TIMER_DURATION
-        last_timer_update = pygame.time.get_ticks()
         dragged_card = None  # Initialize dragged_card
+        resumes = network.resumes  # reconnects after a dropped connection
 
         running = True
-        clock = pygame.time.Clock()
+        scheduler = FrameScheduler()
 
         # Load face-down card image
-        card_back_image = pygame.image.load(
-            os.path.join("Cards (large)", "card_back.png")
-        )
-        card_back_image = pygame.transform.scale(
-            card_back_image, (CARD_WIDTH, CARD_HEIGHT)
+        card_back_image = load_image(
+            os.path.join("Cards (large)", "card_back.png"), (CARD_WIDTH, CARD_HEIGHT)
         )
 
         while running:
             current_time = pygame.time.get_ticks()
+            frame_start_state = game_state
+
+            # Measure latency every PING_INTERVAL; the state that comes
+            # back with the pong is picked up by get_state below
+            network.ping_if_due()
+
+            # The connection dropped and NetworkGame got us back into the
+            # match; anything we sent meanwhile may be lost, so redraw the
+            # hand, play areas and turn from the server's snapshot
+            if network.resumes != resumes and network.game_state:
+                resumes = network.resumes
+                game_state = network.game_state
+                me = game_state["player1" if network.player_num == 1 else "player2"]
+                player_hand = [card_view(card) for card in me["hand"]]
+                dock_start_x = (
+                    WINDOW_WIDTH
+                    - (CARD_WIDTH * len(player_hand) + CARD_SPACING * (len(player_hand) - 1))
+                ) // 2
+                for i, card in enumerate(player_hand):
+                    card.set_position(dock_start_x + i * (CARD_WIDTH + CARD_SPACING), dock_y)
+                player_play_area.remove_card()
+                opponent_play_area.remove_card()
+                if me["played_card"] is not None:
+                    player_play_area.add_card(card_view(me["played_card"]))
+                header.is_player_turn = (
+                    game_state["current_turn"] == player_name and me["played_card"] is None
+                )
+                header.current_turn = (
+                    "YOUR TURN" if header.is_player_turn else f"{opponent_name}'s TURN"
+                )
+                go_button.active = False
+                print(f"Resumed game {network.game_id}")
 
             # Update game state
             try:
@@ -1636,7 +1913,7 @@ def start_multiplayer_game(network, player_name):
                             opponent_played_card = new_state["player1"]["played_card"]
 
                         # Update opponent's play area if they played a card
-                        if opponent_played_card and not opponent_play_area.card:
+                        if opponent_played_card is not None and not opponent_play_area.card:
                             # Create a face-down card initially
                             face_down_card = Card(
                                 "back",
@@ -1660,15 +1937,8 @@ def start_multiplayer_game(network, player_name):
                                 opp_card = new_state["player1"]["played_card"]
 
                             # Show actual card immediately when both have played
-                            if opp_card:
-                                opp_card_obj = Card(
-                                    opp_card[0],
-                                    opp_card[1],
-                                    os.path.join(
-                                        "Cards (large)",
-                                        f"card_{opp_card[0]}_{str(opp_card[1]).zfill(2)}.png",
-                                    ),
-                                )
+                            if opp_card is not None:
+                                opp_card_obj = card_view(opp_card)
                                 opponent_play_area.add_card(opp_card_obj)
                                 print("Revealing opponent's actual card for comparison")
 
@@ -1690,11 +1960,11 @@ def start_multiplayer_game(network, player_name):
                                 # Update scoreboard with winning card
                                 if (network.player_num == 1 and winner == "player1") or (network.player_num == 2 and winner == "player2"):
                                     winning_card = player_play_area.card
-                                    scoreboard.add_win(winning_card, True, header)
+                                    scoreboard.add_win(winning_card, True, header, pygame.time.get_ticks())
                                     print("Added winning card to player's scoreboard")
                                 else:
                                     winning_card = opponent_play_area.card
-                                    scoreboard.add_win(winning_card, False, header)
+                                    scoreboard.add_win(winning_card, False, header, pygame.time.get_ticks())
                                     print("Added winning card to opponent's scoreboard")
                                 
                                 # Show comparison for a moment
@@ -1718,10 +1988,8 @@ def start_multiplayer_game(network, player_name):
                                 
                                 # Convert new hand data to Card objects and position them
                                 player_hand = []
-                                for suit, value in hand_data:
-                                    image_path = os.path.join("Cards (large)", f"card_{suit}_{str(value).zfill(2)}.png")
-                                    card = Card(suit, value, image_path)
-                                    player_hand.append(card)
+                                for card in hand_data:
+                                    player_hand.append(card_view(card))
                                 
                                 # Position new cards
                                 dock_start_x = (WINDOW_WIDTH - (CARD_WIDTH * len(player_hand) + CARD_SPACING * (len(player_hand) - 1))) // 2
@@ -1740,10 +2008,6 @@ def start_multiplayer_game(network, player_name):
                                 "YOUR TURN" if is_my_turn else f"{opponent_name}'s TURN"
                             )
 
-                            if is_my_turn:
-                                turn_timer = TIMER_DURATION
-                                last_timer_update = current_time
-
                             print(f"Turn changed to: {header.current_turn}")
 
                         game_state = new_state
@@ -1752,12 +2016,12 @@ def start_multiplayer_game(network, player_name):
                 print(f"Current state: {game_state}")
                 running = False
 
-            # Update timer only if it's player's turn
-            if header.is_player_turn:
-                if current_time - last_timer_update >= 1000:
-                    turn_timer -= 1
-                    last_timer_update = current_time
-                    print(f"Timer: {turn_timer}")
+            # The server runs the turn clock and plays for us when it runs
+            # out; count down to its deadline rather than keep our own
+            deadline = game_state.get("turn_deadline")
+            if deadline is not None:
+                header.timer.duration = game_state.get("turn_timeout") or TIMER_DURATION
+                header.timer.time_left = max(0, math.ceil(deadline - network.server_time()))
 
             # Find currently dragged card
             dragged_card = None
@@ -1766,10 +2030,18 @@ def start_multiplayer_game(network, player_name):
                     dragged_card = card
                     break
 
-            # Handle events
-            for event in pygame.event.get():
+            # Handle events, staying at full rate whenever the server state
+            # changed or something is dragged or highlighted
+            busy = (
+                game_state != frame_start_state
+                or dragged_card is not None
+                or player_play_area.highlight
+                or opponent_play_area.highlight
+            )
+            for event in scheduler.get_events(busy):
                 if event.type == pygame.QUIT:
                     running = False
+                latency_hud.handle_event(event)
 
                 # Only handle card events if it's player's turn
                 if header.is_player_turn:
@@ -1782,7 +2054,7 @@ def start_multiplayer_game(network, player_name):
                     if event.type == pygame.MOUSEBUTTONDOWN and go_button.active:
                         if go_button.rect.collidepoint(event.pos):
                             if player_play_area.card:
-                                network.play_card((player_play_area.card.suit, player_play_area.card.value))
+                                network.play_card(player_play_area.card.id)
                                 if player_play_area.card in player_hand:
                                     player_hand.remove(player_play_area.card)
                                 header.is_player_turn = False
@@ -1801,10 +2073,6 @@ def start_multiplayer_game(network, player_name):
                             is_my_turn = new_state["current_turn"] == player_name
                             header.is_player_turn = is_my_turn
                             header.current_turn = "YOUR TURN" if is_my_turn else f"{opponent_name}'s TURN"
-                            
-                            if is_my_turn:
-                                turn_timer = TIMER_DURATION
-                                last_timer_update = current_time
                 
                         # Check for opponent's played card
                         if network.player_num == 1:
@@ -1825,6 +2093,10 @@ def start_multiplayer_game(network, player_name):
                 print(f"Error updating game state: {e}")
                 running = False
 
+            # Fade the reveal message on the wall clock; online play is paced
+            # by the server rather than a fixed-step simulation
+            header.update_reveal_message(current_time)
+
             # Draw everything
             draw_game_board()
             
@@ -1840,50 +2112,74 @@ def start_multiplayer_game(network, player_name):
             go_button.draw(screen)
             header.draw(screen)
             scoreboard.draw(screen)
+            latency_hud.draw(screen)
 
             # Draw the dragged card last (on top)
             if dragged_card:
                 dragged_card.draw(screen)
 
             pygame.display.flip()
-            clock.tick(60)
+            scheduler.tick()
 
     except Exception as e:
         print(f"Error in multiplayer game: {e}")
         print(f"Game state: {network.game_state}")  # Additional debug info
 
 
-def main():
-    # Create title screen
-    title_screen = TitleScreen()
-    game_mode = None
-    running = True
-    clock = pygame.time.Clock()
+def run_title_screen(title_screen, frame_callback=None, fps=FPS):
+    # Returns the next scene: "singleplayer", "multiplayer" or "quit"
+    scheduler = FrameScheduler(fps)
 
-    while running and game_mode is None:
-        for event in pygame.event.get():
+    while True:
+        for event in scheduler.get_events():
             if event.type == pygame.QUIT:
-                running = False
+                return "quit"
 
             # Handle title screen events
             result = title_screen.handle_event(event)
             if result:
-                game_mode = result
+                return result
 
         # Draw title screen
         title_screen.draw(screen)
         pygame.display.flip()
-        clock.tick(60)
+        scheduler.tick()
 
-    if running:
-        if game_mode == "singleplayer":
-            start_game()  # Existing single player game
-        elif game_mode == "multiplayer":
-            start_online_game()
+        if frame_callback and frame_callback(title_screen):
+            return "quit"
 
-    pygame.quit()
-    sys.exit()
+
+def main(frame_callback=None, fps=FPS, seed=None):
+    # Scene state machine: title -> game -> end screen -> title -> ...
+    # Screens are created once and reset in place on replay, so a long session
+    # keeps a flat stack and reuses loaded images and fonts.
+    # frame_callback(scene) is called once per frame after drawing so a script
+    # (e.g. bench_render.py) can post input events; returning True quits.
+    # seed makes the single player games reproducible, see SinglePlayerGame;
+    # the end screen shows each game's seed for playing it again.
+    title_screen = TitleScreen()
+    single_player_game = None
+    scene = "title"
+
+    while scene != "quit":
+        if scene == "title":
+            scene = run_title_screen(title_screen, frame_callback, fps)
+        elif scene == "singleplayer":
+            if single_player_game is None:
+                single_player_game = SinglePlayerGame(seed)
+            else:
+                single_player_game.reset()
+            scene = single_player_game.run(frame_callback, fps)
+        elif scene == "multiplayer":
+            start_online_game()
+            scene = "quit"
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Card-Jitsu")
+    parser.add_argument(
+        "--seed", type=int, help="seed for the first single player game, as on its end screen"
+    )
+    main(seed=parser.parse_args().seed)
+    pygame.quit()
+    sys.exit()
@@ -0,0 +1,177 @@
+# Compact card model shared by the server, the bots and the client's rules.
+#
+# A card is a small int, 0-26: suit index * 9 + (value - 2). The rules
+# (compare, matches) are table lookups on those ints, a hand is a count per
+# card id, and a win history is a short byte array. The client's Card class
+# is only a view of a card id for drawing.
+#
+#   card = card_id("hearts", 7)   # 5
+#   to_tuple(card)                # ("hearts", 7)
+#   compare(card, card_id("spades", 3))   # 0 draw, 1 first wins, 2 second wins
+
+import itertools
+
+SUITS = ["hearts", "diamonds", "spades"]
+VALUES = range(2, 11)
+NUM_CARDS = len(SUITS) * len(VALUES)
+
+# Each suit beats one other: diamonds > spades > hearts > diamonds
+BEATS = {"diamonds": "spades", "spades": "hearts", "hearts": "diamonds"}
+
+# Lookup tables, indexed by card id
+SUIT_OF = [suit for suit in SUITS for _ in VALUES]
+VALUE_OF = [value for _ in SUITS for value in VALUES]
+TUPLES = [(suit, value) for suit in SUITS for value in VALUES]
+IDS = {card: index for index, card in enumerate(TUPLES)}
+
+
+def card_id(suit, value):
+    return IDS[(suit, value)]
+
+
+def to_tuple(card):
+    return TUPLES[card]
+
+
+def suit(card):
+    return SUIT_OF[card]
+
+
+def value(card):
+    return VALUE_OF[card]
+
+
+def parse(card):
+    # A card id from an int or a (suit, value) pair, e.g. from a client or
+    # the match log; None if it isn't a card
+    if isinstance(card, int) and not isinstance(card, bool):
+        return card if 0 <= card < NUM_CARDS else None
+    try:
+        return IDS.get(tuple(card))
+    except TypeError:
+        return None
+
+
+def _result(first, second):
+    if first == second:
+        return 0
+    suit1, value1 = TUPLES[first]
+    suit2, value2 = TUPLES[second]
+    if suit1 == suit2:
+        return 1 if value1 > value2 else 2
+    return 1 if BEATS[suit1] == suit2 else 2
+
+
+# Every pairing worked out once: RESULTS[first * NUM_CARDS + second]
+RESULTS = bytes(_result(a, b) for a in range(NUM_CARDS) for b in range(NUM_CARDS))
+MATCHES = bytes(
+    SUIT_OF[a] == SUIT_OF[b] or VALUE_OF[a] == VALUE_OF[b]
+    for a in range(NUM_CARDS)
+    for b in range(NUM_CARDS)
+)
+
+
+def compare(first, second):
+    # 0 for a draw (the same card), 1 if first wins, 2 if second wins
+    return RESULTS[first * NUM_CARDS + second]
+
+
+def matches(first, second):
+    # Same suit or same value
+    return bool(MATCHES[first * NUM_CARDS + second])
+
+
+class Hand:
+    # A multiset of card ids as a count per card, so adding, removing and
+    # membership don't depend on the hand's size. Iterates in card id order.
+    # Pickles as a plain list of ids, so a game_state holding Hands reaches
+    # clients as lists.
+    __slots__ = ("counts", "size", "ids")
+
+    def __init__(self, cards=()):
+        self.counts = bytearray(NUM_CARDS)
+        self.size = 0
+        self.ids = None  # list(self), until the hand changes
+        for card in cards:
+            self.add(card)
+
+    def add(self, card):
+        self.counts[card] += 1
+        self.size += 1
+        self.ids = None
+
+    def remove(self, card):
+        # Returns False if the card isn't in the hand
+        if not self.counts[card]:
+            return False
+        self.counts[card] -= 1
+        self.size -= 1
+        self.ids = None
+        return True
+
+    def count(self, card):
+        return self.counts[card]
+
+    def __contains__(self, card):
+        return 0 <= card < NUM_CARDS and self.counts[card] > 0
+
+    def __len__(self):
+        return self.size
+
+    def to_list(self):
+        # The ids in order. Hands are sent to clients far more often than
+        # they change, so this is kept until the next add() or remove().
+        # Don't modify the list returned.
+        if self.ids is None:
+            held = list(itertools.compress(range(NUM_CARDS), self.counts))
+            if len(held) < self.size:
+                held = [card for card in held for _ in range(self.counts[card])]
+            self.ids = held
+        return self.ids
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __eq__(self, other):
+        return isinstance(other, Hand) and self.counts == other.counts
+
+    def __repr__(self):
+        return f"Hand({[to_tuple(card) for card in self]})"
+
+    def __reduce__(self):
+        return (list, (self.to_list(),))
+
+
+class WinHistory:
+    # The last few winning card ids, oldest first, in a fixed-size buffer
+    __slots__ = ("cards", "length")
+
+    def __init__(self, capacity=8):
+        self.cards = bytearray(capacity)
+        self.length = 0
+
+    def append(self, card):
+        if self.length == len(self.cards):
+            # Full: keep the newest, only the last ones matter to the rules
+            self.cards[:-1] = self.cards[1:]
+            self.length -= 1
+        self.cards[self.length] = card
+        self.length += 1
+
+    def clear(self):
+        self.length = 0
+
+    def last(self, count=1):
+        return list(self.cards[max(self.length - count, 0):self.length])
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return iter(self.cards[:self.length])
+
+    def last_two_match(self):
+        # The last two wins share a suit or a value
+        if self.length < 2:
+            return False
+        return matches(self.cards[self.length - 1], self.cards[self.length - 2])
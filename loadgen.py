@@ -0,0 +1,213 @@
+# Load generator for server.py.
+#
+# Runs many headless bots (bot.py) concurrently from one process, one thread
+# per bot, each playing a full match against whichever bot the server pairs
+# it with. Reports matches per second, request round-trip latency
+# percentiles and error counts.
+#
+#   python server.py &
+#   python loadgen.py --bots 200
+#   python loadgen.py --bots 2000 --ramp 0.002 --json results.json
+#   python loadgen.py --bots 2000 --connections 4   # multiplexed sockets
+#   python loadgen.py --url unix:///tmp/card_game.sock
+#   python loadgen.py --url inproc://bench --serve  # server in this process
+
+import argparse
+import contextlib
+import json
+import os
+import threading
+import time
+
+from bot import Bot, STRATEGIES
+from network import MuxConnection
+from transport import TcpTransport, from_url
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load(
+    bots,
+    host,
+    port,
+    strategy,
+    ramp,
+    timeout,
+    connections=0,
+    transport=None,
+    serve=False,
+    drop_rate=0.0,
+):
+    transport = transport or TcpTransport(host, port)
+
+    server = None
+    if serve:
+        # Import here so plain runs don't need the server's dependencies
+        import server as game_server
+
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            server = game_server.GameServer(transport=transport)
+        threading.Thread(target=server.start, daemon=True).start()
+
+    # With connections > 0 the bots share that many multiplexed sockets
+    muxes = []
+    for _ in range(connections):
+        mux = MuxConnection(transport=transport)
+        if not mux.connect():
+            raise SystemExit(f"could not open a multiplexed connection to {transport}")
+        muxes.append(mux)
+
+    players = [
+        Bot(
+            f"bot-{i}",
+            host,
+            port,
+            STRATEGIES[strategy],
+            timeout=timeout,
+            mux=muxes[i % len(muxes)] if muxes else None,
+            transport=transport,
+            drop_rate=drop_rate,
+        )
+        for i in range(bots)
+    ]
+    finished = []
+    lock = threading.Lock()
+
+    def run_bot(bot):
+        if bot.run():
+            with lock:
+                finished.append(bot)
+
+    threads = []
+    start = time.perf_counter()
+    # Bots print like the real client does; keep the report readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for bot in players:
+            thread = threading.Thread(target=run_bot, args=(bot,), daemon=True)
+            thread.start()
+            threads.append(thread)
+            if ramp:
+                time.sleep(ramp)
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - start
+    for mux in muxes:
+        mux.close()
+    if server is not None:
+        server.stop()
+
+    latencies = sorted(t * 1000 for bot in players for t in bot.latencies)
+    rtts = sorted(
+        bot.network.latency.rtt * 1000 for bot in players if bot.network.latency.rtt
+    )
+    # Both bots of a match report it as finished
+    matches = len(finished) / 2
+    return {
+        "bots": bots,
+        "connections": connections or bots,
+        "transport": str(transport),
+        "elapsed_s": elapsed,
+        "matches": matches,
+        "matches_per_s": matches / elapsed,
+        "requests": len(latencies),
+        # A resume nobody asked for is a connection the server dropped or
+        # stalled on, so it counts as an error
+        "errors": sum(bot.errors + bot.unexpected_resumes() for bot in players),
+        "unfinished_bots": bots - len(finished),
+        "resumes": sum(bot.network.resumes for bot in players),
+        "unexpected_resumes": sum(bot.unexpected_resumes() for bot in players),
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else 0.0,
+        },
+        # Smoothed ping round trip per bot
+        "rtt_ms": {
+            "p50": percentile(rtts, 50),
+            "p90": percentile(rtts, 90),
+            "max": rtts[-1] if rtts else 0.0,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for server.py")
+    parser.add_argument("--bots", type=int, default=100)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5555)
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), default="random")
+    parser.add_argument(
+        "--ramp", type=float, default=0.0, help="seconds between starting bots"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=120, help="seconds each bot gets per match"
+    )
+    parser.add_argument(
+        "--connections",
+        type=int,
+        default=0,
+        help="multiplex the bots over this many sockets (0 = one socket per bot)",
+    )
+    parser.add_argument(
+        "--url", help="server transport URL instead of --host/--port, see transport.py"
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="run the server in this process (needed for inproc:// URLs)",
+    )
+    parser.add_argument(
+        "--drop-rate",
+        type=float,
+        default=0.0,
+        help="chance per poll that a bot cuts its connection mid-match and resumes",
+    )
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = run_load(
+        args.bots,
+        args.host,
+        args.port,
+        args.strategy,
+        args.ramp,
+        args.timeout,
+        args.connections,
+        from_url(args.url) if args.url else None,
+        args.serve,
+        args.drop_rate,
+    )
+
+    print(
+        f"{results['bots']} bots over {results['connections']} connections "
+        f"({results['transport']}), "
+        f"{results['matches']:.0f} matches in {results['elapsed_s']:.2f}s"
+    )
+    print(f"matches/s: {results['matches_per_s']:.2f}")
+    print(
+        f"requests: {results['requests']}, errors: {results['errors']}, "
+        f"unfinished bots: {results['unfinished_bots']}, "
+        f"resumes: {results['resumes']} ({results['unexpected_resumes']} unexpected)"
+    )
+    print(
+        "latency ms: "
+        + ", ".join(f"{k} {v:.2f}" for k, v in results["latency_ms"].items())
+    )
+    print(
+        "ping rtt ms: "
+        + ", ".join(f"{k} {v:.2f}" for k, v in results["rtt_ms"].items())
+    )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+import argparse
+import bisect
+import collections
+import mmap
+import os
+import struct
+import threading
+import time
+
+import cards
+
+# Append-only binary log of every match the server plays.
+#
+# Each event is one fixed-size 32 byte record, so a reader can find record
+# n with a multiplication and a memory map instead of parsing the file from
+# the start. Files rotate every FILE_RECORDS records (32 MiB) and are never
+# rewritten:
+#
+#   matches-000001.log, matches-000002.log, ...
+#
+#   python server.py --match-log logs/
+#   python matchlog.py logs/                  # summary
+#   python matchlog.py logs/ --game 1234      # every event of one match
+
+# game_id, wall clock time, event, player, card suit, card value, a, b, text
+RECORD = struct.Struct("<QdBBBBBB10s")
+FILE_RECORDS = 1 << 20  # records per file before rotating
+FILE_PREFIX = "matches-"
+FILE_SUFFIX = ".log"
+
+# Events. player is 1 or 2 (0 when it doesn't apply); a and b are
+# per-event numbers and text a short string, see GameSession.log_event
+START = 1  # one per player: text = name, a = 1 if they go first
+DEAL = 2  # a card dealt into player's hand
+PLAY = 3  # player played card
+REVEAL = 4  # one per player: the card they played, turned face up
+RESULT = 5  # player = round winner (0 on a draw), card = winning card, a/b = scores
+END = 6  # text = end reason, player = match winner (0 if none), a/b = scores
+SEED = 7  # text = the session's RNG seed, 8 bytes little endian; see replay.py
+TIMEOUT = 8  # player ran out of time, a = turns in a row; a PLAY follows unless they forfeit
+NAME = 9  # text = more of player's name, after their START, for names over 10 bytes
+EVENT_NAMES = {
+    START: "start",
+    DEAL: "deal",
+    PLAY: "play",
+    REVEAL: "reveal",
+    RESULT: "result",
+    END: "end",
+    SEED: "seed",
+    TIMEOUT: "timeout",
+    NAME: "name",
+}
+
+SUITS = cards.SUITS
+NO_SUIT = 255
+
+Record = collections.namedtuple(
+    "Record", ["game_id", "time", "event", "player", "card", "a", "b", "text"]
+)
+
+
+def encode_card(card):
+    # Card id or (suit, value) -> (suit index, value); anything else, e.g.
+    # a bad card from a client, -> (NO_SUIT, 0)
+    card = cards.parse(card) if card is not None else None
+    if card is None:
+        return NO_SUIT, 0
+    return SUITS.index(cards.suit(card)), cards.value(card)
+
+
+def name_chunks(name, size=10):
+    # A name as pieces of at most size bytes of UTF-8, split between
+    # characters: the first goes in START, the rest in NAME records
+    if len(name.encode("utf-8")) <= size:
+        return [name]
+    chunks = [""]
+    for char in name:
+        if len((chunks[-1] + char).encode("utf-8")) > size:
+            chunks.append("")
+        chunks[-1] += char
+    return chunks
+
+
+def pack_record(game_id, when, event, player=0, card=None, a=0, b=0, text=""):
+    suit, value = encode_card(card)
+    if isinstance(text, str):
+        text = text.encode("utf-8")
+    return RECORD.pack(
+        game_id, when, event, player, suit, value, min(a, 255), min(b, 255), text[:10]
+    )
+
+
+def decode_record(fields):
+    game_id, when, event, player, suit, value, a, b, text = fields
+    card = (SUITS[suit], value) if suit < len(SUITS) else None
+    if event == SEED:
+        text = str(int.from_bytes(text[:8], "little"))
+    else:
+        text = text.rstrip(b"\0").decode("utf-8", "replace")
+    return Record(game_id, when, event, player, card, a, b, text)
+
+
+def log_files(directory):
+    names = [
+        name
+        for name in os.listdir(directory)
+        if name.startswith(FILE_PREFIX) and name.endswith(FILE_SUFFIX)
+    ]
+    return [os.path.join(directory, name) for name in sorted(names)]
+
+
+class MatchLog:
+    # Writer. append() is called from Scheduler workers of many sessions at
+    # once, so records go out under a lock; the file is buffered and flushed
+    # when a match ends, so a crash loses at most the unfinished matches.
+    # A durable log hands every record to the OS as it's written instead,
+    # so the server can rebuild unfinished matches from it after a crash
+    # (see SessionRegistry.restore); that survives the process dying, not
+    # the machine.
+    def __init__(self, directory, file_records=FILE_RECORDS, durable=False):
+        self.directory = directory
+        self.file_records = file_records
+        self.durable = durable
+        self.lock = threading.Lock()
+        self.file = None
+        self.records_in_file = 0
+        self.written = 0
+        os.makedirs(directory, exist_ok=True)
+
+        # Start a new file rather than append to one a crash may have cut
+        # off mid-record
+        existing = log_files(directory)
+        if existing:
+            last = os.path.basename(existing[-1])
+            self.index = int(last[len(FILE_PREFIX):-len(FILE_SUFFIX)])
+        else:
+            self.index = 0
+
+        # The newest match already logged, so a restarted server numbers
+        # its matches after it rather than from 0 again (SessionRegistry)
+        self.last_game_id = None
+        if existing:
+            reader = MatchLogReader(directory)
+            self.last_game_id = reader.last_start()
+            reader.close()
+
+    def rotate(self):
+        if self.file is not None:
+            self.file.close()
+        self.index += 1
+        path = os.path.join(self.directory, f"{FILE_PREFIX}{self.index:06d}{FILE_SUFFIX}")
+        self.file = open(path, "ab")
+        self.records_in_file = 0
+
+    def append(self, game_id, event, player=0, card=None, a=0, b=0, text=""):
+        with self.lock:
+            if self.file is None or self.records_in_file >= self.file_records:
+                self.rotate()
+            # Timestamped under the lock so times never go backwards in the
+            # file, which seek_time() relies on
+            self.file.write(pack_record(game_id, time.time(), event, player, card, a, b, text))
+            self.records_in_file += 1
+            self.written += 1
+            if self.durable:
+                self.file.flush()
+
+    def position(self):
+        # (file number, record in that file) the next record goes to; see
+        # MatchLogReader.index_of
+        with self.lock:
+            if self.file is None or self.records_in_file >= self.file_records:
+                return self.index + 1, 0
+            return self.index, self.records_in_file
+
+    def flush(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+class MatchLogReader:
+    # Every record in a log directory as one sequence: len(), reader[i],
+    # iteration and lookups by match or time. Files are memory-mapped, so
+    # only the pages actually read are loaded, however big the log gets.
+    # Files are mapped as they are when the reader is opened; a record the
+    # writer hasn't finished yet is left out.
+    def __init__(self, directory):
+        self.maps = []
+        self.starts = []  # index of each file's first record
+        self.numbers = []  # each file's number, from its name
+        total = 0
+        for path in log_files(directory):
+            size = os.path.getsize(path) // RECORD.size * RECORD.size
+            if size == 0:
+                continue  # can't map an empty file
+            with open(path, "rb") as f:
+                self.maps.append(mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ))
+            self.starts.append(total)
+            self.numbers.append(int(os.path.basename(path)[len(FILE_PREFIX):-len(FILE_SUFFIX)]))
+            total += size // RECORD.size
+        self.total = total
+
+    def __len__(self):
+        return self.total
+
+    def locate(self, index):
+        # (file's map, byte offset) of record index
+        low, high = 0, len(self.starts) - 1
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.starts[mid] <= index:
+                low = mid
+            else:
+                high = mid - 1
+        return self.maps[low], (index - self.starts[low]) * RECORD.size
+
+    def raw(self, index):
+        if not 0 <= index < self.total:
+            raise IndexError(index)
+        data, offset = self.locate(index)
+        return RECORD.unpack_from(data, offset)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.total
+        return decode_record(self.raw(index))
+
+    def __iter__(self):
+        return self.records()
+
+    def records(self, start=0):
+        # Straight through each map from start, without per-record lookups
+        for data, first in zip(self.maps, self.starts):
+            offset = max(start - first, 0) * RECORD.size
+            for offset in range(offset, len(data), RECORD.size):
+                yield decode_record(RECORD.unpack_from(data, offset))
+
+    def index_of(self, position):
+        # Index of the record at a MatchLog.position(). A file that was
+        # never written to has no records, so that's wherever the next
+        # file starts.
+        number, offset = position
+        i = bisect.bisect_left(self.numbers, number)
+        if i == len(self.numbers):
+            return self.total
+        if self.numbers[i] != number:
+            return self.starts[i]
+        return min(self.starts[i] + offset, self.starts[i + 1] if i + 1 < len(self.starts) else self.total)
+
+    def seek_time(self, when):
+        # Index of the first record written at or after when. Records are
+        # appended under one lock, so their times only go forward (bar the
+        # wall clock being stepped back).
+        low, high = 0, self.total
+        while low < high:
+            mid = (low + high) // 2
+            if self.raw(mid)[1] < when:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def next_start(self, index):
+        # (index, game_id) of the first START record at or after index
+        for i in range(index, self.total):
+            fields = self.raw(i)
+            if fields[2] == START:
+                return i, fields[0]
+        return None, None
+
+    def last_start(self):
+        # game_id of the newest START record, which is the highest game_id
+        # in the log (see find_match), or None if there are none
+        for i in range(self.total - 1, -1, -1):
+            fields = self.raw(i)
+            if fields[2] == START:
+                return fields[0]
+        return None
+
+    def find_match(self, game_id):
+        # Index of a match's first record. Matches are interleaved, but
+        # their START records are in game_id order, so binary search on the
+        # next START at or after each probe.
+        low, high = 0, self.total
+        while low < high:
+            mid = (low + high) // 2
+            _, found = self.next_start(mid)
+            if found is not None and found < game_id:
+                low = mid + 1
+            else:
+                high = mid
+        index, found = self.next_start(low)
+        return index if found == game_id else None
+
+    def match(self, game_id):
+        # Every record of one match, in order
+        start = self.find_match(game_id)
+        if start is None:
+            return []
+        events = []
+        for record in self.records(start):
+            if record.game_id == game_id:
+                events.append(record)
+                if record.event == END:
+                    break
+        return events
+
+    def matches(self):
+        # (game_id, records) for every match that has ended, in end order
+        playing = {}
+        for record in self:
+            events = playing.setdefault(record.game_id, [])
+            events.append(record)
+            if record.event == END:
+                yield record.game_id, playing.pop(record.game_id)
+
+    def close(self):
+        for data in self.maps:
+            data.close()
+        self.maps = []
+
+
+def format_record(record):
+    when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.time))
+    parts = [when, f"game {record.game_id}", EVENT_NAMES.get(record.event, record.event)]
+    if record.player:
+        parts.append(f"player {record.player}")
+    if record.card:
+        parts.append(f"{record.card[0]} {record.card[1]}")
+    if record.event in (RESULT, END):
+        parts.append(f"score {record.a}-{record.b}")
+    if record.text:
+        parts.append(record.text)
+    return "  ".join(str(part) for part in parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read the server's match log")
+    parser.add_argument("directory")
+    parser.add_argument("--game", type=int, help="print every event of this match")
+    args = parser.parse_args()
+
+    reader = MatchLogReader(args.directory)
+    if args.game is not None:
+        for record in reader.match(args.game):
+            print(format_record(record))
+        return
+
+    events = collections.Counter()
+    ends = collections.Counter()
+    for record in reader:
+        events[EVENT_NAMES.get(record.event, record.event)] += 1
+        if record.event == END:
+            ends[record.text] += 1
+    print(f"{len(reader)} records in {len(reader.maps)} files")
+    print(f"events: {dict(events)}")
+    print(f"matches ended: {dict(ends)}")
+    if len(reader):
+        print(f"first: {format_record(reader[0])}")
+        print(f"last: {format_record(reader[-1])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Small in-process metrics registry with Prometheus text output.
+#
+# Recording is a lock and an add (histograms add a bisect over a handful of
+# fixed buckets), so it can stay on in the hot path. Gauges that are
+# expensive or awkward to keep up to date can be given a function instead,
+# which is only called when the metrics are scraped.
+#
+#   GAMES = metrics.counter("games_total", "Games played", ["result"])
+#   GAMES.labels("win").inc()
+#   metrics.serve(9100)   # http://127.0.0.1:9100/metrics
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.children = {}  # label values -> child metric
+        self.lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(values, self.new_child())
+        return child
+
+    def new_child(self):
+        # An unlabelled metric of the same kind, for one set of label values
+        return type(self)(self.name, self.help_text)
+
+    def samples(self):
+        # (suffix, labels, value) for every child
+        if not self.labelnames:
+            return self.child_samples(self, {})
+        samples = []
+        for values, child in list(self.children.items()):
+            samples.extend(self.child_samples(child, dict(zip(self.labelnames, values))))
+        return samples
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def child_samples(self, child, labels):
+        return [("", labels, child.value)]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self.value = 0
+        self.function = None
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set_function(self, function):
+        # Read the value from function() at scrape time
+        self.function = function
+
+    def child_samples(self, child, labels):
+        value = child.function() if child.function else child.value
+        return [("", labels, value)]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+
+    def new_child(self):
+        return Histogram(self.name, self.help_text, buckets=self.buckets)
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def child_samples(self, child, labels):
+        with child.lock:
+            counts = list(child.counts)
+            total = child.sum
+        samples = []
+        cumulative = 0
+        for bound, count in zip(child.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            samples.append(("_bucket", dict(labels, le=le), cumulative))
+        samples.append(("_sum", labels, total))
+        samples.append(("_count", labels, cumulative))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            return self.metrics[metric.name]
+        self.metrics[metric.name] = metric
+        return metric
+
+    def exposition(self):
+        # Prometheus text format, version 0.0.4
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in metric.samples():
+                if labels:
+                    label_text = ",".join(
+                        f'{key}="{escape(str(val))}"' for key, val in labels.items()
+                    )
+                    lines.append(f"{metric.name}{suffix}{{{label_text}}} {value}")
+                else:
+                    lines.append(f"{metric.name}{suffix} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help_text, labelnames=(), registry=REGISTRY):
+    return registry.register(Counter(name, help_text, labelnames))
+
+
+def gauge(name, help_text, labelnames=(), registry=REGISTRY):
+    return registry.register(Gauge(name, help_text, labelnames))
+
+
+def histogram(name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+    return registry.register(Histogram(name, help_text, labelnames, buckets))
+
+
+def serve(port, host="127.0.0.1", registry=REGISTRY):
+    # Serve GET /metrics from a background thread; returns the HTTP server
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.exposition().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # scrapes every few seconds would drown the server log
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -1,18 +1,236 @@
+import collections
+import io
+import itertools
 import socket
 import pickle
 import threading
+import time
+
+from transport import TcpTransport
+
+PING_INTERVAL = 2.0  # seconds between latency pings during a match
+RTT_WINDOW = 20  # recent round trip samples kept for min/last
+RESUME_ATTEMPTS = 6  # reconnects tried when the connection drops mid-match, or the server restarts
+RESUME_BACKOFF = 0.5  # seconds before the second attempt, growing after that
+
+
+class RttEstimator:
+    # Smoothed round trip time and jitter, kept the way TCP does (RFC 6298):
+    # each sample moves the average 1/8 of the way and the jitter (mean
+    # deviation) 1/4 of the way. Used by NetworkGame and, per connection,
+    # by the server.
+    def __init__(self, window=RTT_WINDOW):
+        self.rtt = None
+        self.jitter = None
+        self.samples = collections.deque(maxlen=window)
+        self.count = 0
+
+    def add(self, sample):
+        sample = max(sample, 0.0)
+        if self.rtt is None:
+            self.rtt = sample
+            self.jitter = sample / 2
+        else:
+            self.jitter = 0.75 * self.jitter + 0.25 * abs(self.rtt - sample)
+            self.rtt = 0.875 * self.rtt + 0.125 * sample
+        self.samples.append(sample)
+        self.count += 1
+
+    def summary(self):
+        # Milliseconds, or None before the first sample
+        if self.rtt is None:
+            return None
+        samples = list(self.samples)
+        return {
+            "rtt_ms": self.rtt * 1000,
+            "jitter_ms": self.jitter * 1000,
+            "min_ms": min(samples) * 1000,
+            "last_ms": samples[-1] * 1000,
+            "samples": self.count,
+        }
+
+
+def frame(channel_id, data):
+    # Multiplexed connections, both ways, tag each message with its channel:
+    # a pickled (channel_id, length) header followed by the message bytes as
+    # they are, so a state the server encoded once is shared by every
+    # channel it goes to. An empty message closes the channel.
+    return pickle.dumps((channel_id, len(data))) + data
+
+
+class MuxConnection:
+    # One connection to the server carrying many players (or spectators),
+    # each on its own channel. Give it to NetworkGame / NetworkSpectator as
+    # mux= and they use a channel instead of opening a socket of their own,
+    # so a bot farm or relay needs a handful of sockets, not thousands.
+    def __init__(self, host="localhost", port=5555, transport=None):
+        transport = transport or TcpTransport(host, port)
+        self.client = transport.socket()
+        self.addr = transport.address
+        self.connected = False
+        self.channels = {}
+        self.channel_ids = itertools.count(1)
+        self.send_lock = threading.Lock()
+
+    def connect(self):
+        try:
+            self.client.connect(self.addr)
+            self.client.sendall(pickle.dumps({"action": "mux"}))
+            # Wait for the go-ahead so frames can't reach the handshake
+            self.client.settimeout(5.0)
+            response = pickle.loads(self.client.recv(2048))
+            self.client.settimeout(None)
+            if not isinstance(response, dict) or response.get("status") != "mux":
+                print(f"Server refused multiplexing: {response}")
+                return False
+            self.connected = True
+            threading.Thread(target=self.read_loop, daemon=True).start()
+            return True
+        except Exception as e:
+            print(f"Connection error: {e}")
+            return False
+
+    def open_channel(self):
+        channel = MuxChannel(self, next(self.channel_ids))
+        self.channels[channel.channel_id] = channel
+        return channel
+
+    def send_frame(self, channel_id, data):
+        # Whole frames only; channels share the socket
+        with self.send_lock:
+            self.client.sendall(frame(channel_id, data))
+
+    def read_loop(self):
+        stream = self.client.makefile("rb")
+        try:
+            while True:
+                channel_id, length = pickle.load(stream)
+                data = stream.read(length) if length else b""
+                channel = self.channels.get(channel_id)
+                if channel is not None:
+                    channel.deliver(data)
+        except Exception as e:
+            print(f"Multiplexed connection closed: {e}")
+
+        self.connected = False
+        for channel in list(self.channels.values()):
+            channel.deliver(b"")
+
+    def close(self):
+        self.connected = False
+        self.client.close()
+
+
+class MuxChannel:
+    # Socket stand-in for one channel of a MuxConnection. recv() returns one
+    # whole message at a time, or b"" once the channel is closed.
+    def __init__(self, mux, channel_id):
+        self.mux = mux
+        self.channel_id = channel_id
+        self.inbox = collections.deque()
+        self.ready = threading.Condition()
+        self.timeout = None
+        self.eof = False
+
+    def connect(self, addr):
+        if not self.mux.connected:
+            raise ConnectionError("multiplexed connection is not open")
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def deliver(self, data):
+        with self.ready:
+            if data:
+                self.inbox.append(data)
+            else:
+                self.eof = True
+            self.ready.notify_all()
+
+    def send(self, data):
+        self.mux.send_frame(self.channel_id, data)
+        return len(data)
+
+    sendall = send
+
+    def recv(self, bufsize):
+        with self.ready:
+            if not self.ready.wait_for(lambda: self.inbox or self.eof, self.timeout):
+                raise socket.timeout("timed out")
+            if self.inbox:
+                return self.inbox.popleft()
+            return b""
+
+    def makefile(self, mode):
+        return io.BufferedReader(ChannelReader(self))
+
+    def close(self):
+        if self.mux.channels.pop(self.channel_id, None) is None:
+            return
+        self.deliver(b"")
+        if self.mux.connected:
+            try:
+                self.mux.send_frame(self.channel_id, b"")
+            except OSError:
+                pass
+
+
+class ChannelReader(io.RawIOBase):
+    # Lets pickle.load() read a channel as a stream, as NetworkSpectator and
+    # the server (for its own Channel) do
+    def __init__(self, channel):
+        self.channel = channel
+        self.pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self.pending:
+            self.pending = self.channel.recv(len(buffer))
+        n = min(len(buffer), len(self.pending))
+        buffer[:n] = self.pending[:n]
+        self.pending = self.pending[n:]
+        return n
 
 
 class NetworkGame:
-    def __init__(self, host="localhost", port=5555):
-        self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    def __init__(self, host="localhost", port=5555, mux=None, transport=None):
+        # TCP to host:port unless another transport is given; with a
+        # MuxConnection this player is one channel on it instead
+        transport = transport or TcpTransport(host, port)
+        self.transport = transport
+        self.mux = mux
+        self.client = self.new_socket()
         self.host = host
         self.port = port
-        self.addr = (self.host, self.port)
+        self.addr = transport.address
         self.connected = False
         self.game_id = None
         self.player_num = None
         self.game_state = None
+        self.buffer = b""  # bytes of a message that hasn't fully arrived yet
+
+        # From "starting"; gets our seat back if the connection drops
+        self.resume_token = None
+        self.resuming = False
+        self.resumes = 0
+
+        # Latency, from ping/pong round trips
+        self.latency = RttEstimator()
+        self.ping_seq = itertools.count(1)
+        self.last_ping = None
+        self.last_pong = None  # (server's timestamp, when we got it)
+
+        # Server's wall clock minus ours, from the pong with the shortest
+        # round trip so far, which pins it down best; see server_time()
+        self.clock_offset = 0.0
+        self.clock_rtt = None
+
+    def new_socket(self):
+        if self.mux is not None:
+            return self.mux.open_channel()
+        return self.transport.socket()
 
     def connect(self):
         try:
@@ -32,18 +250,23 @@ class NetworkGame:
             self.client.send(pickle.dumps(data))
             
             try:
-                response = pickle.loads(self.client.recv(2048*2))
+                # The server also pushes updates nobody asked for, so one
+                # recv can hold several messages; keep the newest
+                response = None
+                while response is None:
+                    chunk = self.client.recv(2048*2)
+                    if not chunk:
+                        print("Server closed the connection")
+                        self.connected = False
+                        return self.resume_if_dropped()
+                    self.buffer += chunk
+                    for message in self.read_messages():
+                        response = message
                 print(f"Network response: {response}")  # Debug print
                 
                 if isinstance(response, dict):
-                    if response.get("status") == "starting":
-                        print("Received game start data")  # Debug print
-                        if "game_id" in response:
-                            self.game_id = response["game_id"]
-                        if "player_num" in response:
-                            self.player_num = response["player_num"]
-                        if "game_state" in response:
-                            self.game_state = response["game_state"]
+                    if "game_state" in response:
+                        self.game_state = response["game_state"]
                     
                 return response
                 
@@ -54,10 +277,125 @@ class NetworkGame:
         except socket.error as e:
             print(f"Network error in send: {e}")
             self.connected = False
-            return None
+            return self.resume_if_dropped()
         finally:
             self.client.settimeout(None)
 
+    def read_messages(self):
+        # Unpickle every complete message in the buffer; pongs are used up
+        # here and not returned
+        messages = []
+        stream = io.BytesIO(self.buffer)
+        while stream.tell() < len(self.buffer):
+            start = stream.tell()
+            try:
+                message = pickle.load(stream)
+            except (EOFError, pickle.UnpicklingError):
+                stream.seek(start)
+                break  # rest of the message is still on its way
+
+            if isinstance(message, dict) and message.get("status") == "pong":
+                now = time.monotonic()
+                if isinstance(message.get("sent"), float):
+                    rtt = now - message["sent"]
+                    self.latency.add(rtt)
+                    self.sync_clock(message.get("server_wall"), rtt)
+                self.last_pong = (message.get("server_time"), now)
+                continue
+            messages.append(message)
+
+            if isinstance(message, dict) and message.get("status") in ("starting", "resumed"):
+                print("Received game start data")  # Debug print
+                if "game_id" in message:
+                    self.game_id = message["game_id"]
+                if "player_num" in message:
+                    self.player_num = message["player_num"]
+                if "resume_token" in message:
+                    self.resume_token = message["resume_token"]
+            if isinstance(message, dict) and "game_state" in message:
+                # Kept here too, so a last update read just before the
+                # server hangs up isn't lost
+                self.game_state = message["game_state"]
+        self.buffer = self.buffer[stream.tell():]
+        return messages
+
+    def sync_clock(self, server_wall, rtt):
+        # The server stamped the pong about half a round trip ago
+        if server_wall is None:
+            return
+        if self.clock_rtt is None or rtt <= self.clock_rtt:
+            self.clock_rtt = rtt
+            self.clock_offset = server_wall + rtt / 2 - time.time()
+
+    def server_time(self):
+        # Our estimate of the server's time.time(), for its turn deadlines
+        return time.time() + self.clock_offset
+
+    def resume_if_dropped(self):
+        # The connection went mid-match: get back in, and return the
+        # server's snapshot in place of the reply we lost. Once the match
+        # is over there is nothing to resume.
+        if (
+            self.resuming
+            or self.resume_token is None
+            or not self.game_state
+            or self.game_state.get("status") != "playing"
+        ):
+            return None
+        return self.resume()
+
+    def resume(self, attempts=RESUME_ATTEMPTS):
+        # Reconnects with the token from "starting". The server keeps our
+        # seat for a while and answers with a snapshot of the match, which
+        # is returned; None if we couldn't get back in.
+        self.resuming = True
+        try:
+            for attempt in range(attempts):
+                if attempt:
+                    time.sleep(RESUME_BACKOFF * 2 ** (attempt - 1))
+                try:
+                    self.client.close()
+                except socket.error:
+                    pass
+                self.buffer = b""
+                self.client = self.new_socket()
+                if not self.connect():
+                    continue
+
+                print(f"Resuming game {self.game_id}")
+                response = self.send({"action": "resume", "token": self.resume_token})
+                if isinstance(response, dict) and response.get("status") == "error":
+                    # The match ended or the seat was given up
+                    print(f"Could not resume: {response.get('message')}")
+                    self.resume_token = None
+                    self.connected = False
+                    return None
+                if response is not None:
+                    self.resumes += 1
+                    return response
+            return None
+        finally:
+            self.resuming = False
+
+    def ping(self):
+        # Times a round trip with our own clock. It also hands back the
+        # server's timestamp from the last pong, and how long we held on to
+        # it, so the server can time the round trip with its clock too.
+        self.last_ping = time.monotonic()
+        message = {"action": "ping", "seq": next(self.ping_seq), "sent": self.last_ping}
+        if self.last_pong is not None:
+            server_time, received = self.last_pong
+            message["echo"] = server_time
+            message["held"] = self.last_ping - received
+        # The server answers with a pong and then the game state, as it does
+        # any message
+        return self.send(message)
+
+    def ping_if_due(self, interval=PING_INTERVAL):
+        if self.last_ping is not None and time.monotonic() - self.last_ping < interval:
+            return None
+        return self.ping()
+
     def play_card(self, card):
         if not self.connected:
             return None
@@ -67,3 +405,66 @@ class NetworkGame:
             "game_id": self.game_id,
             "player_num": self.player_num
         })
+
+
+class NetworkSpectator:
+    # Watches a match without playing. The server pushes a state update for
+    # every change (hands hidden, played cards face down until revealed), so
+    # this just reads pickled messages off the stream.
+    def __init__(self, host="localhost", port=5555, mux=None, transport=None):
+        transport = transport or TcpTransport(host, port)
+        if mux is not None:
+            self.client = mux.open_channel()
+        else:
+            self.client = transport.socket()
+        self.addr = transport.address
+        self.connected = False
+        self.stream = None
+        self.game_state = None
+
+    def connect(self, game_id):
+        try:
+            self.client.connect(self.addr)
+            self.client.send(pickle.dumps({"action": "spectate", "game_id": game_id}))
+            self.stream = self.client.makefile("rb")
+            self.connected = True
+            return True
+        except Exception as e:
+            print(f"Connection error: {e}")
+            return False
+
+    def receive(self):
+        # Blocks until the next update; returns None once disconnected
+        if not self.connected:
+            return None
+        try:
+            response = pickle.load(self.stream)
+        except (EOFError, OSError, pickle.UnpicklingError) as e:
+            print(f"Spectator disconnected: {e}")
+            self.connected = False
+            return None
+
+        if isinstance(response, dict) and "game_state" in response:
+            self.game_state = response["game_state"]
+        return response
+
+    def close(self):
+        self.connected = False
+        self.client.close()
+
+
+def fetch_leaderboard(top=10, player=None, host="localhost", port=5555, transport=None):
+    # The server's top players, and where player stands if given, as its
+    # {"status": "leaderboard", ...} reply; None if it couldn't be reached
+    transport = transport or TcpTransport(host, port)
+    client = transport.socket()
+    try:
+        client.connect(transport.address)
+        client.sendall(pickle.dumps({"action": "leaderboard", "top": top, "player": player}))
+        with client.makefile("rb") as stream:
+            return pickle.load(stream)
+    except (EOFError, OSError, pickle.UnpicklingError) as e:
+        print(f"Connection error: {e}")
+        return None
+    finally:
+        client.close()
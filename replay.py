@@ -0,0 +1,134 @@
+# Headless replay of matches from the server's match log.
+#
+# A GameSession takes every random choice from its own seeded RNG, so the
+# seed and the order of the players' plays decide everything else: who goes
+# first, every card dealt and every result. This rebuilds each logged match
+# from just those, runs it through the server's own GameSession and checks
+# the events it produces against the log, record for record.
+#
+#   python server.py --match-log logs/
+#   python replay.py logs/ --game 1234    # replay one match, print it
+#   python replay.py logs/                # check every match in the log
+
+import argparse
+import contextlib
+import io
+import sys
+
+import matchlog
+from server import GameSession, redo
+
+
+class ReplayOutbox:
+    # Stands in for a player's connection; keeps the last message sent
+    conn = None
+
+    def __init__(self):
+        self.last = None
+
+    def send(self, data):
+        self.last = data
+        return True
+
+    def close(self, flush=False):
+        pass
+
+
+class MemoryLog:
+    # Collects a session's events the way MatchLog would write them
+    def __init__(self):
+        self.records = []
+
+    def append(self, game_id, event, player=0, card=None, a=0, b=0, text=""):
+        data = matchlog.pack_record(game_id, 0.0, event, player, card, a, b, text)
+        self.records.append(matchlog.decode_record(matchlog.RECORD.unpack(data)))
+
+
+def comparable(record):
+    # Everything but the time
+    return (record.event, record.player, record.card, record.a, record.b, record.text)
+
+
+def replay(records):
+    # Replays one match from its logged records. Returns the replayed
+    # records and the first (index, logged, replayed) that differ, or None.
+    starts = {r.player: r.text for r in records if r.event == matchlog.START}
+    seeds = [r for r in records if r.event == matchlog.SEED]
+    if len(starts) != 2 or not seeds:
+        raise ValueError("match has no start or seed records")
+    # Names too long for START go on in NAME records
+    for record in records:
+        if record.event == matchlog.NAME:
+            starts[record.player] += record.text
+
+    game_id = records[0].game_id
+    log = MemoryLog()
+    session = GameSession(
+        game_id,
+        ReplayOutbox(),
+        starts[1],
+        ReplayOutbox(),
+        starts[2],
+        log,
+        int(seeds[0].text),
+    )
+
+    # The players' plays and timeouts are the only inputs; the server
+    # revealed and scored when the log says it did
+    redo(session, records)
+
+    # END is written by the registry, not the session
+    logged = [r for r in records if r.event != matchlog.END]
+    for index, (expected, actual) in enumerate(zip(logged, log.records)):
+        if comparable(expected) != comparable(actual):
+            return log.records, (index, expected, actual)
+    if len(logged) != len(log.records):
+        index = min(len(logged), len(log.records))
+        expected = logged[index] if index < len(logged) else None
+        actual = log.records[index] if index < len(log.records) else None
+        return log.records, (index, expected, actual)
+    return log.records, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay matches from a match log")
+    parser.add_argument("directory")
+    parser.add_argument("--game", type=int, help="replay and print this match only")
+    args = parser.parse_args()
+
+    reader = matchlog.MatchLogReader(args.directory)
+    if args.game is not None:
+        matches = [(args.game, reader.match(args.game))]
+        if not matches[0][1]:
+            sys.exit(f"game {args.game} is not in the log")
+    else:
+        matches = reader.matches()
+
+    replayed = 0
+    mismatched = 0
+    for game_id, records in matches:
+        # GameSession prints every play; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                _, mismatch = replay(records)
+            except ValueError as e:
+                mismatch = (0, None, str(e))
+        replayed += 1
+
+        if args.game is not None:
+            for record in records:
+                print(matchlog.format_record(record))
+        if mismatch is not None:
+            mismatched += 1
+            index, expected, actual = mismatch
+            print(f"game {game_id}: differs at event {index}")
+            print(f"  logged:   {expected}")
+            print(f"  replayed: {actual}")
+
+    print(f"{replayed} matches replayed, {mismatched} differ from the log")
+    if mismatched:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
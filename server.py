@@ -1,29 +1,426 @@
+import argparse
+import base64
+import collections
+import hashlib
+import heapq
+import hmac
+import io
+import itertools
+import os
+import queue
 import socket
 import threading
 import pickle
 from _thread import *
 import random
+import secrets
 import time
+import weakref
+
+import cards
+import matchlog
+import metrics
+import stats
+from network import ChannelReader, RttEstimator, frame
+from transport import TcpTransport, from_url
+
+OUTBOX_SIZE = 64  # unsent messages a player connection may have queued
+SPECTATOR_QUEUE_SIZE = 8  # unsent updates kept per spectator before dropping
+MUX_OUTBOX_SIZE = 4096  # unsent frames a multiplexed connection may have queued
+HIDDEN_CARD = "hidden"  # shown to spectators for a face down played card
+LISTEN_BACKLOG = 4096  # pending connections the OS queues before refusing more
+HANDSHAKE_TIMEOUT = 5.0  # seconds a new connection gets to send its first message
+FLUSH_TIMEOUT = 5.0  # seconds a closing connection gets to take its last messages
+WINNING_SCORE = 4  # first to this many round wins takes the match, as in card_game.py
+IDLE_TIMEOUT = 300  # seconds without a play before a match is evicted
+REAP_INTERVAL = 10  # seconds between sweeps for idle matches
+REVEAL_DELAY = 1.0  # seconds both played cards stay face down
+RESULT_DELAY = 2.0  # seconds both cards are shown before the round is scored
+WORKER_THREADS = 4  # threads processing session mailboxes
+MAILBOX_BATCH = 32  # actions a worker runs for one session before moving on
+SEED_BITS = 63  # size of each session's RNG seed
+TURN_TIMEOUT = 20  # seconds a player gets per turn, as TIMER_DURATION in card_game.py
+TURN_GRACE = 1.0  # extra seconds before a turn times out, for the network
+TIMEOUTS_TO_FORFEIT = 2  # turns in a row a player can let run out before losing
+RECONNECT_GRACE = 30  # seconds a dropped player's seat is kept for them to resume
+RESUME_TOKEN_BYTES = 16
+ENDED_KEPT = 2048  # ended matches whose final state is kept for late resumes, at most
+SNAPSHOT_INTERVAL = 10  # seconds between snapshots of every live session
+SNAPSHOT_FILE = "sessions.snapshot"  # in the state directory, with the match log
+RESUME_KEY_FILE = "resume.key"  # secret resume tokens are made from
+LEADERBOARD_SIZE = 10  # rows a leaderboard request gets unless it asks for more
+DECK_COPIES = 2  # copies of each card in a deck, as create_deck in card_game.py
+HAND_SIZE = 5
+
+# What an Outbox does when a message arrives and it is already full
+DROP_OLDEST = "drop_oldest"  # discard the oldest queued message
+COALESCE = "coalesce"  # discard everything queued; the new snapshot replaces it
+DISCONNECT = "disconnect"  # the client is hopelessly behind, hang up on it
+
+
+# Recorded all over the server; see metrics.py. Gauges that need the
+# GameServer get their functions in GameServer.__init__.
+CONNECTIONS = metrics.counter(
+    "card_game_connections_total", "Connections accepted", ["kind"]
+)
+HANDSHAKE_FAILURES = metrics.counter(
+    "card_game_handshake_failures_total", "Connections dropped before a valid first message"
+)
+MATCHES_STARTED = metrics.counter("card_game_matches_started_total", "Matches started")
+MATCHES_ENDED = metrics.counter(
+    "card_game_matches_ended_total", "Matches ended", ["reason"]
+)
+SNAPSHOT_SECONDS = metrics.histogram(
+    "card_game_snapshot_seconds",
+    "Time to checkpoint every live session and write the snapshot",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+RESUMES = metrics.counter(
+    "card_game_resumes_total", "Reconnects to a match in progress", ["outcome"]
+)
+STATS_QUEUED = metrics.gauge(
+    "card_game_stats_queued", "Finished matches waiting to be written to the stats database"
+)
+ACTIVE_SESSIONS = metrics.gauge("card_game_active_sessions", "Matches in progress")
+PLAYERS_WAITING = metrics.gauge("card_game_players_waiting", "Players waiting in the lobby")
+MESSAGES = metrics.counter(
+    "card_game_messages_total", "Messages received from players in a match", ["type"]
+)
+ROUNDS = metrics.counter("card_game_rounds_total", "Rounds resolved", ["outcome"])
+ROUND_SECONDS = metrics.histogram(
+    "card_game_round_seconds", "Time from a round's first card to its result"
+)
+MATCH_SECONDS = metrics.histogram(
+    "card_game_match_seconds", "Time from match start to its end"
+)
+ACTION_SECONDS = metrics.histogram(
+    "card_game_action_seconds",
+    "Time a Scheduler worker spends on one session action",
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1),
+)
+TURN_TIMEOUTS = metrics.counter(
+    "card_game_turn_timeouts_total", "Turns that ran out of time", ["outcome"]
+)
+PLAYER_RTT_SECONDS = metrics.histogram(
+    "card_game_player_rtt_seconds",
+    "Round trip time to players in a match, measured from ping/pong",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+SEND_FAILURES = metrics.counter(
+    "card_game_send_failures_total", "Sends that failed with a socket error"
+)
+OUTBOX_DROPPED = metrics.counter(
+    "card_game_outbox_dropped_total", "Queued messages dropped by a full outbox"
+)
+OUTBOX_OVERFLOWS = metrics.counter(
+    "card_game_outbox_overflow_disconnects_total", "Clients disconnected for a full outbox"
+)
+OUTBOX_QUEUED = metrics.gauge(
+    "card_game_outbox_queued", "Messages waiting in all outboxes"
+)
+
+
+class Outbox:
+    # Bounded queue of encoded messages for one connection, drained by its
+    # own writer thread. Nothing ever calls send() on another client's socket
+    # directly, so a client whose receive window fills up only stalls its
+    # own writer and never the thread that produced the message.
+    def __init__(self, conn, max_size=OUTBOX_SIZE, policy=DISCONNECT):
+        self.conn = conn
+        self.max_size = max_size
+        self.policy = policy
+        self.queue = collections.deque()
+        self.ready = threading.Condition()
+        self.closed = False
+        self.draining = False  # closing once the queue is empty
+
+        # Counters for queue_stats()
+        self.sent = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.overflowed = False
+
+        # Round trip time to the client, if it pings; see handle_ping
+        self.latency = RttEstimator()
+
+        start_new_thread(self.write_loop, ())
+
+    def depth(self):
+        return len(self.queue)
+
+    def send(self, data):
+        # Queue already-pickled bytes; returns False once the outbox is closed
+        with self.ready:
+            if self.closed or self.draining:
+                return False
+            if len(self.queue) >= self.max_size:
+                if self.policy == DISCONNECT:
+                    print(f"Outbox full ({self.max_size} messages), disconnecting client")
+                    self.overflowed = True
+                    OUTBOX_OVERFLOWS.inc()
+                    self.close_locked()
+                    return False
+                if self.policy == COALESCE:
+                    self.dropped += len(self.queue)
+                    OUTBOX_DROPPED.inc(len(self.queue))
+                    self.queue.clear()
+                else:
+                    self.queue.popleft()
+                    self.dropped += 1
+                    OUTBOX_DROPPED.inc()
+            self.queue.append(data)
+            self.max_depth = max(self.max_depth, len(self.queue))
+            self.ready.notify()
+            return True
+
+    def write_loop(self):
+        while True:
+            with self.ready:
+                while not self.queue and not self.closed and not self.draining:
+                    self.ready.wait()
+                if self.closed:
+                    return
+                if not self.queue:
+                    break  # drained
+                data = self.queue.popleft()
+            try:
+                self.conn.sendall(data)
+                self.sent += 1
+            except socket.error as e:
+                print(f"Error sending to client: {e}")
+                SEND_FAILURES.inc()
+                break
+        self.close()
+
+    def close(self, flush=False):
+        # With flush the writer sends what is already queued, then closes
+        with self.ready:
+            if flush and not self.closed:
+                self.draining = True
+                self.conn.settimeout(FLUSH_TIMEOUT)
+                self.ready.notify()
+                return
+            self.close_locked()
+
+    def close_locked(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        self.ready.notify()
+        # Wake up the reader blocked in recv() on this connection too, then
+        # release the socket
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self.conn.close()
+
+
+class Scheduler:
+    # Runs sessions as actors. Connection threads only post actions to a
+    # session's mailbox; a small pool of workers takes sessions with mail
+    # and runs their actions in order, never two workers on the same
+    # session, so game_state only ever has one writer and needs no lock.
+    # Delayed actions wait on one shared timer heap instead of a sleeping
+    # thread per match.
+    def __init__(self, handler, workers=WORKER_THREADS):
+        self.handler = handler
+        self.ready = queue.Queue()  # sessions with mail and no worker yet
+        self.timers = []  # heap of (due, sequence, session, action)
+        self.timers_changed = threading.Condition()
+        self.sequence = itertools.count()  # keeps equal due times in order
+        for _ in range(workers):
+            start_new_thread(self.work_loop, ())
+        start_new_thread(self.timer_loop, ())
+
+    def post(self, session, action):
+        with session.mailbox_lock:
+            session.mailbox.append(action)
+            if session.scheduled:
+                return
+            session.scheduled = True
+        self.ready.put(session)
+
+    def post_later(self, delay, session, action):
+        entry = (time.monotonic() + delay, next(self.sequence), session, action)
+        with self.timers_changed:
+            heapq.heappush(self.timers, entry)
+            # The timer thread only needs waking if this is now the first due
+            if self.timers[0] is entry:
+                self.timers_changed.notify()
+
+    def work_loop(self):
+        while True:
+            session = self.ready.get()
+            for _ in range(MAILBOX_BATCH):
+                with session.mailbox_lock:
+                    if not session.mailbox:
+                        session.scheduled = False
+                        break
+                    action = session.mailbox.popleft()
+                start = time.perf_counter()
+                try:
+                    self.handler(session, action)
+                    ACTION_SECONDS.observe(time.perf_counter() - start)
+                except Exception as e:
+                    print(f"Error handling {action[0]} in game {session.game_id}: {e}")
+            else:
+                # Busy session; let the others have a turn
+                self.ready.put(session)
+
+    def timer_loop(self):
+        while True:
+            with self.timers_changed:
+                while not self.timers:
+                    self.timers_changed.wait()
+                delay = self.timers[0][0] - time.monotonic()
+                if delay > 0:
+                    self.timers_changed.wait(delay)
+                    continue
+                _, _, session, action = heapq.heappop(self.timers)
+            self.post(session, action)
+
+
+class Channel:
+    # One logical connection carried inside a multiplexed one. It has the
+    # parts of the socket API the handlers use, so a player or spectator on
+    # a channel goes through exactly the same code as one on its own socket.
+    def __init__(self, channel_id, mux_outbox, channels):
+        self.channel_id = channel_id
+        self.mux_outbox = mux_outbox
+        self.channels = channels  # the connection's channel table
+        self.inbox = collections.deque()
+        self.ready = threading.Condition()
+        self.timeout = None
+        self.eof = False  # no more messages will arrive
+        self.closed = False
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def deliver(self, data):
+        with self.ready:
+            self.inbox.append(data)
+            self.ready.notify()
+
+    def recv(self, bufsize):
+        # Returns one whole message; b"" once the channel is shut down
+        with self.ready:
+            if not self.ready.wait_for(lambda: self.inbox or self.eof, self.timeout):
+                raise socket.timeout("timed out")
+            if self.inbox:
+                return self.inbox.popleft()
+            return b""
+
+    def makefile(self, mode):
+        return io.BufferedReader(ChannelReader(self))
+
+    def sendall(self, data):
+        if self.closed or not self.mux_outbox.send(frame(self.channel_id, data)):
+            raise ConnectionError("channel closed")
+
+    def shutdown(self, how):
+        # Wake up everyone blocked in recv()
+        with self.ready:
+            self.eof = True
+            self.inbox.clear()
+            self.ready.notify_all()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.shutdown(socket.SHUT_RDWR)
+        if self.channels.get(self.channel_id) is self:
+            del self.channels[self.channel_id]
+        self.mux_outbox.send(frame(self.channel_id, b""))
+
+
+class Deck:
+    # A session's cards (ids, see cards.py), shuffled once with its RNG and
+    # dealt off the end, so dealing is a pop.
+    def __init__(self, rng, copies=DECK_COPIES):
+        self.cards = list(range(cards.NUM_CARDS)) * copies
+        rng.shuffle(self.cards)
+
+    def __len__(self):
+        return len(self.cards)
+
+    def deal(self, count=1):
+        # Up to count cards; fewer once the deck runs out
+        dealt = []
+        while self.cards and len(dealt) < count:
+            dealt.append(self.cards.pop())
+        return dealt
 
 
 class GameSession:
-    def __init__(self, player1_conn, player1_name, player2_conn, player2_name):
+    def __init__(
+        self,
+        game_id,
+        player1_outbox,
+        player1_name,
+        player2_outbox,
+        player2_name,
+        match_log=None,
+        seed=None,
+    ):
+        self.game_id = game_id
+        self.match_log = match_log  # a matchlog.MatchLog, or None
+
+        # Every random choice in the match comes from this, so the seed and
+        # the players' plays are enough to replay it exactly (replay.py)
+        if seed is None:
+            seed = random.getrandbits(SEED_BITS)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.deck = None  # shuffled in deal_initial_cards, after the first turn is chosen
+
+        # Turn clock, see GameServer.start_turn
+        self.turn_deadline = None  # time.monotonic() the current turn runs out
+        self.turn_timer_armed = False  # a "turn_timeout" is waiting on the Scheduler
+        self.timeouts = {1: 0, 2: 0}  # turns in a row each player let run out
+
+        # Secret each player gets at "starting" to take their seat back
+        # after a dropped connection (set by SessionRegistry.create), and
+        # when each lost it; see resume()
+        self.resume_tokens = {}
+        self.disconnected = {}  # player_num -> time.monotonic() they dropped
+        self.revealed = False  # both played cards face up, waiting to be scored
+        self.started = time.monotonic()
+        self.round_started = None  # when the current round's first card was played
+        self.last_activity = self.started
+        self.ended = False
+
+        # Actions waiting for the Scheduler to run them
+        self.mailbox = collections.deque()
+        self.mailbox_lock = threading.Lock()
+        self.scheduled = False
         self.player1 = {
-            "conn": player1_conn,
+            "conn": player1_outbox.conn,
+            "outbox": player1_outbox,
             "name": player1_name,
             "hand": [],
             "score": 0,
         }
         self.player2 = {
-            "conn": player2_conn,
+            "conn": player2_outbox.conn,
+            "outbox": player2_outbox,
             "name": player2_name,
             "hand": [],
             "score": 0,
         }
 
         # Randomly select who goes first
-        self.current_turn = random.choice([player1_name, player2_name])
+        self.current_turn = self.rng.choice([player1_name, player2_name])
         print(f"{self.current_turn} will go first!")
+        for player_num, name in ((1, player1_name), (2, player2_name)):
+            first, *rest = matchlog.name_chunks(name)
+            self.log_event(matchlog.START, player_num, a=self.current_turn == name, text=first)
+            for chunk in rest:
+                self.log_event(matchlog.NAME, player_num, text=chunk)
+        self.log_event(matchlog.SEED, text=seed.to_bytes(8, "little"))
 
         self.game_state = {
             "player1": {
@@ -42,56 +439,314 @@ class GameSession:
             "status": "playing",
             "first_turn": self.current_turn,
             "round_result": None,  # Add this to store round results
+            # The last round was a draw: both cards went back to the hands
+            # and the round is played again, each player in turn
+            "drawn": False,
+            # Wall clock time the current turn runs out, for the clients'
+            # countdowns; None between turns or without a turn clock
+            "turn_deadline": None,
+            "turn_timeout": None,
         }
         self.deal_initial_cards()
 
+        # Outboxes that get every broadcast; observers can subscribe too
+        self.subscribers = [player1_outbox, player2_outbox]
+        self.spectators = []
+
+        # Bumped on every change to game_state so encode_state() knows when
+        # its cached bytes are stale
+        self.state_version = 0
+        self.encoded_state = (None, {})  # version, {(reveal_cards, spectator): bytes}
+
+    def subscribe(self, outbox):
+        if outbox not in self.subscribers:
+            self.subscribers.append(outbox)
+
+    def unsubscribe(self, outbox):
+        if outbox in self.subscribers:
+            self.subscribers.remove(outbox)
+
+    def player(self, player_num):
+        return self.player1 if player_num == 1 else self.player2
+
+    def disconnect(self, player_num):
+        # The player's connection is gone; keep their seat. Returns the time
+        # they dropped, which identifies this disconnection.
+        player = self.player(player_num)
+        self.unsubscribe(player["outbox"])
+        player["outbox"].close()
+        self.disconnected[player_num] = time.monotonic()
+        print(f"Game {self.game_id}: player {player_num} disconnected")
+        return self.disconnected[player_num]
+
+    def resume(self, player_num, outbox):
+        # Seat the player's new connection in place of the old one
+        player = self.player(player_num)
+        if player["outbox"] is not outbox:
+            self.unsubscribe(player["outbox"])
+            player["outbox"].close()
+        player["conn"] = outbox.conn
+        player["outbox"] = outbox
+        self.subscribe(outbox)
+        self.disconnected.pop(player_num, None)
+        self.touch()
+        print(f"Game {self.game_id}: player {player_num} resumed")
+
+    def snapshot(self, player_num):
+        # Everything a resuming client needs to pick up mid-round, in one
+        # message: the state as a get_state reply has it, plus who they are.
+        # Cards already played are face up only once both are down.
+        return pickle.dumps({
+            "status": "resumed",
+            "game_id": self.game_id,
+            "player_num": player_num,
+            "game_state": self.player_view(),
+            "reveal_cards": self.both_played(),
+        })
+
+    def add_spectator(self, outbox):
+        self.spectators.append(outbox)
+
+    def remove_spectator(self, outbox):
+        if outbox in self.spectators:
+            self.spectators.remove(outbox)
+        outbox.close()
+
+    def log_event(self, event, player=0, card=None, a=0, b=0, text=""):
+        # Append to the match log, if the server keeps one
+        if self.match_log is not None:
+            self.match_log.append(self.game_id, event, player, card, int(a), int(b), text)
+
+    def scores(self):
+        return self.game_state["player1"]["score"], self.game_state["player2"]["score"]
+
+    def state_changed(self):
+        self.state_version += 1
+
+    def touch(self):
+        self.last_activity = time.monotonic()
+
+    def play_card(self, player_num, card, timed_out=False):
+        # Returns False if it is not this player's turn or the card isn't
+        # in their hand. card is a card id, or a (suit, value) pair from an
+        # older client.
+        if player_num == 1:
+            player_key, other_key = "player1", "player2"
+        else:
+            player_key, other_key = "player2", "player1"
+
+        player_name = self.game_state[player_key]["name"]
+        if self.game_state["current_turn"] != player_name:
+            return False
+
+        # Each player puts down one card per round
+        if self.game_state[player_key]["played_card"] is not None:
+            return False
+        hand = self.game_state[player_key]["hand"]
+        card = cards.parse(card)
+        if card is None or not hand.remove(card):
+            return False
+
+        if not timed_out:
+            self.timeouts[player_num] = 0
+        self.game_state["drawn"] = False
+
+        # Update played card and switch turn
+        self.game_state[player_key]["played_card"] = card
+        self.game_state["current_turn"] = self.game_state[other_key]["name"]
+        self.touch()
+        if self.round_started is None:
+            self.round_started = self.last_activity
+        self.state_changed()
+        self.log_event(matchlog.PLAY, player_num, card)
+
+        print(f"Player {player_name} played card: {card}")
+        print(f"Turn switched to: {self.game_state['current_turn']}")
+        return True
+
+    def both_played(self):
+        return (
+            self.game_state["player1"]["played_card"] is not None
+            and self.game_state["player2"]["played_card"] is not None
+        )
+
+    def reveal(self):
+        # Turn both played cards face up
+        self.revealed = True
+        self.log_event(matchlog.REVEAL, 1, self.game_state["player1"]["played_card"])
+        self.log_event(matchlog.REVEAL, 2, self.game_state["player2"]["played_card"])
+        self.broadcast(reveal_cards=True)
+
+    def current_player(self):
+        return 1 if self.game_state["current_turn"] == self.game_state["player1"]["name"] else 2
+
+    def start_turn(self, timeout):
+        # The player whose turn it is now has timeout seconds
+        self.turn_deadline = time.monotonic() + timeout
+        self.game_state["turn_deadline"] = time.time() + timeout
+        self.game_state["turn_timeout"] = timeout
+        self.state_changed()
+
+    def stop_turn_clock(self):
+        self.turn_deadline = None
+        self.game_state["turn_deadline"] = None
+        self.state_changed()
+
+    def turn_timed_out(self, player_num):
+        # Plays the player's lowest card for them, or returns False if they
+        # have let too many turns run out and forfeit. Not random, so a
+        # replay doesn't need to know about it to keep the RNG in step.
+        self.timeouts[player_num] += 1
+        self.log_event(matchlog.TIMEOUT, player_num, a=self.timeouts[player_num])
+        print(f"Game {self.game_id}: player {player_num} ran out of time")
+        if self.timeouts[player_num] >= TIMEOUTS_TO_FORFEIT:
+            other_key = "player2" if player_num == 1 else "player1"
+            self.game_state["winner"] = self.game_state[other_key]["name"]
+            return False
+        hand = self.game_state[f"player{player_num}"]["hand"]
+        if not len(hand):
+            return True
+        self.play_card(player_num, min(hand, key=cards.value), timed_out=True)
+        return True
+
+    def is_finished(self):
+        return self.game_state["status"] == "finished"
+
+    def close(self):
+        # Let every connection take its last update, then hang up
+        for outbox in list(self.subscribers) + list(self.spectators):
+            outbox.close(flush=True)
+        self.subscribers = []
+        self.spectators = []
+
+    def spectator_view(self, reveal_cards=False):
+        # Copy of game_state without hidden information: hands become hand
+        # sizes and played cards stay face down until they are revealed
+        view = {
+            key: value
+            for key, value in self.game_state.items()
+            if key not in ("player1", "player2")
+        }
+        for key in ("player1", "player2"):
+            player = self.game_state[key]
+            played_card = player["played_card"]
+            if played_card is not None and not reveal_cards:
+                played_card = HIDDEN_CARD
+            view[key] = {
+                "name": player["name"],
+                "score": player["score"],
+                "played_card": played_card,
+                "hand_size": len(player["hand"]),
+            }
+        return view
+
+    def player_view(self):
+        # game_state with the Hands as plain lists of card ids, which pickle
+        # smaller and several times faster than through Hand.__reduce__
+        view = dict(self.game_state)
+        for key in ("player1", "player2"):
+            player = dict(view[key])
+            player["hand"] = player["hand"].to_list()
+            view[key] = player
+        return view
+
+    def encode_state(self, reveal_cards=False, spectator=False):
+        # Pickle the state once per change; both player threads, every
+        # spectator and every broadcast share the same bytes until the
+        # state changes again
+        version, encoded = self.encoded_state
+        if version != self.state_version:
+            version, encoded = self.state_version, {}
+            self.encoded_state = (version, encoded)
+
+        key = (reveal_cards, spectator)
+        if key not in encoded:
+            if spectator:
+                game_state = self.spectator_view(reveal_cards)
+            else:
+                game_state = self.player_view()
+            message = {"status": "in_game", "game_state": game_state}
+            if reveal_cards:
+                message["reveal_cards"] = True
+            encoded[key] = pickle.dumps(message)
+        return encoded[key]
+
+    def broadcast(self, reveal_cards=False):
+        # Send the current state to every subscriber and queue the
+        # spectator view for every spectator
+        data = self.encode_state(reveal_cards)
+        for outbox in list(self.subscribers):
+            outbox.send(data)
+
+        if self.spectators:
+            data = self.encode_state(reveal_cards, spectator=True)
+            for outbox in list(self.spectators):
+                outbox.send(data)
+
     def deal_initial_cards(self):
-        # Create and shuffle deck
-        suits = ["hearts", "diamonds", "spades"]
-        values = range(2, 11)
-        deck = [(suit, value) for suit in suits for value in values]
-        deck = deck * 2  # Two copies of each card
-        random.shuffle(deck)
+        # The deck lasts the whole match
+        self.deck = Deck(self.rng)
 
         # Deal 5 cards to each player
-        self.player1["hand"] = deck[:5]
-        self.player2["hand"] = deck[5:10]
+        dealt1 = self.deck.deal(HAND_SIZE)
+        dealt2 = self.deck.deal(HAND_SIZE)
+        self.player1["hand"] = cards.Hand(dealt1)
+        self.player2["hand"] = cards.Hand(dealt2)
 
-        # Update game state with hands
+        # Update game state with hands; Hands go out to clients as lists
+        # of card ids
         self.game_state["player1"]["hand"] = self.player1["hand"]
         self.game_state["player2"]["hand"] = self.player2["hand"]
+        for card in dealt1:
+            self.log_event(matchlog.DEAL, 1, card)
+        for card in dealt2:
+            self.log_event(matchlog.DEAL, 2, card)
 
     def compare_cards(self):
         card1 = self.game_state["player1"]["played_card"]
         card2 = self.game_state["player2"]["played_card"]
 
-        if not card1 or not card2:
+        if card1 is None or card2 is None:
             return None
+        self.revealed = False
 
-        print(f"Comparing cards: {card1} vs {card2}")  # Debug print
-
-        # Define the winning relationships
-        beats = {"diamonds": "spades", "spades": "hearts", "hearts": "diamonds"}
-
-        suit1, value1 = card1
-        suit2, value2 = card2
+        print(f"Comparing cards: {cards.to_tuple(card1)} vs {cards.to_tuple(card2)}")  # Debug print
 
-        # Check for exact same card (draw)
-        if suit1 == suit2 and value1 == value2:
+        # Same card is a draw, then suit beats suit, then higher value
+        result = cards.compare(card1, card2)
+        if result == 0:
             print("Draw!")
+            ROUNDS.labels("draw").inc()
+            # Both cards go back and both players play a fresh one
+            self.game_state["player1"]["hand"].add(card1)
+            self.game_state["player2"]["hand"].add(card2)
+            self.game_state["player1"]["played_card"] = None
+            self.game_state["player2"]["played_card"] = None
+            self.game_state["drawn"] = True
+            self.state_changed()
+            self.log_event(matchlog.RESULT, 0, None, *self.scores())
             return None
-
-        if suit1 == suit2:
-            # Same suit, compare values
-            winner = "player1" if value1 > value2 else "player2"
-        else:
-            # Different suits, check if player1's card beats player2's card
-            winner = "player1" if beats[suit1] == suit2 else "player2"
+        winner = "player1" if result == 1 else "player2"
 
         print(f"Winner determined: {winner}")  # Debug print
 
+        ROUNDS.labels("win").inc()
+        if self.round_started is not None:
+            ROUND_SECONDS.observe(time.monotonic() - self.round_started)
+            self.round_started = None
+
         # Update scores
         self.game_state[winner]["score"] += 1
+        if self.game_state[winner]["score"] >= WINNING_SCORE:
+            self.game_state["status"] = "finished"
+            self.game_state["winner"] = self.game_state[winner]["name"]
+
+        self.log_event(
+            matchlog.RESULT,
+            1 if winner == "player1" else 2,
+            card1 if winner == "player1" else card2,
+            *self.scores(),
+        )
 
         # Store round result
         self.game_state["round_result"] = {
@@ -116,54 +771,559 @@ class GameSession:
             "player2" if winner == "player1" else "player1"
         ]["name"]
 
+        self.state_changed()
         return winner
 
+    def checkpoint(self, position):
+        # Everything needed to rebuild this session mid-match, small enough
+        # to write out for every live session every few seconds. The RNG is
+        # only drawn from as the match starts, so the seed and what's left
+        # of the deck stand in for it. position is where the session's next
+        # match log record goes; see SessionRegistry.restore.
+        return (
+            self.game_id,
+            self.seed,
+            position,
+            self.player_view(),
+            bytes(self.deck.cards),
+            (self.timeouts[1], self.timeouts[2]),
+            self.revealed,
+        )
+
+    def load_checkpoint(self, checkpoint):
+        # Onto a session just made with the checkpoint's game_id and seed
+        _, _, _, game_state, deck, timeouts, revealed = checkpoint
+        game_state = dict(game_state)
+        for player_num, key in ((1, "player1"), (2, "player2")):
+            player = dict(game_state[key])
+            player["hand"] = cards.Hand(player["hand"])
+            game_state[key] = player
+            self.player(player_num)["hand"] = player["hand"]
+        self.game_state = game_state
+        self.deck.cards = list(deck)
+        self.timeouts = {1: timeouts[0], 2: timeouts[1]}
+        self.revealed = revealed
+        self.state_changed()
+
     def deal_replacement_cards(self):
-        # Create and shuffle deck for replacements
-        suits = ["hearts", "diamonds", "spades"]
-        values = range(2, 11)
-        deck = [(suit, value) for suit in suits for value in values]
-        random.shuffle(deck)
+        # Top both hands back up from the session's deck
+        for player_num, key in ((1, "player1"), (2, "player2")):
+            hand = self.game_state[key]["hand"]
+            for new_card in self.deck.deal(HAND_SIZE - len(hand)):
+                hand.add(new_card)
+                self.log_event(matchlog.DEAL, player_num, new_card)
 
-        # Deal replacement cards
-        if len(self.game_state["player1"]["hand"]) < 5:
-            new_card = deck.pop()
-            self.game_state["player1"]["hand"].append(new_card)
 
-        if len(self.game_state["player2"]["hand"]) < 5:
-            new_card = deck.pop()
-            self.game_state["player2"]["hand"].append(new_card)
+def redo(session, records):
+    # Applies a match's logged inputs to a session: the players' plays and
+    # timeouts, and the reveals and results the server timed. Everything
+    # else follows from the session's seed. The PLAY after a TIMEOUT is the
+    # one turn_timed_out() made, which it makes again here. Used by
+    # replay.py and SessionRegistry.restore.
+    previous = None
+    for record in records:
+        if record.event == matchlog.TIMEOUT:
+            session.turn_timed_out(record.player)
+        elif record.event == matchlog.PLAY and previous != matchlog.TIMEOUT:
+            session.play_card(record.player, record.card)
+        elif record.event == matchlog.REVEAL and record.player == 1:
+            session.reveal()
+        elif record.event == matchlog.RESULT:
+            session.compare_cards()
+        previous = record.event
+
+
+class VacantSeat:
+    # Stands in for the connection of a player who isn't there, e.g. in a
+    # session rebuilt after a restart until they resume
+    conn = None
+
+    def send(self, data):
+        return False
+
+    def close(self, flush=False):
+        pass
+
+
+def write_snapshot(directory, snapshot):
+    # Written aside and renamed over the old one, so a crash mid-write
+    # leaves the previous snapshot whole
+    path = os.path.join(directory, SNAPSHOT_FILE)
+    data = pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL)
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+    return len(data)
+
+
+def read_snapshot(directory):
+    try:
+        with open(os.path.join(directory, SNAPSHOT_FILE), "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def load_resume_key(directory):
+    # Kept with the match log, so resume tokens handed out before a restart
+    # still work after it
+    path = os.path.join(directory, RESUME_KEY_FILE)
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        key = secrets.token_bytes(32)
+        with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "wb") as f:
+            f.write(key)
+        return key
+
+
+class SessionRegistry:
+    # Owns every running GameSession. Ids come from a counter so they are
+    # never reused, and a session is dropped (and its sockets closed) as soon
+    # as its match finishes, a player leaves or it sits idle too long.
+    def __init__(
+        self,
+        match_log=None,
+        seed=None,
+        resume_window=RECONNECT_GRACE,
+        resume_key=None,
+        player_stats=None,
+        ended_kept=ENDED_KEPT,
+    ):
+        self.sessions = {}
+        self.tokens = {}  # resume token -> (session, player_num)
+        # Tokens are made from the game id and this, so a restarted server
+        # with the same key knows them without having stored them
+        self.resume_key = resume_key or secrets.token_bytes(32)
+        # A player who drops just as their match ends can still resume into
+        # the final state for this long, for the last ended_kept matches.
+        # Only that message is kept, not the session: token -> snapshot
+        # bytes, and (ended at, tokens) oldest first
+        self.resume_window = resume_window
+        self.ended_kept = ended_kept
+        self.final_states = {}
+        self.recently_ended = collections.deque()
+        self.match_log = match_log
+        self.player_stats = player_stats  # a stats.StatsStore, or None
+        # With a seed, session seeds come from it and a whole run can be
+        # repeated; otherwise each session picks its own
+        self.seeds = random.Random(seed) if seed is not None else None
+        self.ids = itertools.count()
+        self.last_id = -1
+        if match_log is not None and match_log.last_game_id is not None:
+            # Carry on after the matches already in the log; restore()
+            # may move this on further
+            self.last_id = match_log.last_game_id
+            self.ids = itertools.count(self.last_id + 1)
+        self.lock = threading.Lock()
+        self.created = 0
+        self.ended = collections.Counter()  # end reason -> matches
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def create(self, player1_outbox, player1_name, player2_outbox, player2_name):
+        with self.lock:
+            game_id = next(self.ids)
+            # Under the lock so START records reach the match log in
+            # game_id order, which MatchLogReader.find_match relies on
+            session = GameSession(
+                game_id,
+                player1_outbox,
+                player1_name,
+                player2_outbox,
+                player2_name,
+                self.match_log,
+                self.seeds.getrandbits(SEED_BITS) if self.seeds else None,
+            )
+            self.add(session)
+            self.last_id = game_id
+            self.created += 1
+        return session
+
+    def add(self, session):
+        # Under the lock
+        self.sessions[session.game_id] = session
+        for player_num in (1, 2):
+            token = self.resume_token(session.game_id, player_num)
+            session.resume_tokens[player_num] = token
+            self.tokens[token] = (session, player_num)
+
+    def resume_token(self, game_id, player_num):
+        digest = hmac.new(
+            self.resume_key, f"{game_id}:{player_num}".encode(), hashlib.sha256
+        ).digest()
+        return base64.urlsafe_b64encode(digest[:RESUME_TOKEN_BYTES]).decode().rstrip("=")
+
+    def live(self):
+        # Every live session and the match log position at that moment:
+        # sessions made after it have all their records after it
+        with self.lock:
+            position = self.match_log.position() if self.match_log else None
+            return list(self.sessions.values()), position
+
+    def write_snapshot(self, directory, position, checkpoints):
+        # checkpoints are GameSession.checkpoint()s of the sessions live()
+        # returned with position, taken since. Returns the size written.
+        return write_snapshot(directory, {
+            "time": time.time(),
+            "position": position,
+            "last_id": self.last_id,
+            "sessions": checkpoints,
+        })
+
+    def restore(self, directory):
+        # Rebuilds the sessions that were live when the server stopped:
+        # each from its checkpoint in the last snapshot, then its records
+        # after the checkpoint, or from its first record if it started
+        # since. Only the log after the snapshot is read. Returns the
+        # sessions, with nobody connected; players get back in by resuming.
+        reader = matchlog.MatchLogReader(directory)
+        snapshot = read_snapshot(directory)
+        checkpoints = {}  # game_id -> (checkpoint, index of its next record)
+        start = 0
+        last_id = -1
+        if snapshot is not None:
+            start = reader.index_of(snapshot["position"])
+            last_id = snapshot["last_id"]
+            for checkpoint in snapshot["sessions"]:
+                checkpoints[checkpoint[0]] = (checkpoint, reader.index_of(checkpoint[2]))
+
+        tails = {}  # game_id -> records to redo
+        for index, record in enumerate(reader.records(start), start):
+            game_id = record.game_id
+            if game_id > last_id:
+                last_id = game_id
+            if record.event == matchlog.END:
+                checkpoints.pop(game_id, None)
+                tails.pop(game_id, None)
+            elif game_id in checkpoints:
+                if index >= checkpoints[game_id][1]:
+                    tails.setdefault(game_id, []).append(record)
+            elif game_id in tails or record.event == matchlog.START:
+                tails.setdefault(game_id, []).append(record)
+        reader.close()
+
+        sessions = []
+        for game_id, (checkpoint, _) in checkpoints.items():
+            game_state = checkpoint[3]
+            session = GameSession(
+                game_id,
+                VacantSeat(),
+                game_state["player1"]["name"],
+                VacantSeat(),
+                game_state["player2"]["name"],
+                None,
+                checkpoint[1],
+            )
+            session.load_checkpoint(checkpoint)
+            redo(session, tails.pop(game_id, ()))
+            sessions.append(session)
+
+        for game_id, records in tails.items():
+            # Started after the snapshot
+            names = {1: "", 2: ""}
+            seed = None
+            for record in records:
+                if record.event in (matchlog.START, matchlog.NAME):
+                    names[record.player] += record.text
+                elif record.event == matchlog.SEED:
+                    seed = int(record.text)
+            if seed is None:
+                continue  # cut off as it started
+            session = GameSession(
+                game_id, VacantSeat(), names[1], VacantSeat(), names[2], None, seed
+            )
+            redo(session, records)
+            sessions.append(session)
+
+        with self.lock:
+            for session in sessions:
+                session.match_log = self.match_log
+                self.add(session)
+            self.last_id = max(self.last_id, last_id)
+            self.ids = itertools.count(self.last_id + 1)
+        return sessions
+
+    def resume(self, token):
+        # (session, player_num) a resume token belongs to, or (None, None)
+        # if it's unknown or its match has ended
+        with self.lock:
+            return self.tokens.get(token, (None, None))
+
+    def final_state(self, token):
+        # Snapshot of a match that ended within the resume window, or None
+        with self.lock:
+            return self.final_states.get(token)
+
+    def forget_ended(self, now):
+        # Under the lock. Bounded by count as well as time, so a burst of
+        # matches ending can't hold more than ended_kept final states.
+        cutoff = now - self.resume_window
+        while self.recently_ended and (
+            self.recently_ended[0][0] < cutoff or len(self.recently_ended) > self.ended_kept
+        ):
+            _, tokens = self.recently_ended.popleft()
+            for token in tokens:
+                self.final_states.pop(token, None)
+
+    def prune_ended(self):
+        # Drops final states past the resume window even when no match has
+        # ended since; see GameServer.reap_loop
+        with self.lock:
+            self.forget_ended(time.monotonic())
+
+    def get(self, game_id):
+        return self.sessions.get(game_id)
+
+    def end(self, game_id, reason):
+        # reason is "finished", "abandoned", "idle" or "forfeit". Returns
+        # False if the session had already ended.
+        with self.lock:
+            session = self.sessions.pop(game_id, None)
+            if session is None:
+                return False
+            session.ended = True
+            self.ended[reason] += 1
+
+        MATCHES_ENDED.labels(reason).inc()
+        MATCH_SECONDS.observe(time.monotonic() - session.started)
+        print(f"Game {game_id} ended: {reason}")
+        winner = session.game_state.get("winner")
+        winner_num = 0
+        if winner is not None:
+            winner_num = 1 if winner == session.game_state["player1"]["name"] else 2
+        session.log_event(matchlog.END, winner_num, None, *session.scores(), text=reason)
+        if self.match_log is not None:
+            self.match_log.flush()
+        if self.player_stats is not None:
+            # Only queued; the stats writer thread does the rest
+            self.player_stats.record(
+                game_id,
+                session.game_state["player1"]["name"],
+                session.game_state["player2"]["name"],
+                *session.scores(),
+                winner_num,
+                reason,
+            )
+        if session.game_state["status"] == "playing":
+            # Tell whoever is still connected why the match stopped
+            session.game_state["status"] = reason
+            session.state_changed()
+            session.broadcast()
+        # Swapped in one go, so a resume always finds the session or its
+        # result; one that found the session gets the result from the
+        # Scheduler, see handle_action
+        final_states = {}
+        if self.resume_window:
+            for player_num, token in session.resume_tokens.items():
+                final_states[token] = session.snapshot(player_num)
+        with self.lock:
+            for token in session.resume_tokens.values():
+                self.tokens.pop(token, None)
+            if final_states:
+                now = time.monotonic()
+                self.final_states.update(final_states)
+                self.recently_ended.append((now, tuple(final_states)))
+                self.forget_ended(now)
+        session.close()
+        return True
+
+    def idle_sessions(self, idle_timeout):
+        cutoff = time.monotonic() - idle_timeout
+        return [
+            session
+            for session in list(self.sessions.values())
+            if session.last_activity < cutoff
+        ]
+
+    def stats(self):
+        return {
+            "active": len(self.sessions),
+            "created": self.created,
+            "ended": dict(self.ended),
+            "final_states": len(self.final_states),
+        }
 
 
 class GameServer:
-    def __init__(self, host="", port=5555):
-        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        try:
-            self.server.bind((host, port))
-        except socket.error as e:
-            print(str(e))
-        self.server.listen(2)
-        self.games = {}
+    def __init__(
+        self,
+        host="",
+        port=5555,
+        stats_interval=0,
+        backlog=LISTEN_BACKLOG,
+        handshake_timeout=HANDSHAKE_TIMEOUT,
+        idle_timeout=IDLE_TIMEOUT,
+        workers=WORKER_THREADS,
+        transport=None,
+        metrics_port=0,
+        match_log_dir=None,
+        seed=None,
+        turn_timeout=TURN_TIMEOUT,
+        reconnect_grace=RECONNECT_GRACE,
+        state_dir=None,
+        snapshot_interval=SNAPSHOT_INTERVAL,
+        stats_db=None,
+    ):
+        # TCP on host:port unless another transport is given
+        self.transport = transport or TcpTransport(host, port)
+        # The OS caps the backlog at net.core.somaxconn
+        self.server = self.transport.listen(backlog)
+        self.handshake_timeout = handshake_timeout
+        self.idle_timeout = idle_timeout
+        # Every match's events, if asked for; see matchlog.py. With a state
+        # directory the match log is written durably and doubles as a
+        # write-ahead log: with snapshots of every live session next to it,
+        # a restarted server carries on the matches the last one was playing.
+        self.state_dir = state_dir
+        self.snapshot_interval = snapshot_interval
+        resume_key = None
+        if state_dir:
+            self.match_log = matchlog.MatchLog(state_dir, durable=True)
+            resume_key = load_resume_key(state_dir)
+        elif match_log_dir:
+            self.match_log = matchlog.MatchLog(match_log_dir)
+        else:
+            self.match_log = None
+        # Win/loss records and the leaderboard, if asked for; see stats.py
+        self.player_stats = stats.StatsStore(stats_db) if stats_db else None
+        self.sessions = SessionRegistry(
+            self.match_log, seed, reconnect_grace, resume_key, self.player_stats
+        )
+        self.scheduler = Scheduler(self.handle_action, workers)
+        self.turn_timeout = turn_timeout
+        self.reconnect_grace = reconnect_grace
+        self.metrics_port = metrics_port
+        ACTIVE_SESSIONS.set_function(lambda: len(self.sessions))
+        PLAYERS_WAITING.set_function(lambda: 1 if self.waiting_player else 0)
+        if self.player_stats is not None:
+            STATS_QUEUED.set_function(self.player_stats.queued)
+        OUTBOX_QUEUED.set_function(
+            lambda: sum(outbox.depth() for outbox in list(self.outboxes))
+        )
         self.waiting_player = None
-        print("Server Started, waiting for connections...")
+        # Handshakes run concurrently, so pairing players needs a lock
+        self.lobby_lock = threading.Lock()
+
+        # Every live Outbox, for queue_stats()
+        self.outboxes = weakref.WeakSet()
+        self.stats_interval = stats_interval
+
+        # Players reconnecting meanwhile wait in the listen backlog
+        if state_dir:
+            self.restore()
+        print(f"Server Started on {self.transport}, waiting for connections...")
+
+    def restore(self):
+        start = time.perf_counter()
+        restored = self.sessions.restore(self.state_dir)
+        for game in restored:
+            self.scheduler.post(game, ("restored",))
+        if restored:
+            print(
+                f"Restored {len(restored)} matches in "
+                f"{time.perf_counter() - start:.2f}s from {self.state_dir}"
+            )
+
+    def snapshot_loop(self):
+        while True:
+            time.sleep(self.snapshot_interval)
+            try:
+                self.take_snapshot()
+            except Exception as e:
+                print(f"Error writing snapshot: {e}")
+
+    def take_snapshot(self):
+        # Each session checkpoints itself on its Scheduler worker, between
+        # actions, so the checkpoint and the match log position it records
+        # agree; the games carry on meanwhile
+        start = time.perf_counter()
+        sessions, position = self.sessions.live()
+        replies = queue.Queue()
+        for game in sessions:
+            self.scheduler.post(game, ("checkpoint", replies))
+        checkpoints = []
+        for _ in sessions:
+            checkpoint = replies.get(timeout=self.snapshot_interval)
+            if checkpoint is not None:
+                checkpoints.append(checkpoint)
+        size = self.sessions.write_snapshot(self.state_dir, position, checkpoints)
+        SNAPSHOT_SECONDS.observe(time.perf_counter() - start)
+        return len(checkpoints), size
+
+    def open_outbox(self, conn, max_size=OUTBOX_SIZE, policy=DISCONNECT):
+        outbox = Outbox(conn, max_size, policy)
+        self.outboxes.add(outbox)
+        return outbox
+
+    def queue_stats(self):
+        outboxes = [outbox for outbox in list(self.outboxes) if not outbox.closed]
+        depths = [outbox.depth() for outbox in outboxes]
+        return {
+            "connections": len(outboxes),
+            "queued": sum(depths),
+            "max_depth": max(depths, default=0),
+            "peak_depth": max((outbox.max_depth for outbox in outboxes), default=0),
+            "sent": sum(outbox.sent for outbox in outboxes),
+            "dropped": sum(outbox.dropped for outbox in outboxes),
+            "overflow_disconnects": sum(
+                1 for outbox in list(self.outboxes) if outbox.overflowed
+            ),
+            "rtt_ms": self.rtt_stats(outboxes),
+        }
+
+    def rtt_stats(self, outboxes):
+        # Spread of the smoothed round trip times of connections that ping
+        rtts = sorted(outbox.latency.rtt * 1000 for outbox in outboxes if outbox.latency.rtt)
+        if not rtts:
+            return None
+        return {
+            "connections": len(rtts),
+            "p50": rtts[len(rtts) // 2],
+            "p90": rtts[int(len(rtts) * 0.9)],
+            "max": rtts[-1],
+        }
+
+    def print_stats_loop(self):
+        while True:
+            time.sleep(self.stats_interval)
+            print(f"Outbound queues: {self.queue_stats()}")
+            print(f"Sessions: {self.sessions.stats()}")
+
+    def reap_loop(self):
+        while True:
+            time.sleep(REAP_INTERVAL)
+            self.sessions.prune_ended()
+            if not self.idle_timeout:
+                continue
+            idle = self.sessions.idle_sessions(self.idle_timeout)
+            for session in idle:
+                self.scheduler.post(session, ("end", "idle"))
+            if idle:
+                print(f"Evicting {len(idle)} idle games")
 
     def start(self):
+        if self.stats_interval:
+            start_new_thread(self.print_stats_loop, ())
+        if self.idle_timeout or self.reconnect_grace:
+            start_new_thread(self.reap_loop, ())
+        if self.state_dir and self.snapshot_interval:
+            start_new_thread(self.snapshot_loop, ())
+        if self.metrics_port:
+            metrics.serve(self.metrics_port)
+            print(f"Metrics on http://127.0.0.1:{self.metrics_port}/metrics")
+
         while True:
             try:
                 conn, addr = self.server.accept()
                 print(f"Connected to: {addr}")
+                CONNECTIONS.labels("socket").inc()
 
-                try:
-                    data = pickle.loads(conn.recv(2048))
-                    if isinstance(data, str):  # If data is just the player name
-                        player_name = data
-                        print(f"Player {player_name} connected")
-
-                        # Start new thread for this client
-                        start_new_thread(self.handle_client, (conn, player_name))
-                except Exception as e:
-                    print(f"Error handling connection: {e}")
-                    conn.close()
+                # Only accept here; waiting for the first message would let
+                # one silent client hold up every connection behind it
+                start_new_thread(self.handshake, (conn,))
 
             except Exception as e:
                 print(f"Server error: {e}")
@@ -171,53 +1331,140 @@ class GameServer:
 
         print("Server shutting down...")
         self.server.close()
+        if self.match_log is not None:
+            self.match_log.close()
+        if self.player_stats is not None:
+            self.player_stats.close()
+
+    def stop(self):
+        # Makes start() return; the shutdown wakes up a blocked accept()
+        try:
+            self.server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.server.close()
+
+    def handshake(self, conn, allow_mux=True):
+        try:
+            # One buffered reader for the connection's whole life: TCP can
+            # hand over several messages in one read, and whatever arrived
+            # behind the first belongs to whoever reads next
+            conn.settimeout(self.handshake_timeout)
+            stream = conn.makefile("rb")
+            data = pickle.load(stream)
+            conn.settimeout(None)
+
+            if isinstance(data, str):  # If data is just the player name
+                player_name = data
+                print(f"Player {player_name} connected")
+
+                outbox = self.open_outbox(conn)
+                self.handle_client(conn, stream, outbox, player_name)
+            elif isinstance(data, dict) and data.get("action") == "spectate":
+                self.handle_spectator(conn, stream, data.get("game_id"))
+            elif isinstance(data, dict) and data.get("action") == "resume":
+                self.handle_resume(conn, stream, data.get("token"))
+            elif isinstance(data, dict) and data.get("action") == "leaderboard":
+                self.handle_leaderboard(conn, data.get("top"), data.get("player"))
+            elif isinstance(data, dict) and data.get("action") == "mux" and allow_mux:
+                self.handle_mux(conn, stream)
+            else:
+                print(f"Unexpected first message: {data}")
+                HANDSHAKE_FAILURES.inc()
+                conn.close()
+        except Exception as e:
+            print(f"Error handling connection: {e}")
+            HANDSHAKE_FAILURES.inc()
+            conn.close()
+
+    def handle_mux(self, conn, stream):
+        # A relay or bot process driving many players over one connection.
+        # Each new channel id starts its own handshake, exactly as if a new
+        # socket had connected.
+        print("Multiplexed connection opened")
+        outbox = self.open_outbox(conn, MUX_OUTBOX_SIZE)
+        channels = {}
+        last_channel_id = 0  # clients number channels upwards from 1
+        # Acknowledge before any frames, so none arrive glued to the request
+        conn.sendall(pickle.dumps({"status": "mux"}))
 
-    def handle_client(self, conn, player_name):
         try:
-            if self.waiting_player is None:
+            while True:
+                channel_id, length = pickle.load(stream)
+                data = stream.read(length) if length else b""
+                if length and len(data) < length:
+                    break  # connection closed mid-frame
+
+                channel = channels.get(channel_id)
+                if channel is None:
+                    if not length or channel_id <= last_channel_id:
+                        continue  # late message for a channel already closed
+                    last_channel_id = channel_id
+                    channel = Channel(channel_id, outbox, channels)
+                    channels[channel_id] = channel
+                    CONNECTIONS.labels("channel").inc()
+                    channel.deliver(data)
+                    start_new_thread(self.handshake, (channel, False))
+                elif length:
+                    channel.deliver(data)
+                else:
+                    # The client closed this channel
+                    channel.shutdown(socket.SHUT_RDWR)
+        except Exception as e:
+            print(f"Multiplexed connection closed: {e}")
+
+        # Everything on this connection is gone with it
+        for channel in list(channels.values()):
+            channel.shutdown(socket.SHUT_RDWR)
+        outbox.close()
+
+    def handle_client(self, conn, stream, outbox, player_name):
+        # Gets the session once someone pairs with this player, or None if
+        # the match couldn't be started
+        seat = queue.Queue(maxsize=1)
+        try:
+            with self.lobby_lock:
+                opponent = self.waiting_player
+                if opponent is None:
+                    self.waiting_player = (conn, player_name, outbox, seat)
+                else:
+                    # Claim the waiting player so nobody else pairs with them
+                    self.waiting_player = None
+
+            if opponent is None:
                 # First player to join
                 print(f"First player {player_name} waiting for opponent")
-                self.waiting_player = (conn, player_name)
-
-                # Keep first player updated while waiting
-                while self.waiting_player and self.waiting_player[0] == conn:
-                    try:
-                        conn.send(pickle.dumps({"status": "waiting"}))
-                        # Receive any messages from client without breaking connection
-                        try:
-                            data = pickle.loads(conn.recv(2048))
-                            if not data:  # Client disconnected
-                                break
-                        except:
-                            pass  # Ignore timeout/empty messages
-                        time.sleep(0.1)  # Short delay to prevent CPU overload
-                    except Exception as e:
-                        print(f"Error in waiting loop: {e}")
-                        break
+                self.wait_for_opponent(stream, outbox, player_name, seat)
 
             else:
                 # Second player - start the game
-                player1_conn, player1_name = self.waiting_player
+                _, player1_name, player1_outbox, player1_seat = opponent
                 player2_conn = conn
                 player2_name = player_name
+                player2_outbox = outbox
 
                 print(f"Second player {player_name} joined, starting game")
+                MATCHES_STARTED.inc()
 
-                # Create game session
-                game_session = GameSession(
-                    player1_conn, player1_name, player2_conn, player2_name
-                )
-                game_id = len(self.games)
-                self.games[game_id] = game_session
-
-                # Send initial game state to both players
+                # Player 1's thread is waiting on player1_seat; whatever
+                # goes wrong from here, it has to be told
                 try:
+                    # Create game session
+                    game_session = self.sessions.create(
+                        player1_outbox, player1_name, player2_outbox, player2_name
+                    )
+                    game_id = game_session.game_id
+                    # Nothing else runs this session yet, so it's safe from here
+                    self.start_turn(game_session)
+
+                    # Send initial game state to both players
                     # Prepare data for player 1
                     player1_data = {
                         "status": "starting",
                         "game_id": game_id,
                         "player_num": 1,
-                        "game_state": game_session.game_state,
+                        "game_state": game_session.player_view(),
+                        "resume_token": game_session.resume_tokens[1],
                     }
 
                     # Prepare data for player 2
@@ -225,128 +1472,458 @@ class GameServer:
                         "status": "starting",
                         "game_id": game_id,
                         "player_num": 2,
-                        "game_state": game_session.game_state,
+                        "game_state": game_session.player_view(),
+                        "resume_token": game_session.resume_tokens[2],
                     }
 
                     # Send data and verify it was received
-                    player1_conn.send(pickle.dumps(player1_data))
+                    player1_outbox.send(pickle.dumps(player1_data))
                     print(f"Sent game data to {player1_name}")
 
-                    player2_conn.send(pickle.dumps(player2_data))
+                    player2_outbox.send(pickle.dumps(player2_data))
                     print(f"Sent game data to {player2_name}")
 
-                    # Reset waiting player
-                    self.waiting_player = None
-
-                    # Start game handler threads
-                    start_new_thread(
-                        self.handle_game_client, (player1_conn, game_id, 1)
-                    )
-                    start_new_thread(
-                        self.handle_game_client, (player2_conn, game_id, 2)
-                    )
-
-                    return  # Successfully started game
-
                 except Exception as e:
                     print(f"Error starting game: {e}")
-                    self.waiting_player = None
+                    # Hang up on both; closing player 1's connection also
+                    # wakes their thread if it is waiting on a read
+                    player1_seat.put(None)
+                    player1_outbox.close()
+                    player2_outbox.close()
                     raise e
 
+                # Player 1's thread carries on reading their connection;
+                # this one reads player 2's
+                player1_seat.put(game_session)
+                self.handle_game_client(stream, game_session, 2, player2_outbox)
+
         except Exception as e:
             print(f"Error in handle_client: {e}")
-            if self.waiting_player and self.waiting_player[0] == conn:
-                self.waiting_player = None
-
-    def handle_game_client(self, conn, game_id, player_num):
-        game = self.games[game_id]
+            with self.lobby_lock:
+                if self.waiting_player and self.waiting_player[3] is seat:
+                    self.waiting_player = None
 
+    def wait_for_opponent(self, stream, outbox, player_name, seat):
+        # Answers the client's polls until someone pairs with this player.
+        # This thread stays the connection's only reader: once paired it
+        # becomes the player's game loop, starting with the message it was
+        # waiting on, so nothing the client sends around the pairing is lost.
+        outbox.send(pickle.dumps({"status": "waiting"}))
         while True:
             try:
-                # Keep connection alive with periodic updates
-                if player_num == 1:
-                    player = game.player1
+                data = pickle.load(stream)
+            except Exception as e:
+                print(f"Lost connection to player {player_name}: {e}")
+                data = None
+
+            with self.lobby_lock:
+                waiting = self.waiting_player is not None and self.waiting_player[3] is seat
+                if waiting and data is None:
+                    # Left before anyone joined; don't pair the next player
+                    # with a closed connection
+                    print(f"Player {player_name} left the lobby")
+                    self.waiting_player = None
+                    outbox.close()
+                    return
+            if not waiting:
+                game = seat.get()
+                if game is None:
+                    outbox.close()  # the match couldn't be started
                 else:
-                    player = game.player2
+                    # A connection already gone fails its next read there
+                    # and holds the seat like any other drop
+                    self.handle_game_client(stream, game, 1, outbox, data)
+                return
+            outbox.send(pickle.dumps({"status": "waiting"}))
 
-                # Send current game state
-                try:
-                    game_update = {"status": "in_game", "game_state": game.game_state}
-                    conn.send(pickle.dumps(game_update))
-
-                    # Receive client response
-                    data = pickle.loads(conn.recv(2048 * 2))
-                    if data == "get_state":
-                        continue
-
-                    # Handle game actions
-                    if isinstance(data, dict) and data.get("action") == "play_card":
-                        card = data.get("card")
-                        player_name = game.player1["name"] if player_num == 1 else game.player2["name"]
-
-                        # Only allow card play if it's player's turn
-                        if game.game_state["current_turn"] == player_name:
-                            # Update played card and switch turn
-                            if player_num == 1:
-                                game.game_state["player1"]["played_card"] = card
-                                game.game_state["current_turn"] = game.player2["name"]
-                            else:
-                                game.game_state["player2"]["played_card"] = card
-                                game.game_state["current_turn"] = game.player1["name"]
-
-                            print(f"Player {player_name} played card: {card}")
-                            print(f"Turn switched to: {game.game_state['current_turn']}")
-
-                            # Send update about played card to both players
-                            turn_update = {
-                                "status": "in_game",
-                                "game_state": game.game_state
-                            }
-                            game.player1["conn"].send(pickle.dumps(turn_update))
-                            game.player2["conn"].send(pickle.dumps(turn_update))
-
-                            # Check if both players have played
-                            if (game.game_state["player1"]["played_card"] and 
-                                game.game_state["player2"]["played_card"]):
-                                # Add delay before comparison
-                                time.sleep(1)
-                                
-                                # First send state to reveal both cards
-                                reveal_state = {
-                                    "status": "in_game",
-                                    "game_state": game.game_state,
-                                    "reveal_cards": True
-                                }
-                                game.player1["conn"].send(pickle.dumps(reveal_state))
-                                game.player2["conn"].send(pickle.dumps(reveal_state))
-                                
-                                # Wait for cards to be shown
-                                time.sleep(2)
-                                
-                                # Compare cards and determine winner
-                                winner = game.compare_cards()
-                                print(f"Round complete. Winner: {winner}")
-                                
-                                # Send final round result
-                                result_update = {
-                                    "status": "in_game",
-                                    "game_state": game.game_state
-                                }
-                                game.player1["conn"].send(pickle.dumps(result_update))
-                                game.player2["conn"].send(pickle.dumps(result_update))
-                                print("Sent round result to both players")
+    def handle_spectator(self, conn, stream, game_id):
+        game = self.sessions.get(game_id)
+        if game is None:
+            print(f"Spectator asked for unknown game {game_id}")
+            try:
+                conn.sendall(pickle.dumps({"status": "error", "message": "no such game"}))
+            except socket.error:
+                pass
+            conn.close()
+            return
 
-                except Exception as e:
-                    print(f"Error in game loop: {e}")
-                    break
+        print(f"Spectator joined game {game_id}")
+        # A viewer that falls behind only misses snapshots it would have
+        # had to skip anyway
+        spectator = self.open_outbox(conn, SPECTATOR_QUEUE_SIZE, DROP_OLDEST)
+        self.scheduler.post(game, ("add_spectator", spectator))
 
-                time.sleep(0.1)
+        # Spectators only listen; wait here until they hang up
+        try:
+            while stream.read1(2048):
+                pass
+        except socket.error:
+            pass
+
+        print(f"Spectator left game {game_id}")
+        self.scheduler.post(game, ("remove_spectator", spectator))
+
+    def handle_leaderboard(self, conn, top, player_name):
+        # One reply and hang up: the top players, and where player_name
+        # stands if given. Read on this connection's thread, never a
+        # session's, through one of the stats store's read connections.
+        try:
+            if self.player_stats is None:
+                reply = {"status": "error", "message": "the server keeps no stats"}
+            else:
+                if not isinstance(top, int) or isinstance(top, bool):
+                    top = LEADERBOARD_SIZE
+                reply = {"status": "leaderboard", "top": self.player_stats.top(top)}
+                if isinstance(player_name, str):
+                    reply["player"] = player_name
+                    reply["rank"] = self.player_stats.rank(player_name)
+            conn.sendall(pickle.dumps(reply))
+        except Exception as e:
+            print(f"Error answering leaderboard request: {e}")
+        finally:
+            conn.close()
+
+    def handle_resume(self, conn, stream, token):
+        # A player whose connection dropped mid-match, back with the token
+        # they got at "starting". The session is still running; their new
+        # connection takes the old one's place and gets a snapshot to carry
+        # on from.
+        game, player_num = self.sessions.resume(token)
+        if game is None:
+            final_state = self.sessions.final_state(token)
+            if final_state is not None:
+                # Gone while the match ended; all that's left is the result
+                RESUMES.labels("ended").inc()
+                outbox = self.open_outbox(conn)
+                outbox.send(final_state)
+                outbox.close(flush=True)
+                return
+            print("Resume with an unknown or expired token")
+            RESUMES.labels("rejected").inc()
+            try:
+                conn.sendall(pickle.dumps({"status": "error", "message": "cannot resume"}))
+            except socket.error:
+                pass
+            conn.close()
+            return
+
+        RESUMES.labels("resumed").inc()
+        outbox = self.open_outbox(conn)
+        # Queued ahead of anything the new connection's messages post
+        self.scheduler.post(game, ("resume", player_num, outbox))
+        self.handle_game_client(stream, game, player_num, outbox)
+
+    def handle_game_client(self, stream, game, player_num, outbox, first=None):
+        # Reads this player's messages and posts them to the session; the
+        # Scheduler does the rest. first is a message already read off the
+        # stream, by the lobby.
+        data = first
+        while not game.ended:
+            try:
+                # Answer every message with the current game state
+                self.scheduler.post(game, ("send_state", player_num))
+
+                if data is None:
+                    data = pickle.load(stream)
+                if isinstance(data, dict) and data.get("action") == "play_card":
+                    MESSAGES.labels("play_card").inc()
+                    self.scheduler.post(game, ("play_card", player_num, data.get("card")))
+                elif isinstance(data, dict) and data.get("action") == "ping":
+                    MESSAGES.labels("ping").inc()
+                    self.handle_ping(outbox, data)
+                elif data in ("get_state", "get_status", "ready"):
+                    MESSAGES.labels(data).inc()
+                else:
+                    MESSAGES.labels("other").inc()
+                data = None
 
             except Exception as e:
                 print(f"Lost connection to player {player_num}: {e}")
                 break
 
+        # Hold the player's seat for a while in case they come back; a no-op
+        # if the match already ended
+        self.scheduler.post(game, ("disconnect", player_num, outbox))
+
+    def handle_ping(self, outbox, data):
+        # Answer straight away rather than through the Scheduler, so the
+        # client's round trip is the network and not the session's mailbox.
+        # If the ping echoes the server_time of our last pong, the same
+        # exchange times the round trip on our clock: minus however long
+        # the client held on to it before pinging again.
+        now = time.monotonic()
+        echo = data.get("echo")
+        held = data.get("held")
+        if isinstance(echo, float) and isinstance(held, float):
+            sample = now - echo - held
+            if 0 <= sample < 60:
+                outbox.latency.add(sample)
+                PLAYER_RTT_SECONDS.observe(sample)
+        outbox.send(pickle.dumps({
+            "status": "pong",
+            "seq": data.get("seq"),
+            "sent": data.get("sent"),
+            "server_time": time.monotonic(),
+            "server_wall": time.time(),  # lets clients line up turn deadlines
+        }))
+
+    def start_turn(self, game):
+        # Starts the clock on whoever's turn it is. Each session has at most
+        # one "turn_timeout" on the Scheduler's timer heap: a turn that
+        # starts while it's waiting just moves the deadline, and the timer
+        # re-arms itself for the new one when it fires. So the heap holds
+        # one entry per live match however fast turns go by, and arming is
+        # a single O(log n) push.
+        if not self.turn_timeout:
+            return
+        game.start_turn(self.turn_timeout)
+        if not game.turn_timer_armed:
+            game.turn_timer_armed = True
+            self.scheduler.post_later(
+                self.turn_timeout + TURN_GRACE, game, ("turn_timeout",)
+            )
+
+    def card_played(self, game):
+        # Send update about played card to both players
+        game.broadcast()
+
+        # Once both have played, reveal the cards after a pause; the clock
+        # stops until the next round
+        if game.both_played():
+            game.stop_turn_clock()
+            self.scheduler.post_later(REVEAL_DELAY, game, ("reveal",))
+        else:
+            self.start_turn(game)
+
+    def turn_expired(self, game):
+        game.turn_timer_armed = False
+        if game.turn_deadline is None:
+            return  # between rounds; the next start_turn re-arms
+        remaining = game.turn_deadline + TURN_GRACE - time.monotonic()
+        if remaining > 0:
+            # The turn changed since this was armed; wait for the new deadline
+            game.turn_timer_armed = True
+            self.scheduler.post_later(remaining, game, ("turn_timeout",))
+            return
+
+        player_num = game.current_player()
+        if game.turn_timed_out(player_num):
+            TURN_TIMEOUTS.labels("autoplay").inc()
+            self.card_played(game)
+        else:
+            TURN_TIMEOUTS.labels("forfeit").inc()
+            self.sessions.end(game.game_id, "forfeit")
+
+    def player_disconnected(self, game, player_num, outbox):
+        if game.player(player_num)["outbox"] is not outbox:
+            return  # an old connection, already replaced by a resume
+        if not self.reconnect_grace:
+            self.sessions.end(game.game_id, "abandoned")
+            return
+        # Both seats can be held at once: a network blip at our end drops
+        # every player together
+        dropped = game.disconnect(player_num)
+        self.scheduler.post_later(
+            self.reconnect_grace, game, ("reconnect_expired", player_num, dropped)
+        )
+
+    def restored(self, game):
+        # A session rebuilt by restore(): hold both seats for the players to
+        # resume into, and restart whatever the old process was timing
+        if game.is_finished():
+            self.sessions.end(game.game_id, "finished")
+            return
+        for player_num in (1, 2):
+            dropped = game.disconnect(player_num)
+            self.scheduler.post_later(
+                self.reconnect_grace, game, ("reconnect_expired", player_num, dropped)
+            )
+        if game.revealed:
+            self.scheduler.post_later(RESULT_DELAY, game, ("resolve",))
+        elif game.both_played():
+            self.scheduler.post_later(REVEAL_DELAY, game, ("reveal",))
+        else:
+            self.start_turn(game)
+
+    def handle_action(self, game, action):
+        # Runs on a Scheduler worker, the only place game state changes
+        kind = action[0]
+        if game.ended:
+            # Hang up on connections that arrived too late for the match
+            if kind == "add_spectator":
+                action[1].close()
+            elif kind == "resume":
+                # Ended between the lookup and now: just the result
+                _, player_num, outbox = action
+                outbox.send(game.snapshot(player_num))
+                outbox.close(flush=True)
+            elif kind == "checkpoint":
+                action[1].put(None)
+            return
+
+        if kind == "send_state":
+            player = game.player1 if action[1] == 1 else game.player2
+            player["outbox"].send(game.encode_state())
+
+        elif kind == "play_card":
+            _, player_num, card = action
+            # Only allow card play if it's player's turn
+            if game.play_card(player_num, card):
+                self.card_played(game)
+
+        elif kind == "reveal":
+            game.reveal()
+            # Give the cards time to be shown before scoring the round
+            self.scheduler.post_later(RESULT_DELAY, game, ("resolve",))
+
+        elif kind == "resolve":
+            winner = game.compare_cards()
+            print(f"Round complete. Winner: {winner}")
+
+            # Send final round result
+            game.broadcast()
+            print("Sent round result to both players")
+
+            if game.is_finished():
+                self.sessions.end(game.game_id, "finished")
+            else:
+                self.start_turn(game)
+
+        elif kind == "turn_timeout":
+            self.turn_expired(game)
+
+        elif kind == "disconnect":
+            _, player_num, outbox = action
+            self.player_disconnected(game, player_num, outbox)
+
+        elif kind == "resume":
+            _, player_num, outbox = action
+            game.resume(player_num, outbox)
+            outbox.send(game.snapshot(player_num))
+
+        elif kind == "checkpoint":
+            action[1].put(game.checkpoint(self.match_log.position()))
+
+        elif kind == "restored":
+            self.restored(game)
+
+        elif kind == "reconnect_expired":
+            # Still gone since the same disconnection: give up on them
+            _, player_num, dropped = action
+            if game.disconnected.get(player_num) == dropped:
+                self.sessions.end(game.game_id, "abandoned")
+
+        elif kind == "add_spectator":
+            spectator = action[1]
+            spectator.send(game.encode_state(spectator=True))
+            game.add_spectator(spectator)
+
+        elif kind == "remove_spectator":
+            game.remove_spectator(action[1])
+
+        elif kind == "end":
+            self.sessions.end(game.game_id, action[1])
+
 
 if __name__ == "__main__":
-    server = GameServer()
+    parser = argparse.ArgumentParser(description="Card game server")
+    parser.add_argument("--host", default="")
+    parser.add_argument("--port", type=int, default=5555)
+    parser.add_argument(
+        "--listen",
+        help="transport URL to listen on instead of --host/--port, "
+        "e.g. unix:///tmp/card_game.sock",
+    )
+    parser.add_argument(
+        "--stats-interval",
+        type=float,
+        default=0,
+        help="print outbound queue stats every this many seconds (0 = off)",
+    )
+    parser.add_argument(
+        "--backlog",
+        type=int,
+        default=LISTEN_BACKLOG,
+        help="listen backlog for connections not yet accepted",
+    )
+    parser.add_argument(
+        "--handshake-timeout",
+        type=float,
+        default=HANDSHAKE_TIMEOUT,
+        help="seconds a new connection has to send its player name",
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=IDLE_TIMEOUT,
+        help="seconds without a play before a match is evicted (0 = never)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=WORKER_THREADS,
+        help="threads running game sessions",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=0,
+        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics (0 = off)",
+    )
+    parser.add_argument(
+        "--match-log",
+        help="append every match's events to binary logs in this directory",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="seed the session RNGs for a reproducible run (default: random)",
+    )
+    parser.add_argument(
+        "--turn-timeout",
+        type=float,
+        default=TURN_TIMEOUT,
+        help="seconds per turn before the server plays for the player (0 = no limit)",
+    )
+    parser.add_argument(
+        "--reconnect-grace",
+        type=float,
+        default=RECONNECT_GRACE,
+        help="seconds a dropped player can resume their match (0 = end it at once)",
+    )
+    parser.add_argument(
+        "--state-dir",
+        help="keep a durable match log and session snapshots here, and carry on "
+        "the matches found there on startup (replaces --match-log)",
+    )
+    parser.add_argument(
+        "--snapshot-interval",
+        type=float,
+        default=SNAPSHOT_INTERVAL,
+        help="seconds between snapshots of every live session with --state-dir",
+    )
+    parser.add_argument(
+        "--stats-db",
+        help="keep players' win/loss records and the leaderboard in this SQLite file",
+    )
+    args = parser.parse_args()
+
+    server = GameServer(
+        args.host,
+        args.port,
+        args.stats_interval,
+        args.backlog,
+        args.handshake_timeout,
+        args.idle_timeout,
+        args.workers,
+        from_url(args.listen) if args.listen else None,
+        args.metrics_port,
+        args.match_log,
+        args.seed,
+        args.turn_timeout,
+        args.reconnect_grace,
+        args.state_dir,
+        args.snapshot_interval,
+        args.stats_db,
+    )
     server.start()
@@ -0,0 +1,282 @@
+import argparse
+import contextlib
+import queue
+import sqlite3
+import threading
+import time
+
+# Win/loss records per player name and a leaderboard, in a local SQLite file.
+#
+# The server hands every finished match to StatsStore.record(), which only
+# queues it: one writer thread takes whatever has queued up and writes it
+# in a single transaction, so neither the Scheduler workers nor the player
+# threads ever wait on the disk. Reads (top(), rank()) borrow one of a few
+# read connections kept open for them and, with the database in WAL mode,
+# don't wait for the writer either.
+#
+#   python server.py --stats-db stats.db
+#   python stats.py stats.db                  # top 10
+#   python stats.py stats.db --player alice   # alice's record and rank
+
+BATCH_SIZE = 2000  # matches written per transaction at most
+BATCH_DELAY = 0.5  # seconds the writer waits for a batch to fill up
+TOP_LIMIT = 100  # most leaderboard rows one query returns
+IN_CHUNK = 500  # names per "IN (...)" lookup, under SQLite's variable limit
+WRITER_CACHE_KB = 65536  # page cache for the writer; players' rows are updated all over
+
+# players: one row per name. A match that stopped without a winner
+# (abandoned or idle) counts as unfinished for both.
+#
+# win_counts: how many players have each number of wins, kept up to date by
+# the writer. A player's rank is one more than the number of players with
+# more wins, which is a sum over the distinct win counts rather than a count
+# over every player above them, so it takes the same time with a hundred
+# players or ten million.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    name TEXT PRIMARY KEY,
+    wins INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    unfinished INTEGER NOT NULL DEFAULT 0,
+    last_played REAL
+);
+CREATE INDEX IF NOT EXISTS players_by_wins ON players (wins DESC, name);
+CREATE TABLE IF NOT EXISTS win_counts (
+    wins INTEGER PRIMARY KEY,
+    players INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY,
+    game_id INTEGER NOT NULL,
+    ended REAL NOT NULL,
+    player1 TEXT NOT NULL,
+    player2 TEXT NOT NULL,
+    score1 INTEGER NOT NULL,
+    score2 INTEGER NOT NULL,
+    winner INTEGER NOT NULL,
+    reason TEXT NOT NULL
+);
+"""
+
+UPDATE_PLAYER = """
+INSERT INTO players (name, wins, losses, unfinished, last_played)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (name) DO UPDATE SET
+    wins = wins + excluded.wins,
+    losses = losses + excluded.losses,
+    unfinished = unfinished + excluded.unfinished,
+    last_played = excluded.last_played
+"""
+
+UPDATE_WIN_COUNT = """
+INSERT INTO win_counts (wins, players) VALUES (?, ?)
+ON CONFLICT (wins) DO UPDATE SET players = players + excluded.players
+"""
+
+
+def connect(path, check_same_thread=True):
+    # isolation_level None: transactions by hand
+    db = sqlite3.connect(path, isolation_level=None, check_same_thread=check_same_thread)
+    db.execute("PRAGMA journal_mode = WAL")
+    # With WAL this only gives up the last transactions if the machine
+    # goes down, never the database
+    db.execute("PRAGMA synchronous = NORMAL")
+    db.execute("PRAGMA busy_timeout = 5000")
+    return db
+
+
+class StatsStore:
+    def __init__(self, path, batch_size=BATCH_SIZE, batch_delay=BATCH_DELAY):
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.pending = queue.SimpleQueue()  # unbounded: putting never blocks
+        # Read connections not in use. Any thread may borrow one, but only
+        # one thread at a time, so there are only ever as many as there
+        # have been reads at once.
+        self.idle_readers = queue.SimpleQueue()
+        self.written = 0  # matches in the database
+        self.batches = 0
+        db = connect(path)
+        db.executescript(SCHEMA)
+        db.close()
+        self.writer = threading.Thread(target=self.write_loop, daemon=True)
+        self.writer.start()
+
+    def record(self, game_id, player1, player2, score1, score2, winner, reason):
+        # winner is 1 or 2, or 0 if the match stopped without one
+        self.pending.put((game_id, time.time(), player1, player2, score1, score2, winner, reason))
+
+    def queued(self):
+        return self.pending.qsize()
+
+    def write_loop(self):
+        db = connect(self.path)
+        db.execute(f"PRAGMA cache_size = -{WRITER_CACHE_KB}")
+        while True:
+            match = self.pending.get()
+            if match is None:
+                break
+            batch = [match]
+            # Let more pile up for one transaction, but not for long
+            deadline = time.monotonic() + self.batch_delay
+            closing = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    match = self.pending.get(timeout=max(remaining, 0))
+                except queue.Empty:
+                    break
+                if match is None:
+                    closing = True
+                    break
+                batch.append(match)
+            try:
+                self.write(db, batch)
+            except sqlite3.Error as e:
+                print(f"Error writing {len(batch)} matches to {self.path}: {e}")
+            if closing:
+                break
+        db.close()
+
+    def write(self, db, batch):
+        # Per player totals for the whole batch, so each name is updated once
+        totals = {}  # name -> [wins, losses, unfinished, last played]
+        for _, ended, player1, player2, _, _, winner, _ in batch:
+            for player_num, name in ((1, player1), (2, player2)):
+                total = totals.setdefault(name, [0, 0, 0, ended])
+                if winner == player_num:
+                    total[0] += 1
+                elif winner:
+                    total[1] += 1
+                else:
+                    total[2] += 1
+                total[3] = ended
+
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany(
+                "INSERT INTO matches (game_id, ended, player1, player2, score1, score2, "
+                "winner, reason) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+
+            # Players move between win counts; new ones join theirs
+            names = list(totals)
+            wins_before = {}
+            for i in range(0, len(names), IN_CHUNK):
+                chunk = names[i:i + IN_CHUNK]
+                wins_before.update(db.execute(
+                    f"SELECT name, wins FROM players WHERE name IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ))
+            moves = {}
+            for name, (wins, _, _, _) in totals.items():
+                before = wins_before.get(name)
+                if before is not None and not wins:
+                    continue
+                if before is not None:
+                    moves[before] = moves.get(before, 0) - 1
+                after = (before or 0) + wins
+                moves[after] = moves.get(after, 0) + 1
+
+            db.executemany(
+                UPDATE_PLAYER, [(name, *total) for name, total in totals.items()]
+            )
+            db.executemany(UPDATE_WIN_COUNT, [move for move in moves.items() if move[1]])
+            db.execute("DELETE FROM win_counts WHERE players = 0")
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self.written += len(batch)
+        self.batches += 1
+
+    @contextlib.contextmanager
+    def reader(self):
+        # A read connection to use in a with block; it goes back for the
+        # next read afterwards, whatever happens
+        try:
+            db = self.idle_readers.get_nowait()
+        except queue.Empty:
+            db = connect(self.path, check_same_thread=False)
+        try:
+            yield db
+        finally:
+            self.idle_readers.put(db)
+
+    def top(self, count=10):
+        # [(name, wins, losses)], most wins first; ties by name
+        with self.reader() as db:
+            return top(db, count)
+
+    def rank(self, name):
+        # (rank, wins, losses), or None for a name with no matches
+        with self.reader() as db:
+            return rank(db, name)
+
+    def close(self):
+        # Writes whatever is still queued, then stops the writer
+        self.pending.put(None)
+        self.writer.join()
+        while True:
+            try:
+                self.idle_readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def top(db, count=10):
+    count = max(0, min(count, TOP_LIMIT))
+    return db.execute(
+        "SELECT name, wins, losses FROM players ORDER BY wins DESC, name LIMIT ?",
+        (count,),
+    ).fetchall()
+
+
+def rank(db, name):
+    # Both reads in one transaction, so they see the same batch of matches
+    db.execute("BEGIN")
+    try:
+        row = db.execute("SELECT wins, losses FROM players WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        wins, losses = row
+        (above,) = db.execute(
+            "SELECT COALESCE(SUM(players), 0) FROM win_counts WHERE wins > ?", (wins,)
+        ).fetchone()
+        return above + 1, wins, losses
+    finally:
+        db.execute("COMMIT")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read the server's player stats")
+    parser.add_argument("path")
+    parser.add_argument("--top", type=int, default=10, help="leaderboard rows to print")
+    parser.add_argument("--player", help="print this player's record and rank")
+    args = parser.parse_args()
+
+    db = connect(args.path)
+    if args.player is not None:
+        found = rank(db, args.player)
+        if found is None:
+            print(f"{args.player} has no matches")
+        else:
+            print(f"{args.player}: rank {found[0]}, {found[1]} wins, {found[2]} losses")
+        return
+
+    (players,) = db.execute("SELECT COUNT(*) FROM players").fetchone()
+    (matches,) = db.execute("SELECT COUNT(*) FROM matches").fetchone()
+    print(f"{players} players, {matches} matches")
+    # Ranked as rank() does: players with the same wins share a rank
+    place = 0
+    previous = None
+    for position, (name, wins, losses) in enumerate(top(db, args.top), 1):
+        if wins != previous:
+            place, previous = position, wins
+        print(f"{place:>4}  {name:<20} {wins:>6} wins {losses:>6} losses")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import io
+import os
+import queue
+import socket
+import threading
+
+# Transports decide how clients reach the server. They all hand out objects
+# with the same socket API (connect, send, sendall, recv, settimeout,
+# shutdown, close, makefile), so GameServer, NetworkGame and the bots don't
+# care which one is in use:
+#
+#   tcp://host:port     TCP, what the real game uses
+#   unix:///path/sock   Unix domain socket, for bots on the same machine
+#   inproc://name       in-memory pipes inside one process, for benchmarks
+#                       and tests; no kernel, ports or files involved
+
+DEFAULT_URL = "tcp://localhost:5555"
+
+
+class TcpTransport:
+    def __init__(self, host="localhost", port=5555):
+        self.address = (host, port)
+
+    def socket(self):
+        return socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+    def listen(self, backlog):
+        server = self.socket()
+        server.bind(self.address)
+        server.listen(backlog)
+        return server
+
+    def __str__(self):
+        return f"tcp://{self.address[0]}:{self.address[1]}"
+
+
+class UnixTransport:
+    def __init__(self, path):
+        self.address = path
+
+    def socket(self):
+        return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    def listen(self, backlog):
+        # A socket file left behind by a previous run would make bind fail
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        server = self.socket()
+        server.bind(self.address)
+        server.listen(backlog)
+        return server
+
+    def __str__(self):
+        return f"unix://{self.address}"
+
+
+# Listening in-process servers by name
+_listeners = {}
+_listeners_lock = threading.Lock()
+
+
+class InProcessTransport:
+    def __init__(self, name="server"):
+        self.address = name
+
+    def socket(self):
+        return InProcessSocket()
+
+    def listen(self, backlog):
+        listener = InProcessListener(self.address)
+        with _listeners_lock:
+            if self.address in _listeners:
+                raise OSError(f"inproc://{self.address} is already in use")
+            _listeners[self.address] = listener
+        return listener
+
+    def __str__(self):
+        return f"inproc://{self.address}"
+
+
+class InProcessListener:
+    def __init__(self, name):
+        self.name = name
+        self.pending = queue.Queue()
+        self.closed = False
+
+    def accept(self):
+        conn = self.pending.get()
+        if conn is None:
+            raise OSError("listener closed")
+        return conn, f"inproc://{self.name}"
+
+    def shutdown(self, how):
+        self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        with _listeners_lock:
+            if _listeners.get(self.name) is self:
+                del _listeners[self.name]
+        self.pending.put(None)  # wake up accept()
+
+
+class InProcessSocket:
+    # One end of an in-memory byte stream. Bytes sent on one end are appended
+    # to the other end's buffer, so recv() behaves like a stream socket's:
+    # messages can arrive split or glued together.
+    def __init__(self):
+        self.peer = None
+        self.buffer = bytearray()
+        self.ready = threading.Condition()
+        self.timeout = None
+        self.eof = False  # the peer won't send anything more
+        self.closed = False
+
+    def connect(self, address):
+        with _listeners_lock:
+            listener = _listeners.get(address)
+        if listener is None:
+            raise ConnectionRefusedError(f"nothing listening on inproc://{address}")
+        server_end = InProcessSocket()
+        server_end.peer = self
+        self.peer = server_end
+        listener.pending.put(server_end)
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def setsockopt(self, *args):
+        pass
+
+    def deliver(self, data):
+        with self.ready:
+            self.buffer += data
+            self.ready.notify_all()
+
+    def send(self, data):
+        if self.closed or self.peer is None:
+            raise BrokenPipeError("in-process connection closed")
+        # Like TCP, writing to a peer that has hung up doesn't fail right
+        # away, so whatever it sent before closing can still be read
+        if not self.peer.closed:
+            self.peer.deliver(bytes(data))
+        return len(data)
+
+    def sendall(self, data):
+        self.send(data)
+
+    def recv(self, bufsize):
+        with self.ready:
+            if not self.ready.wait_for(lambda: self.buffer or self.eof, self.timeout):
+                raise socket.timeout("timed out")
+            data = bytes(self.buffer[:bufsize])
+            del self.buffer[:bufsize]
+            return data
+
+    def makefile(self, mode):
+        return io.BufferedReader(SocketReader(self))
+
+    def hang_up(self):
+        with self.ready:
+            self.eof = True
+            self.ready.notify_all()
+
+    def shutdown(self, how):
+        self.hang_up()
+        if self.peer is not None:
+            self.peer.hang_up()
+
+    def close(self):
+        if self.closed:
+            return
+        self.shutdown(socket.SHUT_RDWR)
+        self.closed = True
+
+
+class SocketReader(io.RawIOBase):
+    # File view of an InProcessSocket for pickle.load()
+    def __init__(self, sock):
+        self.sock = sock
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.sock.recv(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def from_url(url):
+    # "tcp://host:port", "unix:///path" or "inproc://name"
+    scheme, _, rest = url.partition("://")
+    if scheme == "tcp":
+        host, _, port = rest.rpartition(":")
+        return TcpTransport(host, int(port))
+    if scheme == "unix":
+        return UnixTransport(rest)
+    if scheme == "inproc":
+        return InProcessTransport(rest)
+    raise ValueError(f"unknown transport: {url}")